@@ -0,0 +1,186 @@
+"""
+Vectorized price analytics over NumPy arrays
+
+A ticker's range is loaded once as (timestamp, price) columns and every
+metric is computed with array operations: cumulative sums for rolling
+windows, blockwise closed-form recursion for EWMA and a running maximum for
+drawdown. Encoded results are memoized in an in-process LRU keyed by the
+request and the version of the underlying series.
+"""
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import Row
+from app.config import settings
+
+SECONDS_PER_YEAR = 365 * 24 * 60 * 60
+
+# Metrics whose result depends on `window`
+WINDOWED_METRICS = {"rolling_mean", "ewma", "volatility"}
+
+
+def to_arrays(rows: List[Row]) -> Tuple[np.ndarray, np.ndarray]:
+    """Split (timestamp, price) rows into int64 timestamp and float64 price columns"""
+    # Unzipping first: NumPy walks SQLAlchemy Row objects an order of magnitude slower than tuples
+    timestamps, prices = zip(*rows) if rows else ((), ())
+    return np.fromiter(timestamps, np.int64, len(rows)), np.fromiter(prices, np.float64, len(rows))
+
+
+def log_returns(prices: np.ndarray) -> np.ndarray:
+    """log(p[i+1] / p[i]); one element shorter than prices"""
+    return np.diff(np.log(prices))
+
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """Mean of each full window of `window` consecutive values (len(values) - window + 1 of them)"""
+    if len(values) < window:
+        return np.empty(0)
+    # Centering keeps the cumulative sum small, so differencing it loses little precision
+    offset = values.mean()
+    sums = np.cumsum(values - offset)
+    window_sums = sums[window - 1:].copy()
+    window_sums[1:] -= sums[:-window]
+    return window_sums / window + offset
+
+
+def ewma(values: np.ndarray, span: int) -> np.ndarray:
+    """
+    Exponentially weighted moving average, alpha = 2 / (span + 1), seeded with the first value
+
+    Args:
+        values: Input series
+        span: Decay in samples
+
+    Returns:
+        y[i] = (1 - alpha) * y[i - 1] + alpha * values[i], same length as values
+    """
+    alpha = 2.0 / (span + 1)
+    if alpha >= 1.0 or not len(values):
+        return values.astype(np.float64)
+    decay = 1.0 - alpha
+    # Within a block y[j] = decay^j * (decay * carry + alpha * cumsum(x[k] * decay^-k));
+    # decay^-k is capped at 1e150 and the series is taken relative to its first
+    # value, so the scaled terms stay far from overflow even for large prices
+    block = max(1, min(len(values), int(150 / -np.log10(decay))))
+    powers = decay ** np.arange(block)
+    inverse = 1.0 / powers
+    base = float(values[0])
+    result = np.empty(len(values))
+    carry = 0.0
+    for start in range(0, len(values), block):
+        chunk = values[start:start + block] - base
+        size = len(chunk)
+        scaled = np.cumsum(chunk * inverse[:size]) * alpha + decay * carry
+        result[start:start + size] = scaled * powers[:size]
+        carry = result[start + size - 1]
+    return result + base
+
+
+def realized_volatility(timestamps: np.ndarray, prices: np.ndarray, window: int) -> np.ndarray:
+    """
+    Annualized realized volatility over each window of `window` log returns
+
+    sqrt(sum(r^2) * year / elapsed) uses the actual time spanned by the
+    window, so gaps in the series widen it instead of inflating the result.
+    """
+    if len(prices) <= window:
+        return np.empty(0)
+    squared = np.cumsum(log_returns(prices) ** 2)
+    sums = squared[window - 1:].copy()
+    sums[1:] -= squared[:-window]
+    elapsed = (timestamps[window:] - timestamps[:-window]).astype(np.float64)
+    return np.sqrt(np.maximum(sums, 0.0) * SECONDS_PER_YEAR / elapsed)
+
+
+def max_drawdown(timestamps: np.ndarray, prices: np.ndarray) -> dict:
+    """Largest peak-to-trough decline, as a negative fraction, with where it happened"""
+    drawdowns = prices / np.maximum.accumulate(prices) - 1.0
+    trough = int(np.argmin(drawdowns))
+    peak = int(np.argmax(prices[:trough + 1]))
+    return {
+        "max_drawdown": float(drawdowns[trough]),
+        "peak_timestamp": int(timestamps[peak]),
+        "trough_timestamp": int(timestamps[trough]),
+    }
+
+
+def compute(metric: str, timestamps: np.ndarray, prices: np.ndarray, window: int) -> dict:
+    """
+    Compute one metric as a compact columnar result
+
+    Args:
+        metric: returns, rolling_mean, ewma, volatility or drawdown
+        timestamps: Sample times, oldest first
+        prices: Prices aligned with timestamps
+        window: Window (or EWMA span) in samples
+
+    Returns:
+        {"timestamp": [...], "value": [...]} for series metrics, a summary for drawdown
+    """
+    if metric == "drawdown":
+        return max_drawdown(timestamps, prices)
+    if metric == "returns":
+        return {"timestamp": timestamps[1:], "value": log_returns(prices)}
+    if metric == "rolling_mean":
+        return {"timestamp": timestamps[window - 1:], "value": rolling_mean(prices, window)}
+    if metric == "ewma":
+        return {"timestamp": timestamps, "value": ewma(prices, window)}
+    if metric == "volatility":
+        return {"timestamp": timestamps[window:], "value": realized_volatility(timestamps, prices, window)}
+    raise ValueError(f"Unknown metric: {metric}")
+
+
+class AnalyticsCache:
+    """
+    In-process LRU of encoded analytics responses
+
+    Keys embed the newest timestamp and row count of the series, so a new
+    tick or a backfill produces a new key and stale entries simply age out.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0}
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        body = self._entries.get(key)
+        if body is None:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        self._entries.move_to_end(key)
+        return body
+
+    def put(self, key: Hashable, body: bytes):
+        if self.maxsize <= 0:
+            return
+        self._entries[key] = body
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
+def cache_key(
+        ticker: str,
+        start_timestamp: Optional[int],
+        end_timestamp: Optional[int],
+        metric: str,
+        window: int,
+        version: Tuple[Optional[int], int]
+) -> tuple:
+    return (
+        ticker, start_timestamp, end_timestamp, metric,
+        window if metric in WINDOWED_METRICS else None, *version,
+    )
+
+
+analytics_cache = AnalyticsCache(settings.analytics_cache_size)
+
+
+def get_analytics_cache() -> AnalyticsCache:
+    """Dependency for getting the analytics result cache"""
+    return analytics_cache
@@ -0,0 +1,155 @@
+"""
+Detection and backfill of missed collector ticks
+
+Gaps are found per ticker with a window query over price_data and filled
+from Deribit's index chart history. Each ticker costs a single history
+request, with requests spaced out so the backfill stays within Deribit's
+rate limits.
+"""
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.deribit_client import DeribitClient
+from app.repository import PriceRepository, PriceRow
+
+logger = logging.getLogger(__name__)
+
+# Look-back ranges accepted by public/get_index_chart_data, shortest first
+HISTORY_RANGES: List[Tuple[str, int]] = [
+    ("1h", 60 * 60),
+    ("1d", 24 * 60 * 60),
+    ("2d", 2 * 24 * 60 * 60),
+    ("1m", 30 * 24 * 60 * 60),
+    ("1y", 365 * 24 * 60 * 60),
+]
+
+
+def history_range(oldest_timestamp: int, now: int) -> str:
+    """Smallest history range that still reaches back to oldest_timestamp"""
+    age = now - oldest_timestamp
+    for name, seconds in HISTORY_RANGES:
+        if age <= seconds:
+            return name
+    return "all"
+
+
+def fill_points(
+        gaps: List[Tuple[int, int]],
+        points: List[Tuple[int, float]],
+        cadence: int
+) -> List[Tuple[int, float]]:
+    """
+    Pick at most one historical point per missing cadence slot
+
+    Points are stamped with the slot they fill rather than their own time,
+    so backfilled rows land on the collector's tick grid: the unique
+    (ticker, timestamp) key then deduplicates them against late live ticks
+    and find_gaps no longer reports the slot.
+
+    Args:
+        gaps: (last timestamp before, first timestamp after) pairs
+        points: (timestamp in ms, price) points, oldest first
+        cadence: Expected seconds between samples
+
+    Returns:
+        (slot timestamp in seconds, price) rows strictly inside the gaps
+    """
+    rows = []
+    gap_index = 0
+    last_slot = None
+    for timestamp_ms, price in points:
+        timestamp = timestamp_ms // 1000
+        while gap_index < len(gaps) and timestamp >= gaps[gap_index][1]:
+            gap_index += 1
+            last_slot = None
+        if gap_index == len(gaps):
+            break
+        before, after = gaps[gap_index]
+        # Slots are counted from the sample before the gap; slot 0 and the
+        # slot of the sample after it are already covered
+        slot = (timestamp - before + cadence // 2) // cadence
+        if slot < 1 or slot * cadence > after - before - cadence // 2 or slot == last_slot:
+            continue
+        last_slot = slot
+        rows.append((before + slot * cadence, price))
+    return rows
+
+
+async def fetch_histories(
+        client: DeribitClient,
+        requests: Dict[str, str],
+        interval: float
+) -> Dict[str, Optional[List[Tuple[int, float]]]]:
+    """Fetch index history for several tickers, one request every `interval` seconds"""
+    histories = {}
+    for position, (ticker, range_name) in enumerate(requests.items()):
+        if position:
+            await asyncio.sleep(interval)
+        histories[ticker] = await client.get_index_chart_data(ticker, range_name)
+    return histories
+
+
+def backfill_gaps(
+        session: Session,
+        tickers: List[str],
+        cadence: Optional[int] = None,
+        lookback: Optional[int] = None,
+        client: Optional[DeribitClient] = None,
+        now: Optional[int] = None
+) -> Dict[str, int]:
+    """
+    Find and fill gaps for the given tickers
+
+    Args:
+        session: Database session
+        tickers: Tickers to scan
+        cadence: Expected seconds between samples
+        lookback: Only scan this many seconds back from now
+        client: Deribit client (a new one by default); its session is closed afterwards
+        now: Current Unix time (for tests)
+
+    Returns:
+        Number of rows written per ticker
+    """
+    cadence = cadence or settings.backfill_cadence
+    lookback = lookback or settings.backfill_lookback
+    now = now or int(time.time())
+    repository = PriceRepository(session)
+
+    gaps = {
+        ticker: found for ticker in tickers
+        if (found := repository.find_gaps(ticker, cadence, start_timestamp=now - lookback))
+    }
+    if not gaps:
+        return {}
+    for ticker, found in gaps.items():
+        logger.info(f"Found {len(found)} gaps for {ticker}")
+
+    requests = {ticker: history_range(found[0][0], now) for ticker, found in gaps.items()}
+
+    history_client = client or DeribitClient()
+
+    async def fetch():
+        try:
+            return await fetch_histories(history_client, requests, settings.backfill_request_interval)
+        finally:
+            # The pooled session is bound to this event loop
+            await history_client.close()
+
+    histories = asyncio.run(fetch())
+
+    written = {}
+    for ticker, found in gaps.items():
+        points = histories.get(ticker)
+        if not points:
+            logger.warning(f"No history available to backfill {ticker}")
+            continue
+        rows: List[PriceRow] = [
+            (ticker, price, timestamp) for timestamp, price in fill_points(found, points, cadence)
+        ]
+        written[ticker] = repository.save_prices_bulk(rows, rollups=True)
+        logger.info(f"Backfilled {written[ticker]} prices for {ticker}")
+    return written
@@ -0,0 +1,238 @@
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+import redis
+import redis.asyncio as aioredis
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class LatestPriceCache:
+    """
+    Two-tier cache of the latest price per ticker
+
+    A short-TTL in-process LRU sits in front of Redis. The collector writes
+    through to Redis after every saved tick; the API reads local -> Redis and
+    falls back to the database on a miss.
+    """
+
+    key_prefix = "latest_price:"
+
+    def __init__(
+            self,
+            redis_client: Optional[redis.Redis] = None,
+            async_redis_client: Optional[aioredis.Redis] = None,
+            local_ttl: float = 1.0,
+            local_maxsize: int = 1024,
+            redis_ttl: int = 120
+    ):
+        self.redis = redis_client
+        self.async_redis = async_redis_client
+        self.local_ttl = local_ttl
+        self.local_maxsize = local_maxsize
+        self.redis_ttl = redis_ttl
+        self._local: "OrderedDict[str, tuple[float, dict]]" = OrderedDict()
+        self.stats: Dict[str, int] = {"local_hits": 0, "redis_hits": 0, "misses": 0, "errors": 0}
+
+    def _key(self, ticker: str) -> str:
+        return f"{self.key_prefix}{ticker}"
+
+    def _get_local(self, ticker: str) -> Optional[dict]:
+        entry = self._local.get(ticker)
+        if entry is None:
+            return None
+        expires_at, payload = entry
+        if expires_at < time.monotonic():
+            del self._local[ticker]
+            return None
+        self._local.move_to_end(ticker)
+        return payload
+
+    def _set_local(self, ticker: str, payload: dict):
+        if self.local_ttl <= 0:
+            return
+        self._local[ticker] = (time.monotonic() + self.local_ttl, payload)
+        self._local.move_to_end(ticker)
+        while len(self._local) > self.local_maxsize:
+            self._local.popitem(last=False)
+
+    async def get(self, ticker: str) -> Optional[dict]:
+        """
+        Look up the latest price for a ticker
+
+        Args:
+            ticker: Currency ticker symbol
+
+        Returns:
+            Cached price payload or None on a miss
+        """
+        payload = self._get_local(ticker)
+        if payload is not None:
+            self.stats["local_hits"] += 1
+            return payload
+
+        if self.async_redis is not None:
+            try:
+                raw = await self.async_redis.get(self._key(ticker))
+            except redis.RedisError as e:
+                self.stats["errors"] += 1
+                logger.warning(f"Redis read failed for {ticker}: {e}")
+                raw = None
+            if raw is not None:
+                payload = json.loads(raw)
+                self._set_local(ticker, payload)
+                self.stats["redis_hits"] += 1
+                return payload
+
+        self.stats["misses"] += 1
+        return None
+
+    async def get_many(self, tickers: List[str]) -> Dict[str, dict]:
+        """
+        Look up several tickers with a single Redis MGET for local misses
+
+        Args:
+            tickers: Currency ticker symbols
+
+        Returns:
+            Ticker -> cached payload for the tickers that were found
+        """
+        found: Dict[str, dict] = {}
+        missing: List[str] = []
+        for ticker in tickers:
+            payload = self._get_local(ticker)
+            if payload is not None:
+                found[ticker] = payload
+                self.stats["local_hits"] += 1
+            else:
+                missing.append(ticker)
+
+        if missing and self.async_redis is not None:
+            try:
+                values = await self.async_redis.mget([self._key(ticker) for ticker in missing])
+            except redis.RedisError as e:
+                self.stats["errors"] += 1
+                logger.warning(f"Redis batch read failed: {e}")
+                values = [None] * len(missing)
+            for ticker, raw in zip(missing, values):
+                if raw is not None:
+                    found[ticker] = json.loads(raw)
+                    self._set_local(ticker, found[ticker])
+                    self.stats["redis_hits"] += 1
+
+        self.stats["misses"] += len(tickers) - len(found)
+        return found
+
+    async def fill_many(self, payloads: List[dict]):
+        """Batch counterpart of fill: one pipelined round-trip of SET NX"""
+        for payload in payloads:
+            self._set_local(payload["ticker"], payload)
+        if self.async_redis is None or not payloads:
+            return
+        try:
+            pipeline = self.async_redis.pipeline(transaction=False)
+            for payload in payloads:
+                pipeline.set(self._key(payload["ticker"]), json.dumps(payload), ex=self.redis_ttl, nx=True)
+            await pipeline.execute()
+        except redis.RedisError as e:
+            self.stats["errors"] += 1
+            logger.warning(f"Redis batch write failed: {e}")
+
+    async def fill(self, payload: dict):
+        """
+        Populate the cache after a database read
+
+        Redis is only written if the key is absent so that a slow reader can
+        never overwrite a newer value published by the collector.
+        """
+        self._set_local(payload["ticker"], payload)
+        if self.async_redis is None:
+            return
+        try:
+            await self.async_redis.set(
+                self._key(payload["ticker"]), json.dumps(payload), ex=self.redis_ttl, nx=True
+            )
+        except redis.RedisError as e:
+            self.stats["errors"] += 1
+            logger.warning(f"Redis write failed for {payload['ticker']}: {e}")
+
+    def publish(self, payloads: Iterable[dict]) -> List[dict]:
+        """
+        Write-through the latest prices saved by the collector
+
+        Only the newest payload per ticker is written, and only if it is
+        newer than the cached one: a spool backlog drained after an outage
+        must not overwrite prices a later tick already published. The
+        comparison runs under WATCH, so concurrent publishers cannot
+        interleave between the read and the write.
+
+        Args:
+            payloads: Price payloads (id, ticker, price, timestamp)
+
+        Returns:
+            Payloads that advanced the latest price of their ticker
+        """
+        newest = newest_per_ticker(payloads)
+        if self.redis is None or not newest:
+            return list(newest.values())
+        keys = [self._key(ticker) for ticker in newest]
+        try:
+            with self.redis.pipeline() as pipeline:
+                while True:
+                    try:
+                        pipeline.watch(*keys)
+                        cached = pipeline.mget(keys)
+                        fresh = [
+                            payload for payload, current in zip(newest.values(), cached)
+                            if current is None or json.loads(current)["timestamp"] < payload["timestamp"]
+                        ]
+                        pipeline.multi()
+                        for payload in fresh:
+                            pipeline.set(self._key(payload["ticker"]), json.dumps(payload), ex=self.redis_ttl)
+                        pipeline.execute()
+                        return fresh
+                    except redis.WatchError:
+                        continue
+        except redis.RedisError as e:
+            self.stats["errors"] += 1
+            logger.warning(f"Redis write-through failed: {e}")
+            return list(newest.values())
+
+
+def newest_per_ticker(payloads: Iterable[dict]) -> Dict[str, dict]:
+    """Latest payload of every ticker in a batch"""
+    newest: Dict[str, dict] = {}
+    for payload in payloads:
+        current = newest.get(payload["ticker"])
+        if current is None or payload["timestamp"] > current["timestamp"]:
+            newest[payload["ticker"]] = payload
+    return newest
+
+
+def create_latest_price_cache() -> LatestPriceCache:
+    """Build a cache wired to the configured Redis instance"""
+    if not settings.cache_enabled:
+        return LatestPriceCache(local_ttl=0)
+    return LatestPriceCache(
+        redis_client=redis.Redis.from_url(
+            settings.cache_redis_url, socket_timeout=settings.cache_redis_timeout
+        ),
+        async_redis_client=aioredis.Redis.from_url(
+            settings.cache_redis_url, socket_timeout=settings.cache_redis_timeout
+        ),
+        local_ttl=settings.cache_local_ttl,
+        local_maxsize=settings.cache_local_maxsize,
+        redis_ttl=settings.cache_redis_ttl,
+    )
+
+
+# Global cache instance
+latest_price_cache = create_latest_price_cache()
+
+
+def get_latest_price_cache() -> LatestPriceCache:
+    """Dependency for getting the latest-price cache"""
+    return latest_price_cache
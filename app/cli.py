@@ -0,0 +1,151 @@
+"""
+Maintenance commands
+
+Usage:
+    python -m app.cli backfill-rollups [--ticker btc_usd | --missing]
+    python -m app.cli backfill-gaps [--ticker btc_usd] [--lookback-hours 48]
+    python -m app.cli partition-migrate [--keep-legacy]
+    python -m app.cli partition-maintain
+    python -m app.cli drop-redundant-indexes
+    python -m app.cli dedupe-prices
+    python -m app.cli flush-spool
+    python -m app.cli requeue-dead [--id 12 --id 13] [--error "violates check constraint"] [--list]
+"""
+import argparse
+import logging
+from app import partitioning
+from app.backfill import backfill_gaps
+from app.config import settings
+from app.database import db_manager, init_db
+from app.repository import PriceRepository
+from app.tasks import flush_spool, get_collector_spool
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def backfill_rollups(args: argparse.Namespace):
+    """Rebuild price_rollup from raw price data"""
+    if args.missing:
+        rebuilt = db_manager.ensure_rollups()
+        logger.info(f"Rebuilt rollups of: {', '.join(rebuilt) or 'none'}")
+        return
+    session = db_manager.get_session()
+    try:
+        written = PriceRepository(session).rebuild_rollups(args.ticker)
+        logger.info(f"Rebuilt {written} rollup rows")
+    finally:
+        session.close()
+
+
+def backfill_missing(args: argparse.Namespace):
+    """Fill holes in the minute series from Deribit history"""
+    session = db_manager.get_session()
+    try:
+        tickers = [args.ticker] if args.ticker else settings.tickers
+        lookback = args.lookback_hours * 3600 if args.lookback_hours else None
+        written = backfill_gaps(session, tickers, lookback=lookback)
+        logger.info(f"Backfilled prices: {written}")
+    finally:
+        session.close()
+
+
+def partition_migrate(args: argparse.Namespace):
+    """Move an existing price_data table to monthly partitions"""
+    partitioning.migrate_to_partitioned(
+        db_manager.engine, settings.partition_months_ahead, keep_legacy=args.keep_legacy
+    )
+
+
+def partition_maintain(args: argparse.Namespace):
+    """Create upcoming partitions and apply the retention policy"""
+    with db_manager.engine.begin() as conn:
+        partitioning.ensure_partitions(conn, settings.partition_months_ahead)
+        if settings.retention_months is not None:
+            partitioning.apply_retention(conn, settings.retention_months, archive=settings.retention_archive)
+
+
+def drop_redundant_indexes(args: argparse.Namespace):
+    """Drop single-column price_data indexes covered by uq_ticker_timestamp"""
+    with db_manager.engine.begin() as conn:
+        partitioning.drop_redundant_indexes(conn)
+
+
+def dedupe_prices(args: argparse.Namespace):
+    """Delete duplicate (ticker, timestamp) rows and add the unique index"""
+    deleted = db_manager.ensure_unique_prices()
+    if deleted is None:
+        logger.info("price_data already has a unique (ticker, timestamp) index")
+    else:
+        logger.info(f"Deleted {deleted} duplicate prices")
+
+
+def flush_collector_spool(args: argparse.Namespace):
+    """Write prices queued in the local collector spool to the database"""
+    if get_collector_spool() is None:
+        logger.info("Collector spool is disabled (spool_path is not set)")
+        return
+    flushed = flush_spool()
+    logger.info(f"Flushed {flushed} spooled prices, {get_collector_spool().pending()} still pending")
+
+
+def requeue_dead(args: argparse.Namespace):
+    """Move rows the database rejected from spool_dead back into the collector spool"""
+    spool = get_collector_spool()
+    if spool is None:
+        logger.info("Collector spool is disabled (spool_path is not set)")
+        return
+    if args.list:
+        for dead_id, row, error in spool.dead_letters(args.id, args.error):
+            logger.info(f"{dead_id}: {row} {error}")
+        return
+    requeued = spool.requeue_dead(args.id, args.error)
+    logger.info(f"Requeued {requeued} rejected prices, {spool.dead_count()} left in spool_dead")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Crypto Price maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    rollups = commands.add_parser("backfill-rollups", help="Rebuild OHLC rollups from raw data")
+    rollups.add_argument("--ticker", default=None, help="Only rebuild this ticker")
+    rollups.add_argument(
+        "--missing", action="store_true", help="Only rebuild tickers with raw prices the rollups do not cover"
+    )
+    rollups.set_defaults(handler=backfill_rollups)
+
+    gaps = commands.add_parser("backfill-gaps", help="Fill missed ticks from Deribit history")
+    gaps.add_argument("--ticker", default=None, help="Only scan this ticker")
+    gaps.add_argument("--lookback-hours", type=int, default=None, help="How far back to scan")
+    gaps.set_defaults(handler=backfill_missing)
+
+    migrate = commands.add_parser("partition-migrate", help="Convert price_data to monthly partitions")
+    migrate.add_argument("--keep-legacy", action="store_true", help="Keep the old table as price_data_legacy")
+    migrate.set_defaults(handler=partition_migrate, skip_init=True)
+
+    maintain = commands.add_parser("partition-maintain", help="Create future partitions and apply retention")
+    maintain.set_defaults(handler=partition_maintain)
+
+    indexes = commands.add_parser("drop-redundant-indexes", help="Drop single-column price_data indexes")
+    indexes.set_defaults(handler=drop_redundant_indexes)
+
+    dedupe = commands.add_parser("dedupe-prices", help="Remove duplicate prices and enforce uniqueness")
+    dedupe.set_defaults(handler=dedupe_prices, skip_init=True)
+
+    spool = commands.add_parser("flush-spool", help="Drain the local collector spool into the database")
+    spool.set_defaults(handler=flush_collector_spool)
+
+    requeue = commands.add_parser("requeue-dead", help="Move rejected spool rows back into the spool")
+    requeue.add_argument("--id", type=int, action="append", default=None, help="Only this spool_dead id (repeatable)")
+    requeue.add_argument("--error", default=None, help="Only rows whose error contains this text")
+    requeue.add_argument("--list", action="store_true", help="Show matching rows instead of requeueing them")
+    requeue.set_defaults(handler=requeue_dead, skip_init=True)
+
+    args = parser.parse_args(argv)
+    if not getattr(args, "skip_init", False):
+        init_db()
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
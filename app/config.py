@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import List, Literal, Optional
 
 
 class Settings(BaseSettings):
@@ -12,12 +12,110 @@ class Settings(BaseSettings):
     postgres_port: str = "5432"
     postgres_db: str = "crypto_prices"
 
+    # Monthly partitioning of price_data (PostgreSQL only)
+    partitioning_enabled: bool = False
+    partition_months_ahead: int = 3
+    retention_months: Optional[int] = None
+    retention_archive: bool = True
+
+    # Compare rollups with raw prices on startup and rebuild tickers they do
+    # not cover; scans price_data, so off by default (see backfill-rollups --missing)
+    rollups_check_on_startup: bool = False
+
+    # Connection pool (per process: uvicorn worker or Celery child). Pre-ping
+    # is "always" (every checkout), "idle" (only connections idle longer than
+    # db_pre_ping_idle seconds) or "never"; db_statement_timeout is in seconds
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0
+    db_pool_recycle: int = 30 * 60
+    db_pool_use_lifo: bool = True
+    db_pre_ping: Literal["always", "idle", "never"] = "idle"
+    db_pre_ping_idle: float = 60.0
+    db_statement_timeout: Optional[float] = None
+
     # Celery
     celery_broker_url: str = "redis://redis:6379/0"
     celery_result_backend: str = "redis://redis:6379/0"
 
+    # Latest-price cache
+    cache_enabled: bool = True
+    cache_redis_url: str = "redis://redis:6379/1"
+    cache_redis_ttl: int = 120
+    cache_redis_timeout: float = 0.5
+    cache_local_ttl: float = 1.0
+    cache_local_maxsize: int = 1024
+
+    # Upper bound on tickers in one batch request (/prices/latest?tickers=, /prices/batch)
+    batch_max_tickers: int = 100
+
+    # HTTP caching: ranges that ended more than http_cache_settle seconds ago
+    # are served as immutable; everything else is fresh until the next tick.
+    # Rows keep arriving for older ranges from the hourly gap backfill (up to
+    # backfill_lookback back) and from the spool after a database outage, so
+    # None means backfill_lookback + http_cache_settle_margin
+    http_cache_settle: Optional[int] = None
+    http_cache_settle_margin: int = 2 * 60 * 60
+    http_cache_immutable_max_age: int = 24 * 60 * 60
+
+    # Encoded /prices/analytics results kept in the in-process LRU
+    analytics_cache_size: int = 256
+
+    # Rows fetched per round-trip by streaming/export endpoints
+    stream_chunk_size: int = 1000
+
+    # Live price push (Redis pub/sub)
+    live_redis_url: str = "redis://redis:6379/1"
+    live_channel: str = "prices:live"
+    live_queue_size: int = 100
+    live_keepalive_interval: float = 15.0
+
     # Deribit API
     deribit_api_url: str = "https://www.deribit.com/api/v2"
+    deribit_max_concurrency: int = 20
+    deribit_connection_limit: int = 100
+    deribit_dns_cache_ttl: int = 300
+    deribit_keepalive_timeout: float = 30.0
+    deribit_request_timeout: float = 15.0
+    deribit_max_retries: int = 3
+    deribit_backoff_base: float = 0.5
+    deribit_backoff_max: float = 8.0
+    deribit_breaker_threshold: int = 5
+    deribit_breaker_reset: float = 30.0
+    deribit_tick_deadline: float = 45.0
+    deribit_ws_url: str = "wss://www.deribit.com/ws/api/v2"
+
+    # Collector ticks: aligned to cadence boundaries; a tick older than
+    # collector_tick_ttl is dropped from the queue and its lock expires
+    collector_cadence: int = 60
+    collector_tick_ttl: int = 55
+    # Each tick fans out into this many consistent-hash shards; a shard that
+    # misses collector_shard_deadline is requeued up to collector_shard_retries times
+    collector_shards: int = 4
+    collector_shard_deadline: float = 20.0
+    collector_shard_retries: int = 1
+
+    # Local write spool: ticks are appended to an SQLite WAL file and a flusher in
+    # the worker's main process drains it in batches, so a slow or unavailable
+    # database neither stretches ticks nor loses prices (None writes directly)
+    spool_path: Optional[str] = "./spool/collector.db"
+    spool_flush_interval: float = 1.0
+    spool_batch_size: int = 5000
+
+    # Prometheus metrics (Celery workers serve theirs on metrics_port; 0 disables)
+    metrics_enabled: bool = True
+    metrics_port: int = 9808
+
+    # Gap backfill
+    backfill_cadence: int = 60
+    backfill_lookback: int = 2 * 24 * 60 * 60
+    backfill_request_interval: float = 0.2
+
+    # WebSocket ingestion
+    ingest_flush_size: int = 500
+    ingest_flush_interval: float = 1.0
+    ingest_max_buffer: int = 100_000
+    ingest_max_backoff: float = 30.0
 
     # Tickers to track
     tickers: List[str] = ["btc_usd", "eth_usd"]
@@ -27,6 +125,11 @@ class Settings(BaseSettings):
         """Construct database URL from components"""
         return f"postgresql://{self.postgres_user}:{self.postgres_password}@{self.postgres_host}:{self.postgres_port}/{self.postgres_db}"
 
+    @property
+    def async_database_url(self) -> str:
+        """Construct asyncpg database URL from components"""
+        return f"postgresql+asyncpg://{self.postgres_user}:{self.postgres_password}@{self.postgres_host}:{self.postgres_port}/{self.postgres_db}"
+
     class Config:
         env_file = ".env"
         case_sensitive = False
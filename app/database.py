@@ -1,31 +1,189 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, Session
+from typing import Callable, Dict, List, Optional
+from app import metrics, partitioning
 from app.config import settings
-from app.models import Base
+from app.models import Base, PriceData
+from app.pooling import PoolStats, engine_options, monitor_pool
+from app.repository import PriceRepository, duplicate_prices_delete
 import logging
 
 logger = logging.getLogger(__name__)
 
+UNIQUE_PRICES_INDEX = "uq_ticker_timestamp"
+# pg_advisory_lock key serializing rollup rebuilds at startup
+ROLLUP_REBUILD_LOCK = 0x726F6C6C
+
 
 class DatabaseManager:
     """Manages database connection and session lifecycle"""
 
-    def __init__(self, database_url: str):
-        self.engine = create_engine(database_url, pool_pre_ping=True)
+    def __init__(self, database_url: str, async_database_url: Optional[str] = None):
+        self.sync_pool_stats = PoolStats("sync")
+        self.async_pool_stats = PoolStats("async")
+        self.engine = create_engine(database_url, **engine_options(database_url, self.sync_pool_stats))
+        monitor_pool(self.engine, self.sync_pool_stats)
         self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        if settings.metrics_enabled:
+            metrics.instrument_engine(self.engine)
+        self.async_database_url = async_database_url
+        self._async_engine: Optional[AsyncEngine] = None
+        self._AsyncSessionLocal: Optional[async_sessionmaker] = None
+
+    @property
+    def async_engine(self) -> AsyncEngine:
+        """Async engine, created on first use so that sync-only processes never load the async driver"""
+        if self._async_engine is None:
+            if not self.async_database_url:
+                raise RuntimeError("Async database URL is not configured")
+            self._async_engine = create_async_engine(
+                self.async_database_url,
+                **engine_options(self.async_database_url, self.async_pool_stats, is_async=True)
+            )
+            monitor_pool(self._async_engine.sync_engine, self.async_pool_stats)
+            if settings.metrics_enabled:
+                metrics.instrument_engine(self._async_engine.sync_engine)
+        return self._async_engine
+
+    def reset_after_fork(self):
+        """
+        Give a forked child process its own connections
+
+        The inherited pool still references the parent's sockets: drop it
+        without closing them (the parent keeps using them) so the child opens
+        fresh connections on first use. The async engine is rebuilt lazily.
+        """
+        self.engine.dispose(close=False)
+        if self._async_engine is not None:
+            self._async_engine.sync_engine.dispose(close=False)
+        self._async_engine = None
+        self._AsyncSessionLocal = None
+
+    def pool_stats(self) -> Dict[str, dict]:
+        """Occupancy and checkout latency of the pools created so far"""
+        stats = {"sync": self.sync_pool_stats.snapshot()}
+        if self._async_engine is not None:
+            stats["async"] = self.async_pool_stats.snapshot()
+        return stats
 
     def create_tables(self):
         """Create all database tables"""
+        if settings.partitioning_enabled and self.engine.dialect.name == "postgresql":
+            with self.engine.begin() as conn:
+                partitioning.create_partitioned_table(conn)
+                partitioning.ensure_partitions(conn, settings.partition_months_ahead)
         Base.metadata.create_all(bind=self.engine)
+        self.add_missing_columns()
+        self.ensure_unique_prices()
+        if settings.rollups_check_on_startup:
+            self.ensure_rollups()
         logger.info("Database tables created successfully")
 
+    def add_missing_columns(self):
+        """Add nullable columns introduced after price_data was first created"""
+        existing = {column["name"] for column in inspect(self.engine).get_columns(PriceData.__tablename__)}
+        if "exchange_timestamp" not in existing:
+            with self.engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE {PriceData.__tablename__} ADD COLUMN exchange_timestamp BIGINT"))
+            logger.info("Added price_data.exchange_timestamp")
+
+    def ensure_unique_prices(self) -> Optional[int]:
+        """
+        One-off migration to one row per (ticker, timestamp)
+
+        Deletes duplicates (keeping the lowest id), creates uq_ticker_timestamp
+        and drops the non-unique ix_ticker_timestamp it replaces, in one
+        transaction. On PostgreSQL writers are blocked meanwhile so no new
+        duplicate can slip in before the index exists. Rollups counted the
+        duplicates too and are rebuilt afterwards.
+
+        Returns:
+            Number of deleted duplicates, or None when the index already existed
+        """
+        if self._has_unique_prices(inspect(self.engine)):
+            return None
+
+        session = self.get_session()
+        try:
+            if self.engine.dialect.name == "postgresql":
+                session.execute(text(f"LOCK TABLE {PriceData.__tablename__} IN SHARE ROW EXCLUSIVE MODE"))
+            # Another process may have migrated while we waited for the lock
+            if self._has_unique_prices(inspect(session.connection())):
+                session.rollback()
+                return None
+            deleted = session.execute(duplicate_prices_delete()).rowcount
+            unique_index = next(index for index in PriceData.__table__.indexes if index.name == UNIQUE_PRICES_INDEX)
+            unique_index.create(session.connection())
+            session.execute(text("DROP INDEX IF EXISTS ix_ticker_timestamp"))
+            session.commit()
+            logger.info(f"Created {UNIQUE_PRICES_INDEX} after deleting {deleted} duplicate prices")
+            if deleted:
+                written = PriceRepository(session).rebuild_rollups()
+                logger.info(f"Rebuilt {written} rollup rows")
+            return deleted
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def ensure_rollups(self) -> List[str]:
+        """
+        Rebuild rollups of tickers with raw prices the rollups do not cover
+
+        History written before rollups existed would otherwise be missing
+        from /prices/ohlc. The check counts every raw row, so it runs from
+        `backfill-rollups --missing` rather than on each startup unless
+        rollups_check_on_startup is set. On PostgreSQL an
+        advisory lock keeps processes starting together from rebuilding the
+        same tickers at once.
+
+        Returns:
+            Tickers whose rollups were rebuilt
+        """
+        # Session-level lock, held on its own connection across the rebuild's commits
+        lock = self.engine.connect() if self.engine.dialect.name == "postgresql" else None
+        if lock is not None:
+            lock.execute(text("SELECT pg_advisory_lock(:key)"), {"key": ROLLUP_REBUILD_LOCK})
+        session = self.get_session()
+        try:
+            repository = PriceRepository(session)
+            stale = repository.tickers_missing_rollups()
+            for ticker in stale:
+                written = repository.rebuild_rollups(ticker)
+                logger.info(f"Rebuilt {written} rollup rows for {ticker}")
+            return stale
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+            if lock is not None:
+                lock.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": ROLLUP_REBUILD_LOCK})
+                lock.close()
+
+    @staticmethod
+    def _has_unique_prices(inspector) -> bool:
+        return any(
+            index["name"] == UNIQUE_PRICES_INDEX for index in inspector.get_indexes(PriceData.__tablename__)
+        )
+
     def get_session(self) -> Session:
         """Get a new database session"""
         return self.SessionLocal()
 
+    def get_async_session(self) -> AsyncSession:
+        """Get a new async database session"""
+        if self._AsyncSessionLocal is None:
+            self._AsyncSessionLocal = async_sessionmaker(
+                bind=self.async_engine, autoflush=False, expire_on_commit=False
+            )
+        return self._AsyncSessionLocal()
+
 
 # Global database manager instance
-db_manager = DatabaseManager(settings.database_url)
+db_manager = DatabaseManager(settings.database_url, settings.async_database_url)
 
 
 def get_db():
@@ -37,6 +195,17 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    """Dependency for getting async database session"""
+    async with db_manager.get_async_session() as db:
+        yield db
+
+
+def get_async_session_factory() -> Callable[[], AsyncSession]:
+    """Dependency for handlers that manage the session lifetime themselves (e.g. streaming)"""
+    return db_manager.get_async_session
+
+
 def init_db():
     """Initialize database tables"""
-    db_manager.create_tables()
\ No newline at end of file
+    db_manager.create_tables()
@@ -1,30 +1,261 @@
+import asyncio
 import aiohttp
 import logging
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+from app.config import settings
+from app.metrics import DERIBIT_REQUEST_DURATION, DERIBIT_REQUESTS
 
 logger = logging.getLogger(__name__)
 
+# JSON-RPC error codes Deribit returns when a client exceeds its request credits
+RATE_LIMIT_ERROR_CODES = {10028, 10040}
+
+
+class CircuitBreaker:
+    """
+    Per-endpoint circuit breaker
+
+    After failure_threshold consecutive failures the circuit opens and calls
+    are rejected for reset_timeout seconds; then a single trial call is let
+    through (half-open) and its outcome closes or re-opens the circuit.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+
+    def allow(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        # Open, or half-open with a trial call still in flight
+        if time.monotonic() - self.opened_at < self.reset_timeout:
+            return False
+        self.state = self.HALF_OPEN
+        self.opened_at = time.monotonic()
+        return True
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning("Deribit circuit breaker opened")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+
+# Breakers are shared by every client of the process: the collector creates a
+# client per tick and shard, and an open circuit has to outlive them
+_breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+
+
+def get_breaker(base_url: str, method: str) -> CircuitBreaker:
+    """Process-wide circuit breaker of one endpoint"""
+    key = (base_url, method)
+    breaker = _breakers.get(key)
+    if breaker is None:
+        breaker = _breakers[key] = CircuitBreaker(settings.deribit_breaker_threshold, settings.deribit_breaker_reset)
+    return breaker
+
+
+def reset_breakers():
+    """Forget all breaker state (tests, or after reconfiguring the API URL)"""
+    _breakers.clear()
+
+
 class DeribitClient:
-    def __init__(self):
-        self.base_url = "https://test.deribit.com/api/v2/public/get_index_price"
+    def __init__(
+            self,
+            base_url: Optional[str] = None,
+            max_retries: Optional[int] = None,
+            backoff_base: Optional[float] = None,
+            backoff_max: Optional[float] = None
+    ):
+        self.base_url = (base_url or settings.deribit_api_url).rstrip("/")
+        self.max_retries = settings.deribit_max_retries if max_retries is None else max_retries
+        self.backoff_base = backoff_base or settings.deribit_backoff_base
+        self.backoff_max = backoff_max or settings.deribit_backoff_max
 
         self.headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
         }
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.stats: Dict[str, float] = {
+            "requests": 0, "errors": 0, "retries": 0, "rate_limited": 0,
+            "circuit_rejected": 0, "latency_total": 0.0,
+        }
+
+    def breaker(self, method: str) -> CircuitBreaker:
+        return get_breaker(self.base_url, method)
 
-    async def get_index_price(self, ticker: str):
-        params = {"index_name": ticker}
-        try:
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Lazily create the pooled session bound to the running event loop"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=settings.deribit_connection_limit,
+                ttl_dns_cache=settings.deribit_dns_cache_ttl,
+                keepalive_timeout=settings.deribit_keepalive_timeout,
+            )
+            timeout = aiohttp.ClientTimeout(total=settings.deribit_request_timeout)
+            self._session = aiohttp.ClientSession(
+                headers=self.headers, timeout=timeout, connector=connector
+            )
+        return self._session
 
-            timeout = aiohttp.ClientTimeout(total=15)
-            async with aiohttp.ClientSession(headers=self.headers, timeout=timeout) as session:
-                async with session.get(self.base_url, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return data.get("result", {}).get("index_price")
+    async def close(self):
+        """Close the pooled session and release its connections"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def _backoff(self, attempt: int, rate_limited: bool) -> float:
+        """Full-jitter exponential backoff; rate limits start one step higher"""
+        step = attempt + 1 if rate_limited else attempt
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** step))
+
+    async def _call(
+            self,
+            method: str,
+            params: dict,
+            deadline: Optional[float] = None,
+            full_response: bool = False
+    ) -> Optional[dict]:
+        """
+        Call a public JSON-RPC method over HTTP with retries and a circuit breaker
+
+        Args:
+            method: Endpoint path relative to the API root (e.g. public/get_index_price)
+            params: Query parameters
+            deadline: Give up once loop.time() passes this point (no limit by default)
+            full_response: Return the whole JSON-RPC envelope (with usIn/usOut) instead of "result"
+
+        Returns:
+            The "result" member of the response, or None when the call failed
+        """
+        loop = asyncio.get_running_loop()
+        breaker = self.breaker(method)
+        url = f"{self.base_url}/{method}"
+        ticker = params.get("index_name", "")
+        duration = DERIBIT_REQUEST_DURATION.labels(method, ticker)
+
+        for attempt in range(self.max_retries + 1):
+            if not breaker.allow():
+                self.stats["circuit_rejected"] += 1
+                DERIBIT_REQUESTS.labels(method, ticker, "circuit_open").inc()
+                logger.warning(f"Deribit circuit open for {method}, skipping call")
+                return None
+
+            retryable, rate_limited = False, False
+            started = time.perf_counter()
+            self.stats["requests"] += 1
+            try:
+                request_options = {}
+                if deadline is not None:
+                    remaining = min(deadline - loop.time(), settings.deribit_request_timeout)
+                    request_options["timeout"] = aiohttp.ClientTimeout(total=max(remaining, 0.001))
+                async with self._get_session().get(url, params=params, **request_options) as response:
+                    data = await response.json(content_type=None)
+                    error = data.get("error") if isinstance(data, dict) else None
+
+                    if response.status == 200 and isinstance(data, dict) and error is None and "result" in data:
+                        breaker.record_success()
+                        DERIBIT_REQUESTS.labels(method, ticker, "ok").inc()
+                        return data if full_response else data["result"]
+
+                    if response.status == 200 and error is None:
+                        # Not a JSON-RPC envelope: count it as a failed attempt like a broken connection
+                        retryable = True
+                        logger.error(f"Malformed response from Deribit {method}: {str(data)[:200]}")
                     else:
-                        error_text = await response.text()
-                        logger.error(f"Error from Deribit: {response.status} - {error_text}")
-                        return None
-        except Exception as e:
-            logger.error(f"Connection error to Deribit for {ticker}: {e}")
-            return None
\ No newline at end of file
+                        code = error.get("code") if isinstance(error, dict) else None
+                        rate_limited = response.status == 429 or code in RATE_LIMIT_ERROR_CODES
+                        retryable = rate_limited or response.status >= 500
+                        logger.error(f"Error from Deribit {method}: {response.status} - {error or data}")
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                retryable = True
+                logger.error(f"Connection error to Deribit {method} {params}: {e!r}")
+            finally:
+                elapsed = time.perf_counter() - started
+                self.stats["latency_total"] += elapsed
+                duration.observe(elapsed)
+
+            self.stats["errors"] += 1
+            if rate_limited:
+                # The exchange is healthy, only our credits ran out: back off without tripping the breaker
+                self.stats["rate_limited"] += 1
+                DERIBIT_REQUESTS.labels(method, ticker, "rate_limited").inc()
+            elif retryable:
+                breaker.record_failure()
+                DERIBIT_REQUESTS.labels(method, ticker, "error").inc()
+            else:
+                # The endpoint answered; the request itself was rejected
+                breaker.record_success()
+                DERIBIT_REQUESTS.labels(method, ticker, "rejected").inc()
+                return None
+
+            if attempt == self.max_retries:
+                break
+            delay = self._backoff(attempt, rate_limited)
+            if deadline is not None and loop.time() + delay >= deadline:
+                break
+            self.stats["retries"] += 1
+            await asyncio.sleep(delay)
+
+        return None
+
+    async def get_index_price(self, ticker: str, deadline: Optional[float] = None) -> Optional[float]:
+        result = await self._call("public/get_index_price", {"index_name": ticker}, deadline)
+        return result.get("index_price") if isinstance(result, dict) else None
+
+    async def get_index_quote(
+            self,
+            ticker: str,
+            deadline: Optional[float] = None
+    ) -> Optional[Tuple[float, Optional[int]]]:
+        """
+        Index price together with the exchange-side time of the answer
+
+        Args:
+            ticker: Index name (e.g. btc_usd)
+            deadline: Give up once loop.time() passes this point
+
+        Returns:
+            (price, exchange timestamp in ms taken from usOut), or None when the call failed
+        """
+        data = await self._call("public/get_index_price", {"index_name": ticker}, deadline, full_response=True)
+        if data is None or not isinstance(data["result"], dict) or not data["result"]:
+            return None
+        us_out = data.get("usOut")
+        return data["result"].get("index_price"), None if us_out is None else us_out // 1000
+
+    async def get_index_chart_data(
+            self,
+            ticker: str,
+            range_name: str,
+            deadline: Optional[float] = None
+    ) -> Optional[List[Tuple[int, float]]]:
+        """
+        Historical index prices for one of Deribit's fixed look-back ranges
+
+        Args:
+            ticker: Index name (e.g. btc_usd)
+            range_name: One of 1h, 1d, 2d, 1m, 1y, all
+            deadline: Give up once loop.time() passes this point
+
+        Returns:
+            (timestamp in ms, price) points oldest first, or None when the call failed
+        """
+        result = await self._call(
+            "public/get_index_chart_data", {"index_name": ticker, "range": range_name}, deadline
+        )
+        return None if result is None else [(int(point[0]), float(point[1])) for point in result]
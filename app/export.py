@@ -0,0 +1,115 @@
+"""
+Columnar encoders for bulk history export
+
+Each encoder consumes (id, ticker, price, timestamp) rows chunk by chunk and
+yields bytes as soon as a chunk is encoded, so the full export is never held
+in memory. Arrow and Parquet need pyarrow; the packed binary format has no
+dependencies and loads zero-copy with
+numpy.frombuffer(data, dtype=BINARY_DTYPE).
+"""
+import struct
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+from sqlalchemy import Row
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - exercised only without pyarrow
+    pa = None
+
+# Record layout of the packed binary format (little-endian, 16 bytes per row)
+BINARY_DTYPE = [("timestamp", "<i8"), ("price", "<f8")]
+_BINARY_RECORD = struct.Struct("<qd")
+
+
+class _ChunkSink:
+    """Write-only file object that hands over whatever was written since the last drain"""
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data, self._parts = b"".join(self._parts), []
+        return data
+
+
+async def _columns(rows: AsyncIterator[Row], chunk_size: int) -> AsyncIterator[Tuple[List[int], List[float]]]:
+    timestamps: List[int] = []
+    prices: List[float] = []
+    async for _, _, price, timestamp in rows:
+        timestamps.append(timestamp)
+        prices.append(price)
+        if len(timestamps) >= chunk_size:
+            yield timestamps, prices
+            timestamps, prices = [], []
+    if timestamps:
+        yield timestamps, prices
+
+
+def _arrow_schema():
+    return pa.schema([("timestamp", pa.int64()), ("price", pa.float64())])
+
+
+def _arrow_batch(timestamps: List[int], prices: List[float]):
+    return pa.record_batch(
+        [pa.array(timestamps, pa.int64()), pa.array(prices, pa.float64())], schema=_arrow_schema()
+    )
+
+
+async def encode_arrow(rows: AsyncIterator[Row], chunk_size: int) -> AsyncIterator[bytes]:
+    """Apache Arrow IPC stream, one record batch per chunk"""
+    sink = _ChunkSink()
+    with pa.ipc.new_stream(sink, _arrow_schema()) as writer:
+        async for timestamps, prices in _columns(rows, chunk_size):
+            writer.write_batch(_arrow_batch(timestamps, prices))
+            yield sink.drain()
+    yield sink.drain()
+
+
+async def encode_parquet(rows: AsyncIterator[Row], chunk_size: int) -> AsyncIterator[bytes]:
+    """Parquet file, one row group per chunk"""
+    sink = _ChunkSink()
+    with pq.ParquetWriter(sink, _arrow_schema()) as writer:
+        async for timestamps, prices in _columns(rows, chunk_size):
+            writer.write_batch(_arrow_batch(timestamps, prices))
+            yield sink.drain()
+    yield sink.drain()
+
+
+async def encode_binary(rows: AsyncIterator[Row], chunk_size: int) -> AsyncIterator[bytes]:
+    """Packed little-endian (int64 timestamp, float64 price) records"""
+    async for timestamps, prices in _columns(rows, chunk_size):
+        yield b"".join(map(_BINARY_RECORD.pack, timestamps, prices))
+
+
+# format -> (encoder, media type, file extension, requires pyarrow)
+EXPORT_FORMATS: Dict[str, Tuple[Callable, str, str, bool]] = {
+    "arrow": (encode_arrow, "application/vnd.apache.arrow.stream", "arrows", True),
+    "parquet": (encode_parquet, "application/vnd.apache.parquet", "parquet", True),
+    "binary": (encode_binary, "application/octet-stream", "bin", False),
+}
+
+
+def unavailable_reason(export_format: str) -> Optional[str]:
+    """Explain why a format cannot be produced in this process, if it cannot"""
+    if EXPORT_FORMATS[export_format][3] and pa is None:
+        return f"Export format '{export_format}' requires pyarrow; use format=binary"
+    return None
@@ -0,0 +1,125 @@
+"""
+HTTP validators and freshness headers for price responses
+
+Validators are derived from the rows themselves (newest timestamp, highest
+id and row count), so a conditional request is answered with 304 before
+anything is serialized. Freshness follows the collector: data that can
+still change is fresh until the next tick, a range that ended long enough
+ago that neither the gap backfill nor a spool backlog can still write into
+it is immutable.
+"""
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Callable, Iterable, Optional, Tuple
+from fastapi import Request, Response
+from app.config import settings
+
+
+def http_date(timestamp: int) -> str:
+    return formatdate(timestamp, usegmt=True)
+
+
+def row_validators(rows: Iterable) -> Tuple[str, int]:
+    """
+    ETag and Last-Modified timestamp for (id, ticker, price, timestamp) rows
+
+    Args:
+        rows: Rows of the response in any order
+
+    Returns:
+        (weak ETag, newest timestamp)
+    """
+    newest, highest_id, count = 0, 0, 0
+    for price_id, _, _, timestamp in rows:
+        newest = max(newest, timestamp)
+        highest_id = max(highest_id, price_id)
+        count += 1
+    # Backfilled rows are older than `newest` but still get a higher id
+    return f'W/"{newest}-{highest_id}-{count}"', newest
+
+
+def seconds_to_next_tick(now: Optional[float] = None, cadence: Optional[int] = None) -> int:
+    """Seconds until the next collector tick boundary (at least 1)"""
+    cadence = cadence or settings.collector_cadence
+    now = time.time() if now is None else now
+    return max(1, int(cadence - now % cadence))
+
+
+def settle_seconds() -> int:
+    """Age after which a range no longer receives rows"""
+    if settings.http_cache_settle is not None:
+        return settings.http_cache_settle
+    return settings.backfill_lookback + settings.http_cache_settle_margin
+
+
+def cache_control(upper_bound: Optional[int] = None, now: Optional[float] = None) -> str:
+    """
+    Cache-Control value for a response covering timestamps below upper_bound
+
+    Args:
+        upper_bound: Exclusive end of the range the response covers (open-ended by default)
+        now: Current Unix time (for tests)
+
+    Returns:
+        Immutable for ranges that ended more than settle_seconds() ago,
+        otherwise fresh until the next tick
+    """
+    now = time.time() if now is None else now
+    if upper_bound is not None and upper_bound <= now - settle_seconds():
+        return f"public, max-age={settings.http_cache_immutable_max_age}, immutable"
+    return f"public, max-age={seconds_to_next_tick(now)}"
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    # Weak comparison (RFC 9110 8.8.3.2): W/ prefixes are ignored
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in header.split(","))
+
+
+def is_not_modified(request: Request, etag: str, last_modified: int) -> bool:
+    """Evaluate If-None-Match, falling back to If-Modified-Since when it is absent"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return last_modified <= since
+    return False
+
+
+def conditional_response(
+        request: Request,
+        rows: Iterable,
+        encode: Callable[[], bytes],
+        upper_bound: Optional[int] = None,
+        headers: Optional[dict] = None
+) -> Response:
+    """
+    JSON response with validators, or an empty 304 when the client copy is current
+
+    Args:
+        request: Incoming request carrying the conditional headers
+        rows: (id, ticker, price, timestamp) rows the body is built from
+        encode: Builds the body; not called for a 304
+        upper_bound: Exclusive end of the covered range, for Cache-Control
+        headers: Extra headers sent with both 200 and 304 responses
+
+    Returns:
+        The 200 or 304 response
+    """
+    etag, last_modified = row_validators(rows)
+    response_headers = {
+        "ETag": etag,
+        "Last-Modified": http_date(last_modified),
+        "Cache-Control": cache_control(upper_bound),
+        **(headers or {}),
+    }
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=response_headers)
+    return Response(encode(), media_type="application/json", headers=response_headers)
@@ -0,0 +1,182 @@
+"""
+Live price fan-out from the collector to API clients
+
+The collector publishes every saved price to a Redis channel. Each API
+worker holds a single Redis subscription (PriceHub) and fans messages out to
+its in-process subscribers, so the number of Redis connections does not grow
+with the number of clients.
+"""
+import asyncio
+import json
+import logging
+from typing import Dict, Iterable, Optional, Set
+import redis
+import redis.asyncio as aioredis
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class Subscriber:
+    """
+    One connected client: a bounded queue plus an optional ticker filter
+
+    When the client cannot keep up, the oldest queued update is dropped so
+    memory stays bounded and the client always converges to the latest price.
+    """
+
+    def __init__(self, tickers: Optional[Set[str]], queue_size: int):
+        self.tickers = tickers
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+
+    def offer(self, payload: dict):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(payload)
+
+    async def get(self) -> dict:
+        return await self.queue.get()
+
+
+class PriceHub:
+    """Per-process fan-out of price updates received from Redis pub/sub"""
+
+    def __init__(
+            self,
+            redis_client: Optional[aioredis.Redis] = None,
+            channel: str = "prices:live",
+            queue_size: int = 100,
+            reconnect_delay: float = 1.0
+    ):
+        self.redis = redis_client
+        self.channel = channel
+        self.queue_size = queue_size
+        self.reconnect_delay = reconnect_delay
+        self._by_ticker: Dict[str, Set[Subscriber]] = {}
+        self._all: Set[Subscriber] = set()
+        self._listener: Optional[asyncio.Task] = None
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._all) + sum(len(subs) for subs in self._by_ticker.values())
+
+    def subscribe(self, tickers: Optional[Iterable[str]] = None) -> Subscriber:
+        """
+        Register a client
+
+        Args:
+            tickers: Tickers to receive (all tickers when empty)
+
+        Returns:
+            Subscriber whose queue receives matching updates
+        """
+        wanted = {ticker.lower() for ticker in tickers} if tickers else None
+        subscriber = Subscriber(wanted, self.queue_size)
+        self._register(subscriber)
+        self._ensure_listener()
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        if subscriber.tickers is None:
+            self._all.discard(subscriber)
+            return
+        for ticker in subscriber.tickers:
+            subs = self._by_ticker.get(ticker)
+            if subs is not None:
+                subs.discard(subscriber)
+                if not subs:
+                    del self._by_ticker[ticker]
+
+    def update_filter(self, subscriber: Subscriber, tickers: Optional[Iterable[str]]):
+        """Replace the ticker filter of a connected client"""
+        self.unsubscribe(subscriber)
+        subscriber.tickers = {ticker.lower() for ticker in tickers} if tickers else None
+        self._register(subscriber)
+
+    def _register(self, subscriber: Subscriber):
+        if subscriber.tickers is None:
+            self._all.add(subscriber)
+            return
+        for ticker in subscriber.tickers:
+            self._by_ticker.setdefault(ticker, set()).add(subscriber)
+
+    def dispatch(self, payload: dict):
+        """Deliver one update to every matching subscriber without blocking"""
+        # Looked up first so a payload without a ticker reaches nobody
+        ticker = payload["ticker"]
+        for subscriber in self._all:
+            subscriber.offer(payload)
+        for subscriber in self._by_ticker.get(ticker, ()):
+            subscriber.offer(payload)
+
+    def _ensure_listener(self):
+        if self.redis is not None and (self._listener is None or self._listener.done()):
+            self._listener = asyncio.get_running_loop().create_task(self._listen())
+
+    async def _listen(self):
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    try:
+                        self.dispatch(json.loads(message["data"]))
+                    except (ValueError, KeyError, TypeError) as e:
+                        # One malformed publish must not end the subscription
+                        logger.warning(f"Skipped malformed live price message: {e}")
+            except asyncio.CancelledError:
+                raise
+            except (redis.RedisError, OSError) as e:
+                logger.warning(f"Live price subscription lost: {e}")
+                await asyncio.sleep(self.reconnect_delay)
+            finally:
+                await pubsub.aclose()
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+
+class PricePublisher:
+    """Collector-side publisher of saved prices"""
+
+    def __init__(self, redis_client: Optional[redis.Redis], channel: str = "prices:live"):
+        self.redis = redis_client
+        self.channel = channel
+
+    def publish(self, payloads: Iterable[dict]):
+        if self.redis is None:
+            return
+        try:
+            pipeline = self.redis.pipeline(transaction=False)
+            for payload in payloads:
+                pipeline.publish(self.channel, json.dumps(payload))
+            pipeline.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Live price publish failed: {e}")
+
+
+# Global instances
+price_hub = PriceHub(
+    aioredis.Redis.from_url(settings.live_redis_url),
+    channel=settings.live_channel,
+    queue_size=settings.live_queue_size,
+)
+price_publisher = PricePublisher(
+    redis.Redis.from_url(settings.live_redis_url, socket_timeout=settings.cache_redis_timeout),
+    channel=settings.live_channel,
+)
+
+
+def get_price_hub() -> PriceHub:
+    """Dependency for getting the live price hub"""
+    return price_hub
@@ -1,9 +1,31 @@
-from fastapi import FastAPI, Query, HTTPException
-from datetime import datetime
-from typing import List, Optional
-from app.database import get_db, init_db
-from app.models import PriceData, PriceResponse
-from app.repository import PriceRepository
+from fastapi import Depends, FastAPI, Query, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from datetime import date, datetime, timedelta, timezone
+from typing import AsyncIterator, Callable, Dict, List, Literal, Optional, Union
+import asyncio
+import math
+import orjson
+from sqlalchemy import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import analytics, metrics
+from app.analytics import AnalyticsCache, get_analytics_cache
+from app.cache import LatestPriceCache, get_latest_price_cache
+from app.config import settings
+from app.export import BINARY_DTYPE, EXPORT_FORMATS, unavailable_reason
+from app.http_cache import conditional_response
+from app.live import PriceHub, get_price_hub, price_hub
+from app.database import db_manager, get_async_db, get_async_session_factory, init_db
+from app.models import (
+    OHLC_INTERVALS,
+    ROLLUP_INTERVALS,
+    AnalyticsSeriesResponse,
+    DrawdownResponse,
+    OHLCResponse,
+    PriceData,
+    PriceResponse,
+)
+from app.repository import AsyncPriceRepository
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -14,6 +36,8 @@ app = FastAPI(
     description="API for retrieving cryptocurrency prices from Deribit",
     version="1.0.0"
 )
+if settings.metrics_enabled:
+    app.add_middleware(metrics.MetricsMiddleware)
 
 
 @app.on_event("startup")
@@ -24,82 +48,614 @@ async def startup_event():
     logger.info("Database initialized successfully")
 
 
+# Integers at or above this are read as epoch milliseconds (seconds reach it in year 5138)
+EPOCH_MS_THRESHOLD = 10 ** 11
+
+
+def parse_time_param(value: Optional[str], name: str, end: bool = False) -> Optional[int]:
+    """
+    Convert a time query parameter to a Unix timestamp in seconds
+
+    Accepts epoch seconds or milliseconds, an ISO-8601 date or an ISO-8601
+    datetime; sub-second parts round up. Values without an offset are taken as UTC. Ranges are
+    half-open, so a bare date used as an end bound means the following
+    midnight and the whole day is included.
+    """
+    if not value:
+        return None
+    if value.lstrip("-").isdigit():
+        number = int(value)
+        return -(-number // 1000) if abs(number) >= EPOCH_MS_THRESHOLD else number
+    try:
+        if len(value) == 10:
+            day = date.fromisoformat(value)
+            moment = datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+            return int((moment + timedelta(days=1) if end else moment).timestamp())
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid {name} format. Use YYYY-MM-DD, an ISO-8601 datetime or epoch seconds/milliseconds"
+        )
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    # Stored timestamps are whole seconds: ts >= 12:00:00.5 and ts < 12:00:00.5
+    # are ts >= 12:00:01 and ts < 12:00:01, so both bounds round up
+    return math.ceil(moment.timestamp())
+
+
+def price_dict(row) -> dict:
+    price_id, ticker, price, timestamp = row
+    return {"id": price_id, "ticker": ticker, "price": price, "timestamp": timestamp}
+
+
+def page_limit(limit: Optional[int]) -> Optional[int]:
+    """Rows to fetch for a page: one more than shown, to know whether another page follows"""
+    return None if limit is None else limit + 1
+
+
+def price_rows_response(
+        request: Request,
+        rows,
+        limit: Optional[int],
+        upper_bound: Optional[int] = None
+) -> Response:
+    """
+    Encode (id, ticker, price, timestamp) rows straight to JSON bytes
+
+    Skips ORM -> PriceResponse validation and the generic encoder; the
+    declared response_model still documents the shape in OpenAPI.
+    Pages are fetched with one extra row: the keyset cursor for the next
+    page is exposed only when that row exists, so following it never lands
+    on an empty page. A conditional request for unchanged rows gets a 304
+    without encoding.
+    """
+    headers = {}
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        headers["X-Next-Cursor"] = str(rows[-1][3])
+    return conditional_response(
+        request, rows, lambda: orjson.dumps([price_dict(row) for row in rows]), upper_bound, headers
+    )
+
+
+def payload_row(payload: dict) -> tuple:
+    return payload["id"], payload["ticker"], payload["price"], payload["timestamp"]
+
+
+async def ndjson_lines(rows: AsyncIterator[Row], chunk_size: int) -> AsyncIterator[bytes]:
+    """NDJSON body, one chunk per chunk_size rows instead of one per row"""
+    lines = []
+    async for row in rows:
+        lines.append(orjson.dumps(price_dict(row)))
+        if len(lines) >= chunk_size:
+            yield b"\n".join(lines) + b"\n"
+            lines = []
+    if lines:
+        yield b"\n".join(lines) + b"\n"
+
+
+async def stream_prices(
+        session_factory: Callable[[], AsyncSession],
+        ticker: str,
+        start_timestamp: Optional[int],
+        end_timestamp: Optional[int],
+        not_found_detail: str,
+        encoder: Callable[[AsyncIterator[Row], int], AsyncIterator[bytes]] = ndjson_lines,
+        media_type: str = "application/x-ndjson",
+        ascending: bool = False,
+        headers: Optional[dict] = None
+) -> StreamingResponse:
+    """
+    Stream prices through an incremental encoder (NDJSON by default)
+
+    The response owns its own session: request-scoped dependencies are torn
+    down before a streaming body is sent.
+    """
+    session = session_factory()
+    rows = AsyncPriceRepository(session).stream_by_date_range(
+        ticker, start_timestamp, end_timestamp, chunk_size=settings.stream_chunk_size, ascending=ascending
+    )
+
+    try:
+        first = await rows.__anext__()
+    except StopAsyncIteration:
+        await session.close()
+        raise HTTPException(status_code=404, detail=not_found_detail)
+    except BaseException:
+        # The body never starts, so its finally cannot release the session
+        await session.close()
+        raise
+
+    async def all_rows():
+        yield first
+        async for row in rows:
+            yield row
+
+    async def body():
+        try:
+            async for chunk in encoder(all_rows(), settings.stream_chunk_size):
+                if chunk:
+                    yield chunk
+        finally:
+            await rows.aclose()
+            await session.close()
+
+    return StreamingResponse(body(), media_type=media_type, headers=headers)
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release the live price subscription"""
+    await price_hub.stop()
+
+
+def parse_tickers(tickers: Optional[str]) -> List[str]:
+    """Split a comma-separated ticker list"""
+    return [ticker.strip().lower() for ticker in (tickers or "").split(",") if ticker.strip()]
+
+
+def parse_ticker_batch(tickers: str) -> List[str]:
+    """Parse a batch ticker list, dropping duplicates and enforcing the batch size limit"""
+    wanted = list(dict.fromkeys(parse_tickers(tickers)))
+    if not wanted:
+        raise HTTPException(status_code=400, detail="At least one ticker is required")
+    if len(wanted) > settings.batch_max_tickers:
+        raise HTTPException(status_code=400, detail=f"At most {settings.batch_max_tickers} tickers per request")
+    return wanted
+
+
 @app.get("/", tags=["Health"])
 async def root():
     """Health check endpoint"""
     return {"status": "ok", "message": "Crypto Price API is running"}
 
 
+@app.get("/cache/stats", tags=["Health"])
+async def cache_stats(cache: LatestPriceCache = Depends(get_latest_price_cache)):
+    """Hit/miss counters of the latest-price cache"""
+    return cache.stats
+
+
+@app.get("/db/stats", tags=["Health"])
+async def db_stats():
+    """Connection pool occupancy (saturation = checked_out / capacity) and checkout latency"""
+    return db_manager.pool_stats()
+
+
+@app.get("/metrics", tags=["Health"], include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus scrape endpoint"""
+    body, content_type = metrics.render_latest()
+    return Response(body, media_type=content_type)
+
+
 @app.get("/prices/all", response_model=List[PriceResponse], tags=["Prices"])
-async def get_all_prices(ticker: str = Query(..., description="Currency ticker (e.g., btc_usd, eth_usd)")):
+async def get_all_prices(
+        request: Request,
+        ticker: str = Query(..., description="Currency ticker (e.g., btc_usd, eth_usd)"),
+        limit: Optional[int] = Query(None, ge=1, le=10000, description="Page size"),
+        after: Optional[int] = Query(None, description="Keyset cursor: return prices older than this timestamp"),
+        stream: bool = Query(False, description="Stream all prices as NDJSON"),
+        db: AsyncSession = Depends(get_async_db),
+        session_factory: Callable[[], AsyncSession] = Depends(get_async_session_factory)
+):
     """
     Get all saved prices for specified currency ticker
 
     - **ticker**: Currency ticker (required)
+    - **limit**: Page size; the next page cursor is returned in `X-Next-Cursor` (optional)
+    - **after**: Cursor from the previous page (optional)
+    - **stream**: Stream the full history as NDJSON (optional)
     """
-    db = next(get_db())
-    repository = PriceRepository(db)
+    if stream:
+        return await stream_prices(
+            session_factory, ticker.lower(), None, None, f"No data found for ticker: {ticker}"
+        )
 
-    prices = repository.get_all_by_ticker(ticker.lower())
+    repository = AsyncPriceRepository(db)
+
+    prices = await repository.get_rows_by_date_range(ticker.lower(), limit=page_limit(limit), after=after)
 
     if not prices:
         raise HTTPException(status_code=404, detail=f"No data found for ticker: {ticker}")
 
-    return prices
+    # A page behind a cursor only covers prices older than the cursor
+    return price_rows_response(request, prices, limit, upper_bound=after)
 
 
-@app.get("/prices/latest", response_model=PriceResponse, tags=["Prices"])
-async def get_latest_price(ticker: str = Query(..., description="Currency ticker (e.g., btc_usd, eth_usd)")):
+@app.get(
+    "/prices/latest",
+    response_model=Union[PriceResponse, Dict[str, PriceResponse]],
+    tags=["Prices"]
+)
+async def get_latest_price(
+        request: Request,
+        ticker: Optional[str] = Query(None, description="Currency ticker (e.g., btc_usd, eth_usd)"),
+        tickers: Optional[str] = Query(None, description="Comma-separated tickers; returns an object keyed by ticker"),
+        db: AsyncSession = Depends(get_async_db),
+        cache: LatestPriceCache = Depends(get_latest_price_cache)
+):
     """
     Get the latest price for specified currency ticker
 
-    - **ticker**: Currency ticker (required)
+    - **ticker**: Currency ticker
+    - **tickers**: Several comma-separated tickers resolved in one round-trip; the response
+      maps each ticker to its latest price and omits tickers without data
+
+    One of `ticker` or `tickers` is required. Responses carry an ETag and are
+    cacheable until the next collector tick.
     """
-    db = next(get_db())
-    repository = PriceRepository(db)
+    if tickers is not None:
+        return await get_latest_prices(request, parse_ticker_batch(tickers), db, cache)
+    if not ticker:
+        raise HTTPException(status_code=422, detail="Either ticker or tickers is required")
 
-    price = repository.get_latest_by_ticker(ticker.lower())
+    ticker = ticker.lower()
+    payload = await cache.get(ticker)
+    if payload is None:
+        repository = AsyncPriceRepository(db)
 
-    if not price:
-        raise HTTPException(status_code=404, detail=f"No data found for ticker: {ticker}")
+        price = await repository.get_latest_by_ticker(ticker)
+
+        if not price:
+            raise HTTPException(status_code=404, detail=f"No data found for ticker: {ticker}")
+
+        payload = PriceResponse.model_validate(price).model_dump()
+        await cache.fill(payload)
+    return conditional_response(request, [payload_row(payload)], lambda: orjson.dumps(payload))
+
+
+async def get_latest_prices(
+        request: Request,
+        tickers: List[str],
+        db: AsyncSession,
+        cache: LatestPriceCache
+) -> Response:
+    """Cache lookup with one MGET, then one query for whatever the cache missed"""
+    found = await cache.get_many(tickers)
+    missing = [ticker for ticker in tickers if ticker not in found]
+    if missing:
+        rows = await AsyncPriceRepository(db).get_latest_by_tickers(missing)
+        payloads = [price_dict(row) for row in rows.values()]
+        await cache.fill_many(payloads)
+        found.update((payload["ticker"], payload) for payload in payloads)
 
-    return price
+    if not found:
+        raise HTTPException(status_code=404, detail=f"No data found for tickers: {', '.join(tickers)}")
+    return conditional_response(
+        request,
+        [payload_row(payload) for payload in found.values()],
+        lambda: orjson.dumps({ticker: found[ticker] for ticker in tickers if ticker in found}),
+    )
+
+
+@app.get("/prices/batch", response_model=Dict[str, List[PriceResponse]], tags=["Prices"])
+async def get_prices_batch(
+        request: Request,
+        tickers: str = Query(..., description="Comma-separated tickers"),
+        start_date: Optional[str] = Query(None, description="Inclusive start: ISO-8601 date/datetime or epoch s/ms"),
+        end_date: Optional[str] = Query(None, description="Exclusive end: ISO-8601 date/datetime or epoch s/ms"),
+        order: Literal["asc", "desc"] = Query("desc", description="Sort by timestamp"),
+        limit: Optional[int] = Query(None, ge=1, le=10000, description="Maximum rows per ticker"),
+        db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Get prices of several tickers in [start_date, end_date) with a single query
+
+    - **tickers**: Comma-separated tickers (required)
+    - **start_date**: Inclusive start, ISO-8601 date/datetime or epoch seconds/milliseconds (optional)
+    - **end_date**: Exclusive end, same formats; a bare date includes that whole day (optional)
+    - **order**: `desc` (newest first, default) or `asc` (optional)
+    - **limit**: Maximum rows per ticker (optional)
+
+    The response maps each ticker to its rows and omits tickers without data.
+    """
+    wanted = parse_ticker_batch(tickers)
+    end_timestamp = parse_time_param(end_date, "end_date", end=True)
+    rows = await AsyncPriceRepository(db).get_by_tickers_range(
+        wanted,
+        parse_time_param(start_date, "start_date"),
+        end_timestamp,
+        limit=limit,
+        ascending=order == "asc",
+    )
+    if not rows:
+        raise HTTPException(
+            status_code=404, detail=f"No data found for tickers: {', '.join(wanted)} in specified date range"
+        )
+    return conditional_response(
+        request,
+        [row for ticker_rows in rows.values() for row in ticker_rows],
+        lambda: orjson.dumps({
+            ticker: [price_dict(row) for row in rows[ticker]] for ticker in wanted if ticker in rows
+        }),
+        upper_bound=end_timestamp,
+    )
 
 
 @app.get("/prices/filter", response_model=List[PriceResponse], tags=["Prices"])
 async def get_prices_by_date(
+        request: Request,
         ticker: str = Query(..., description="Currency ticker (e.g., btc_usd, eth_usd)"),
-        start_date: Optional[str] = Query(None, description="Start date in ISO format (YYYY-MM-DD)"),
-        end_date: Optional[str] = Query(None, description="End date in ISO format (YYYY-MM-DD)")
+        start_date: Optional[str] = Query(
+            None, description="Inclusive start: ISO-8601 date/datetime (UTC unless an offset is given) or epoch s/ms"
+        ),
+        end_date: Optional[str] = Query(
+            None, description="Exclusive end: ISO-8601 date/datetime (a date includes that whole day) or epoch s/ms"
+        ),
+        order: Literal["asc", "desc"] = Query("desc", description="Sort by timestamp"),
+        limit: Optional[int] = Query(None, ge=1, le=10000, description="Page size"),
+        after: Optional[int] = Query(None, description="Keyset cursor: continue after this timestamp in sort order"),
+        stream: bool = Query(False, description="Stream matching prices as NDJSON"),
+        db: AsyncSession = Depends(get_async_db),
+        session_factory: Callable[[], AsyncSession] = Depends(get_async_session_factory)
 ):
     """
-    Get prices for specified currency ticker filtered by date range
+    Get prices for specified currency ticker in the half-open range [start_date, end_date)
 
     - **ticker**: Currency ticker (required)
-    - **start_date**: Start date in ISO format (optional)
-    - **end_date**: End date in ISO format (optional)
+    - **start_date**: Start as `YYYY-MM-DD`, ISO-8601 datetime or epoch seconds/milliseconds (optional)
+    - **end_date**: End, same formats; a bare date includes that whole day (optional)
+    - **order**: `desc` (newest first, default) or `asc` (optional)
+    - **limit**: Page size; the next page cursor is returned in `X-Next-Cursor` (optional).
+      "Last N points before T" is `end_date=T&limit=N`
+    - **after**: Cursor from the previous page (optional)
+    - **stream**: Stream matching prices as NDJSON (optional)
+
+    Ranges that ended before the gap backfill's look-back are served as immutable; all
+    responses carry an ETag/Last-Modified for conditional requests.
     """
-    db = next(get_db())
-    repository = PriceRepository(db)
+    repository = AsyncPriceRepository(db)
 
-    start_timestamp = None
-    end_timestamp = None
+    start_timestamp = parse_time_param(start_date, "start_date")
+    end_timestamp = parse_time_param(end_date, "end_date", end=True)
 
-    if start_date:
-        try:
-            start_timestamp = int(datetime.fromisoformat(start_date).timestamp())
-        except ValueError:
-            raise HTTPException(status_code=400, detail="Invalid start_date format. Use YYYY-MM-DD")
+    not_found_detail = f"No data found for ticker: {ticker} in specified date range"
 
-    if end_date:
-        try:
-            end_timestamp = int(datetime.fromisoformat(end_date).timestamp())
-        except ValueError:
-            raise HTTPException(status_code=400, detail="Invalid end_date format. Use YYYY-MM-DD")
+    ascending = order == "asc"
+
+    if stream:
+        return await stream_prices(
+            session_factory, ticker.lower(), start_timestamp, end_timestamp, not_found_detail, ascending=ascending
+        )
 
-    prices = repository.get_by_date_range(ticker.lower(), start_timestamp, end_timestamp)
+    prices = await repository.get_rows_by_date_range(
+        ticker.lower(), start_timestamp, end_timestamp, limit=page_limit(limit), after=after, ascending=ascending
+    )
 
     if not prices:
+        raise HTTPException(status_code=404, detail=not_found_detail)
+
+    upper_bound = end_timestamp
+    if after is not None and not ascending:
+        upper_bound = after if end_timestamp is None else min(after, end_timestamp)
+    return price_rows_response(request, prices, limit, upper_bound)
+
+
+@app.get("/prices/ohlc", response_model=List[OHLCResponse], tags=["Prices"])
+async def get_ohlc(
+        ticker: str = Query(..., description="Currency ticker (e.g., btc_usd, eth_usd)"),
+        interval: Literal["1m", "5m", "1h", "1d"] = Query("1h", description="Bucket size"),
+        start_date: Optional[str] = Query(None, description="Inclusive start: ISO-8601 date/datetime or epoch s/ms"),
+        end_date: Optional[str] = Query(None, description="Exclusive end: ISO-8601 date/datetime or epoch s/ms"),
+        db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Get open/high/low/close buckets for specified currency ticker
+
+    - **ticker**: Currency ticker (required)
+    - **interval**: Bucket size: 1m, 5m, 1h or 1d (optional, default 1h)
+    - **start_date**: Inclusive start, ISO-8601 date/datetime or epoch seconds/milliseconds (optional)
+    - **end_date**: Exclusive end, same formats; a bare date includes that whole day (optional)
+    """
+    repository = AsyncPriceRepository(db)
+
+    start_timestamp = parse_time_param(start_date, "start_date")
+    end_timestamp = parse_time_param(end_date, "end_date", end=True)
+
+    buckets = []
+    if interval in ROLLUP_INTERVALS:
+        buckets = [
+            dict(bucket._mapping) if isinstance(bucket, Row) else bucket
+            for bucket in await repository.get_ohlc_buckets(
+                ticker.lower(), OHLC_INTERVALS[interval], start_timestamp, end_timestamp
+            )
+        ]
+
+    # Fall back to raw data for intervals without rollups
+    if not buckets:
+        buckets = [
+            dict(bucket._mapping) for bucket in await repository.get_ohlc(
+                ticker.lower(), OHLC_INTERVALS[interval], start_timestamp, end_timestamp
+            )
+        ]
+
+    if not buckets:
         raise HTTPException(status_code=404, detail=f"No data found for ticker: {ticker} in specified date range")
 
-    return prices
\ No newline at end of file
+    return [OHLCResponse.model_validate(bucket) for bucket in buckets]
+
+
+@app.get(
+    "/prices/analytics/{metric}",
+    response_model=Union[AnalyticsSeriesResponse, DrawdownResponse],
+    tags=["Prices"]
+)
+async def get_analytics(
+        metric: Literal["returns", "rolling_mean", "ewma", "volatility", "drawdown"],
+        ticker: str = Query(..., description="Currency ticker (e.g., btc_usd, eth_usd)"),
+        window: int = Query(20, ge=1, le=100_000, description="Window (EWMA span) in samples"),
+        start_date: Optional[str] = Query(None, description="Inclusive start: ISO-8601 date/datetime or epoch s/ms"),
+        end_date: Optional[str] = Query(None, description="Exclusive end: ISO-8601 date/datetime or epoch s/ms"),
+        db: AsyncSession = Depends(get_async_db),
+        cache: AnalyticsCache = Depends(get_analytics_cache)
+):
+    """
+    Compute a metric over the price series of a ticker in [start_date, end_date)
+
+    - **metric**: `returns` (log returns), `rolling_mean`, `ewma`, `volatility`
+      (annualized realized volatility over `window` returns) or `drawdown` (maximum drawdown)
+    - **ticker**: Currency ticker (required)
+    - **window**: Window in samples; the span for `ewma` (optional, default 20)
+    - **start_date**: Inclusive start, ISO-8601 date/datetime or epoch seconds/milliseconds (optional)
+    - **end_date**: Exclusive end, same formats; a bare date includes that whole day (optional)
+
+    Series come back as parallel `timestamp`/`value` arrays, oldest first.
+    """
+    ticker = ticker.lower()
+    start_timestamp = parse_time_param(start_date, "start_date")
+    end_timestamp = parse_time_param(end_date, "end_date", end=True)
+    repository = AsyncPriceRepository(db)
+
+    version = await repository.get_series_version(ticker, start_timestamp, end_timestamp)
+    if not version[1]:
+        raise HTTPException(status_code=404, detail=f"No data found for ticker: {ticker} in specified date range")
+
+    key = analytics.cache_key(ticker, start_timestamp, end_timestamp, metric, window, version)
+    body = cache.get(key)
+    if body is None:
+        rows = await repository.get_series(ticker, start_timestamp, end_timestamp)
+
+        def encode() -> bytes:
+            timestamps, prices = analytics.to_arrays(rows)
+            return orjson.dumps(
+                analytics.compute(metric, timestamps, prices, window), option=orjson.OPT_SERIALIZE_NUMPY
+            )
+
+        # Keep the event loop free while NumPy crunches a long range
+        body = await run_in_threadpool(encode)
+        cache.put(key, body)
+    return Response(body, media_type="application/json")
+
+
+@app.get("/prices/stream", tags=["Live"])
+async def stream_live_prices(
+        tickers: Optional[str] = Query(None, description="Comma-separated tickers (all when omitted)"),
+        hub: PriceHub = Depends(get_price_hub)
+):
+    """
+    Push new prices as Server-Sent Events
+
+    - **tickers**: Comma-separated tickers to receive (optional)
+    """
+    wanted = parse_tickers(tickers)
+
+    async def events():
+        # Subscribe only once the body is sent, so a response that is never
+        # streamed cannot leave a subscriber behind
+        subscriber = None
+        try:
+            subscriber = hub.subscribe(wanted)
+            while True:
+                try:
+                    payload = await asyncio.wait_for(subscriber.get(), timeout=settings.live_keepalive_interval)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                yield b"data: " + orjson.dumps(payload) + b"\n\n"
+        finally:
+            if subscriber is not None:
+                hub.unsubscribe(subscriber)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+def parse_filter_message(message) -> Optional[List[str]]:
+    """Tickers of a {"tickers": [...]} filter message, or None when it is malformed"""
+    if not isinstance(message, dict):
+        return None
+    tickers = message.get("tickers")
+    if not isinstance(tickers, list) or not all(isinstance(ticker, str) for ticker in tickers):
+        return None
+    wanted = list(dict.fromkeys(ticker.strip().lower() for ticker in tickers if ticker.strip()))
+    return wanted if len(wanted) <= settings.batch_max_tickers else None
+
+
+@app.websocket("/ws/prices")
+async def websocket_live_prices(
+        websocket: WebSocket,
+        tickers: Optional[str] = Query(None),
+        hub: PriceHub = Depends(get_price_hub)
+):
+    """
+    Push new prices over a WebSocket
+
+    Clients may send {"tickers": ["btc_usd", ...]} at any time to change their
+    filter; an invalid message gets an {"error": ...} frame and is ignored.
+    """
+    await websocket.accept()
+    subscriber = None
+    tasks = set()
+
+    async def receive_filters():
+        while True:
+            try:
+                message = orjson.loads(await websocket.receive_text())
+            except orjson.JSONDecodeError:
+                message = None
+            wanted = parse_filter_message(message)
+            if wanted is None:
+                await websocket.send_json({
+                    "error": f'Expected {{"tickers": [...]}} with at most {settings.batch_max_tickers} tickers'
+                })
+                continue
+            hub.update_filter(subscriber, wanted)
+
+    async def send_prices():
+        while True:
+            await websocket.send_json(await subscriber.get())
+
+    try:
+        subscriber = hub.subscribe(parse_tickers(tickers))
+        tasks = {asyncio.create_task(receive_filters()), asyncio.create_task(send_prices())}
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            error = task.exception()
+            if error is not None and not isinstance(error, WebSocketDisconnect):
+                logger.warning(f"Live price WebSocket closed: {error}")
+    finally:
+        for task in tasks:
+            task.cancel()
+        if subscriber is not None:
+            hub.unsubscribe(subscriber)
+
+
+@app.get("/prices/export", tags=["Prices"], response_class=StreamingResponse)
+async def export_prices(
+        ticker: str = Query(..., description="Currency ticker (e.g., btc_usd, eth_usd)"),
+        start_date: Optional[str] = Query(None, description="Inclusive start: ISO-8601 date/datetime or epoch s/ms"),
+        end_date: Optional[str] = Query(None, description="Exclusive end: ISO-8601 date/datetime or epoch s/ms"),
+        format: Literal["arrow", "parquet", "binary"] = Query("arrow", description="Columnar output format"),
+        session_factory: Callable[[], AsyncSession] = Depends(get_async_session_factory)
+):
+    """
+    Export (timestamp, price) history oldest-first in a columnar format
+
+    - **ticker**: Currency ticker (required)
+    - **start_date**: Inclusive start, ISO-8601 date/datetime or epoch seconds/milliseconds (optional)
+    - **end_date**: Exclusive end, same formats; a bare date includes that whole day (optional)
+    - **format**: `arrow` (IPC stream), `parquet`, or `binary` —
+      packed little-endian int64 timestamp + float64 price records,
+      loadable with `numpy.frombuffer(body, dtype=[("timestamp", "<i8"), ("price", "<f8")])`
+    """
+    reason = unavailable_reason(format)
+    if reason:
+        raise HTTPException(status_code=501, detail=reason)
+
+    encoder, media_type, extension, _ = EXPORT_FORMATS[format]
+    headers = {"Content-Disposition": f'attachment; filename="{ticker.lower()}.{extension}"'}
+    if format == "binary":
+        headers["X-Record-Dtype"] = ",".join(f"{name}:{dtype}" for name, dtype in BINARY_DTYPE)
+
+    return await stream_prices(
+        session_factory,
+        ticker.lower(),
+        parse_time_param(start_date, "start_date"),
+        parse_time_param(end_date, "end_date", end=True),
+        f"No data found for ticker: {ticker} in specified date range",
+        encoder=encoder,
+        media_type=media_type,
+        ascending=True,
+        headers=headers,
+    )
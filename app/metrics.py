@@ -0,0 +1,242 @@
+"""
+Prometheus metrics for the API, the collector and the database layer
+
+With PROMETHEUS_MULTIPROC_DIR set (Celery prefork workers, multi-worker
+uvicorn), every process writes its samples to that directory and
+exposition aggregates them; otherwise the default in-process registry is
+served.
+"""
+import functools
+import inspect
+import os
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, Tuple
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Sub-millisecond to multi-second: covers cached reads as well as exports
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds",
+    "Database statement latency by repository method",
+    ["query", "operation"],
+    buckets=LATENCY_BUCKETS,
+)
+DERIBIT_REQUEST_DURATION = Histogram(
+    "deribit_request_duration_seconds",
+    "Deribit HTTP call latency per attempt",
+    ["method", "ticker"],
+    buckets=LATENCY_BUCKETS,
+)
+DERIBIT_REQUESTS = Counter(
+    "deribit_requests_total",
+    "Deribit HTTP call attempts by outcome",
+    ["method", "ticker", "outcome"],
+)
+TASK_DURATION = Histogram(
+    "celery_task_duration_seconds",
+    "Celery task run time",
+    ["task", "state"],
+    buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0),
+)
+TASK_LAG = Histogram(
+    "celery_task_lag_seconds",
+    "Delay between beat publishing a task and a worker starting it",
+    ["task"],
+    buckets=(0.01, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0),
+)
+DB_POOL_CHECKOUT_DURATION = Histogram(
+    "db_pool_checkout_duration_seconds",
+    "Time to obtain a pooled connection, including waiting for a free slot",
+    ["engine"],
+    buckets=LATENCY_BUCKETS,
+)
+DB_POOL_TIMEOUTS = Counter(
+    "db_pool_timeouts_total",
+    "Checkouts that gave up after pool_timeout",
+    ["engine"],
+)
+DB_POOL_IN_USE = Gauge(
+    "db_pool_connections_in_use",
+    "Connections currently checked out of the pool",
+    ["engine"],
+    multiprocess_mode="livesum",
+)
+TICK_ROWS_WRITTEN = Histogram(
+    "collector_rows_written",
+    "Price rows written per collector tick",
+    buckets=(0, 1, 2, 5, 10, 25, 50, 100, 250, 1000),
+)
+SPOOL_PENDING = Gauge(
+    "collector_spool_pending_rows",
+    "Price rows waiting in the local spool for the database",
+    multiprocess_mode="livemax",
+)
+SPOOL_DEAD = Gauge(
+    "collector_spool_dead_rows",
+    "Rejected price rows kept in spool_dead until requeued",
+    multiprocess_mode="livemax",
+)
+SPOOL_REJECTED = Counter(
+    "collector_spool_rejected_rows_total",
+    "Spooled price rows the database refused, moved to spool_dead",
+)
+
+# Repository method currently issuing statements; read by the engine hooks
+current_query: ContextVar[str] = ContextVar("current_query", default="other")
+
+
+def instrumented(fn: Callable) -> Callable:
+    """Label statements issued inside a repository method with its name"""
+    name = fn.__name__
+
+    if inspect.isasyncgenfunction(fn):
+        @functools.wraps(fn)
+        async def generator_wrapper(*args, **kwargs):
+            generator = fn(*args, **kwargs)
+            try:
+                while True:
+                    # Set per step: the caller's context is shared between yields
+                    token = current_query.set(name)
+                    try:
+                        item = await generator.__anext__()
+                    except StopAsyncIteration:
+                        return
+                    finally:
+                        current_query.reset(token)
+                    yield item
+            finally:
+                await generator.aclose()
+        return generator_wrapper
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def coroutine_wrapper(*args, **kwargs):
+            token = current_query.set(name)
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                current_query.reset(token)
+        return coroutine_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        token = current_query.set(name)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            current_query.reset(token)
+    return wrapper
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_started = time.perf_counter()
+
+
+@functools.lru_cache(maxsize=512)
+def _query_histogram(query: str, statement: str):
+    words = statement.split(None, 1)
+    return DB_QUERY_DURATION.labels(query, words[0].upper() if words else "OTHER")
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_metrics_started", None)
+    if started is not None:
+        _query_histogram(current_query.get(), statement).observe(time.perf_counter() - started)
+
+
+def instrument_engine(engine: Engine):
+    """Time every statement run through a (sync) engine; pass async_engine.sync_engine for async ones"""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording request latency per route template
+
+    Labels use the matched route path (/prices/{...}) rather than the raw
+    URL so that scans and typos cannot blow up label cardinality.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._routes: Dict[Callable, str] = {}
+
+    def _route_label(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        if endpoint not in self._routes:
+            router = scope["app"].router
+            for route in router.routes:
+                if getattr(route, "endpoint", None) is endpoint:
+                    self._routes[endpoint] = route.path
+                    break
+            else:
+                self._routes[endpoint] = "unmatched"
+        return self._routes[endpoint]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = "500"
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUEST_DURATION.labels(
+                scope["method"], self._route_label(scope), status
+            ).observe(time.perf_counter() - started)
+
+
+def multiprocess_enabled() -> bool:
+    return bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+
+def collect_registry() -> CollectorRegistry:
+    """Registry to expose: aggregated across processes in multiprocess mode"""
+    if multiprocess_enabled():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def render_latest() -> Tuple[bytes, str]:
+    """Current metrics in the Prometheus text format, with its content type"""
+    return generate_latest(collect_registry()), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead(pid: int):
+    """Drop a finished worker's live gauges from the multiprocess directory"""
+    if multiprocess_enabled():
+        multiprocess.mark_process_dead(pid)
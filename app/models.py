@@ -1,7 +1,7 @@
 from sqlalchemy import Column, Integer, String, Float, BigInteger, Index
 from sqlalchemy.ext.declarative import declarative_base
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Dict, List, Optional
 
 Base = declarative_base()
 
@@ -10,16 +10,36 @@ class PriceData(Base):
     """SQLAlchemy model for storing cryptocurrency prices"""
     __tablename__ = "price_data"
 
-    id = Column(Integer, primary_key=True, index=True)
-    ticker = Column(String(20), nullable=False, index=True)
+    id = Column(Integer, primary_key=True)
+    ticker = Column(String(20), nullable=False)
     price = Column(Float, nullable=False)
-    timestamp = Column(BigInteger, nullable=False, index=True)
+    timestamp = Column(BigInteger, nullable=False)
+    # Time reported by the exchange, in milliseconds (timestamp is the aligned collector tick)
+    exchange_timestamp = Column(BigInteger, nullable=True)
 
     __table_args__ = (
-        Index('ix_ticker_timestamp', 'ticker', 'timestamp'),
+        # One row per sample: the conflict target of idempotent inserts. INCLUDE lets
+        # PostgreSQL answer range/"last N before T" queries with an index-only scan
+        Index('uq_ticker_timestamp', 'ticker', 'timestamp', unique=True, postgresql_include=['price', 'id']),
     )
 
 
+class PriceRollup(Base):
+    """SQLAlchemy model for incrementally maintained OHLC rollups"""
+    __tablename__ = "price_rollup"
+
+    ticker = Column(String(20), primary_key=True)
+    interval = Column(Integer, primary_key=True)
+    bucket = Column(BigInteger, primary_key=True)
+    open = Column(Float, nullable=False)
+    high = Column(Float, nullable=False)
+    low = Column(Float, nullable=False)
+    close = Column(Float, nullable=False)
+    count = Column(Integer, nullable=False)
+    open_timestamp = Column(BigInteger, nullable=False)
+    close_timestamp = Column(BigInteger, nullable=False)
+
+
 class PriceResponse(BaseModel):
     """Pydantic model for API responses"""
     id: int
@@ -28,4 +48,42 @@ class PriceResponse(BaseModel):
     timestamp: int
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+# Supported OHLC bucket sizes, in seconds
+OHLC_INTERVALS: Dict[str, int] = {
+    "1m": 60,
+    "5m": 5 * 60,
+    "1h": 60 * 60,
+    "1d": 24 * 60 * 60,
+}
+
+# Bucket sizes maintained in price_rollup by the collector
+ROLLUP_INTERVALS = ("1m", "1h", "1d")
+
+
+class OHLCResponse(BaseModel):
+    """Pydantic model for an OHLC bucket"""
+    bucket: int = Field(..., description="Bucket start (Unix timestamp)")
+    open: float
+    high: float
+    low: float
+    close: float
+    count: int
+
+    class Config:
+        from_attributes = True
+
+
+class AnalyticsSeriesResponse(BaseModel):
+    """Pydantic model for a metric series in columnar form"""
+    timestamp: List[int] = Field(..., description="Unix timestamps of the values")
+    value: List[Optional[float]]
+
+
+class DrawdownResponse(BaseModel):
+    """Pydantic model for the maximum drawdown of a range"""
+    max_drawdown: float = Field(..., description="Peak-to-trough decline as a negative fraction")
+    peak_timestamp: int
+    trough_timestamp: int
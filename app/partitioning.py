@@ -0,0 +1,209 @@
+"""
+Monthly range partitioning of price_data on PostgreSQL
+
+price_data.timestamp holds Unix seconds, so each partition covers
+[first second of the month, first second of the next month).
+"""
+from datetime import datetime, timezone
+from typing import Iterator, List, Optional, Tuple
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+import logging
+
+logger = logging.getLogger(__name__)
+
+TABLE = "price_data"
+LEGACY_TABLE = "price_data_legacy"
+ARCHIVE_SCHEMA = "archive"
+
+# Single-column indexes made redundant by uq_ticker_timestamp (and the primary key)
+REDUNDANT_INDEXES = ("ix_price_data_id", "ix_price_data_ticker", "ix_price_data_timestamp")
+
+
+def month_start(year: int, month: int) -> int:
+    """Unix timestamp of the first second of a UTC month"""
+    return int(datetime(year, month, 1, tzinfo=timezone.utc).timestamp())
+
+
+def add_months(year: int, month: int, months: int) -> Tuple[int, int]:
+    index = year * 12 + (month - 1) + months
+    return index // 12, index % 12 + 1
+
+
+def current_month(now: Optional[int] = None) -> datetime:
+    return datetime.fromtimestamp(now, tz=timezone.utc) if now is not None else datetime.now(timezone.utc)
+
+
+def partition_name(year: int, month: int) -> str:
+    return f"{TABLE}_y{year:04d}m{month:02d}"
+
+
+def parse_partition_name(name: str) -> Optional[Tuple[int, int]]:
+    """Inverse of partition_name; None for the default or foreign partitions"""
+    prefix = f"{TABLE}_y"
+    if not name.startswith(prefix) or len(name) != len(prefix) + 7:
+        return None
+    try:
+        return int(name[len(prefix):len(prefix) + 4]), int(name[-2:])
+    except ValueError:
+        return None
+
+
+def months_between(start_ts: int, end_ts: int) -> Iterator[Tuple[int, int]]:
+    """Yield every (year, month) touching the [start_ts, end_ts] interval"""
+    start = datetime.fromtimestamp(start_ts, tz=timezone.utc)
+    end = datetime.fromtimestamp(end_ts, tz=timezone.utc)
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        yield year, month
+        year, month = add_months(year, month, 1)
+
+
+def create_partitioned_table(conn: Connection):
+    """Create price_data as a range-partitioned parent table (no-op if it exists)"""
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {TABLE} (
+            id SERIAL,
+            ticker VARCHAR(20) NOT NULL,
+            price DOUBLE PRECISION NOT NULL,
+            timestamp BIGINT NOT NULL,
+            exchange_timestamp BIGINT,
+            PRIMARY KEY (id, timestamp)
+        ) PARTITION BY RANGE (timestamp)
+    """))
+    conn.execute(text(
+        f"CREATE UNIQUE INDEX IF NOT EXISTS uq_ticker_timestamp ON {TABLE} (ticker, timestamp) INCLUDE (price, id)"
+    ))
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {TABLE}_default PARTITION OF {TABLE} DEFAULT"))
+
+
+def create_partition(conn: Connection, year: int, month: int):
+    next_year, next_month = add_months(year, month, 1)
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {partition_name(year, month)} PARTITION OF {TABLE} "
+        f"FOR VALUES FROM ({month_start(year, month)}) TO ({month_start(next_year, next_month)})"
+    ))
+
+
+def ensure_partitions(conn: Connection, months_ahead: int, now: Optional[int] = None) -> List[str]:
+    """
+    Create partitions for the current month and the following months
+
+    Returns:
+        Names of the partitions that are now guaranteed to exist
+    """
+    current = current_month(now)
+    names = []
+    for offset in range(months_ahead + 1):
+        year, month = add_months(current.year, current.month, offset)
+        create_partition(conn, year, month)
+        names.append(partition_name(year, month))
+    return names
+
+
+def list_partitions(conn: Connection) -> List[str]:
+    return list(conn.execute(text("""
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = :table
+        ORDER BY child.relname
+    """), {"table": TABLE}).scalars())
+
+
+def apply_retention(
+        conn: Connection,
+        retention_months: int,
+        archive: bool = True,
+        now: Optional[int] = None
+) -> List[str]:
+    """
+    Detach partitions entirely older than the retention window
+
+    Detached partitions are moved to the archive schema or dropped. No rows
+    are deleted from live partitions, so there is no DELETE scan or vacuum debt.
+
+    Returns:
+        Names of the partitions that were removed from price_data
+    """
+    current = current_month(now)
+    cutoff = add_months(current.year, current.month, -retention_months)
+
+    if archive:
+        conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}"))
+
+    removed = []
+    for name in list_partitions(conn):
+        bounds = parse_partition_name(name)
+        if bounds is None or bounds >= cutoff:
+            continue
+        conn.execute(text(f"ALTER TABLE {TABLE} DETACH PARTITION {name}"))
+        if archive:
+            conn.execute(text(f"ALTER TABLE {name} SET SCHEMA {ARCHIVE_SCHEMA}"))
+        else:
+            conn.execute(text(f"DROP TABLE {name}"))
+        removed.append(name)
+        logger.info(f"{'Archived' if archive else 'Dropped'} partition {name}")
+    return removed
+
+
+def drop_redundant_indexes(conn: Connection):
+    for name in REDUNDANT_INDEXES:
+        conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+
+def is_partitioned(conn: Connection) -> bool:
+    return bool(conn.execute(text("""
+        SELECT 1 FROM pg_partitioned_table
+        JOIN pg_class ON pg_class.oid = pg_partitioned_table.partrelid
+        WHERE pg_class.relname = :table
+    """), {"table": TABLE}).scalar())
+
+
+def migrate_to_partitioned(engine: Engine, months_ahead: int, keep_legacy: bool = False):
+    """
+    Convert an existing plain price_data table into the partitioned layout
+
+    Runs in one transaction: the old table is renamed, the partitioned parent
+    and every month present in the data are created, rows are copied over and
+    the id sequence is advanced past the highest copied id.
+    """
+    with engine.begin() as conn:
+        if is_partitioned(conn):
+            logger.info("price_data is already partitioned")
+            return
+
+        conn.execute(text(f"ALTER TABLE {TABLE} RENAME TO {LEGACY_TABLE}"))
+        # Free the relation names the partitioned parent is about to claim
+        conn.execute(text(f"ALTER SEQUENCE IF EXISTS {TABLE}_id_seq RENAME TO {LEGACY_TABLE}_id_seq"))
+        conn.execute(text(f"ALTER INDEX IF EXISTS {TABLE}_pkey RENAME TO {LEGACY_TABLE}_pkey"))
+        conn.execute(text("ALTER INDEX IF EXISTS ix_ticker_timestamp RENAME TO ix_ticker_timestamp_legacy"))
+        conn.execute(text("ALTER INDEX IF EXISTS uq_ticker_timestamp RENAME TO uq_ticker_timestamp_legacy"))
+        drop_redundant_indexes(conn)
+        create_partitioned_table(conn)
+
+        bounds = conn.execute(text(f"SELECT min(timestamp), max(timestamp) FROM {LEGACY_TABLE}")).one()
+        if bounds[0] is not None:
+            for year, month in months_between(bounds[0], bounds[1]):
+                create_partition(conn, year, month)
+        ensure_partitions(conn, months_ahead)
+
+        # Tables created before exchange_timestamp existed are copied without it
+        columns = "id, ticker, price, timestamp"
+        if "exchange_timestamp" in {column["name"] for column in inspect(conn).get_columns(LEGACY_TABLE)}:
+            columns += ", exchange_timestamp"
+        # Lowest id first, so the first row written wins over any duplicates
+        conn.execute(text(
+            f"INSERT INTO {TABLE} ({columns}) "
+            f"SELECT {columns} FROM {LEGACY_TABLE} ORDER BY id "
+            "ON CONFLICT (ticker, timestamp) DO NOTHING"
+        ))
+        conn.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{TABLE}', 'id'), "
+            f"COALESCE((SELECT max(id) FROM {TABLE}), 0) + 1, false)"
+        ))
+
+        if not keep_legacy:
+            conn.execute(text(f"DROP TABLE {LEGACY_TABLE}"))
+    logger.info("Migrated price_data to monthly partitions")
@@ -0,0 +1,153 @@
+"""
+Connection pool configuration and instrumentation
+
+Pool sizing, recycling, pre-ping strategy and statement timeouts come from
+Settings, so the API and Celery workers can be tuned independently through
+their environment. Every pool created here times its checkouts and tracks
+connections in use, both as Prometheus metrics and as in-process stats.
+"""
+import time
+from typing import Dict, Optional, Type
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from app import metrics
+from app.config import settings
+
+
+class PoolStats:
+    """Checkout counters of one engine's pool; shared by the pools it recreates"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.engine: Optional[Engine] = None
+
+    def record(self, elapsed: float, timed_out: bool):
+        self.checkouts += 1
+        self.timeouts += timed_out
+        self.wait_total += elapsed
+        self.wait_max = max(self.wait_max, elapsed)
+        metrics.DB_POOL_CHECKOUT_DURATION.labels(self.name).observe(elapsed)
+        if timed_out:
+            metrics.DB_POOL_TIMEOUTS.labels(self.name).inc()
+
+    def snapshot(self) -> Dict[str, float]:
+        """
+        Current pool occupancy and checkout latency
+
+        Returns:
+            checked_out / capacity is the saturation; wait times are in milliseconds
+        """
+        pool = self.engine.pool if self.engine is not None else None
+        queued = isinstance(pool, QueuePool)
+        checked_out = pool.checkedout() if queued else 0
+        capacity = settings.db_pool_size + max(settings.db_max_overflow, 0)
+        return {
+            "checked_out": checked_out,
+            "idle": pool.checkedin() if queued else 0,
+            "capacity": capacity,
+            "saturation": round(checked_out / capacity, 3) if capacity else 0.0,
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_avg_ms": round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+            "wait_max_ms": round(self.wait_max * 1000, 3),
+        }
+
+
+class _TimedCheckout:
+    """Pool mixin timing connect(): queueing for a slot, pinging and opening connections"""
+
+    stats: PoolStats
+
+    def connect(self):
+        started = time.perf_counter()
+        timed_out = False
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            timed_out = True
+            raise
+        finally:
+            self.stats.record(time.perf_counter() - started, timed_out)
+
+
+def timed_pool_class(base: Type[QueuePool], stats: PoolStats) -> Type[QueuePool]:
+    # Bound on a subclass rather than the instance: dispose() recreates the
+    # pool through self.__class__ and would drop instance attributes
+    return type(f"Timed{base.__name__}", (_TimedCheckout, base), {"stats": stats})
+
+
+def is_memory_sqlite(database_url: str) -> bool:
+    url = make_url(database_url)
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def engine_options(database_url: str, stats: Optional[PoolStats] = None, is_async: bool = False) -> dict:
+    """
+    Keyword arguments for create_engine / create_async_engine
+
+    Args:
+        database_url: Database URL the engine is created for
+        stats: Stats object the pool reports checkouts to
+        is_async: Build options for an async engine
+
+    Returns:
+        Pool sizing, pre-ping and connect arguments according to Settings
+    """
+    options: dict = {"pool_pre_ping": settings.db_pre_ping == "always"}
+    if is_memory_sqlite(database_url):
+        # In-memory SQLite lives in a single connection; pool sizing does not apply
+        return options
+
+    options.update(
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_use_lifo=settings.db_pool_use_lifo,
+    )
+    if stats is not None:
+        options["poolclass"] = timed_pool_class(AsyncAdaptedQueuePool if is_async else QueuePool, stats)
+
+    url = make_url(database_url)
+    if url.get_backend_name() == "postgresql" and settings.db_statement_timeout:
+        timeout_ms = str(int(settings.db_statement_timeout * 1000))
+        if url.get_driver_name() == "asyncpg":
+            options["connect_args"] = {"server_settings": {"statement_timeout": timeout_ms}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={timeout_ms}"}
+    return options
+
+
+def monitor_pool(engine: Engine, stats: PoolStats):
+    """
+    Track connections in use and apply the idle pre-ping strategy
+
+    With db_pre_ping = "idle" a connection is pinged on checkout only when it
+    sat in the pool longer than db_pre_ping_idle seconds, so hot connections
+    skip the extra round-trip that pool_pre_ping costs on every checkout.
+    A failed ping raises DisconnectionError and the pool retries with a
+    fresh connection.
+    """
+    stats.engine = engine
+    in_use = metrics.DB_POOL_IN_USE.labels(stats.name)
+    ping_idle = settings.db_pre_ping == "idle"
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        checked_in_at = connection_record.info.get("checked_in_at")
+        if ping_idle and checked_in_at is not None and time.monotonic() - checked_in_at > settings.db_pre_ping_idle:
+            try:
+                engine.dialect.do_ping(dbapi_connection)
+            except Exception as e:
+                raise exc.DisconnectionError(f"Idle connection failed pre-ping: {e}") from e
+        in_use.inc()
+
+    @event.listens_for(engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        connection_record.info["checked_in_at"] = time.monotonic()
+        in_use.dec()
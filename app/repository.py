@@ -1,6 +1,230 @@
+import csv
+import io
+from sqlalchemy import Row, Select, case, delete, func, insert, literal, select, text, true
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List, Optional
-from app.models import PriceData
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple, Union
+from app.metrics import instrumented
+from app.models import OHLC_INTERVALS, ROLLUP_INTERVALS, PriceData, PriceRollup
+
+# (ticker, price, timestamp) with an optional exchange timestamp in milliseconds
+PriceRow = Union[Tuple[str, float, int], Tuple[str, float, int, Optional[int]]]
+
+# Columns of a price row as exposed by the API, in PriceResponse order
+PRICE_COLUMNS = (PriceData.id, PriceData.ticker, PriceData.price, PriceData.timestamp)
+
+
+def ohlc_query(
+        ticker: str,
+        interval: int,
+        start_timestamp: Optional[int] = None,
+        end_timestamp: Optional[int] = None
+) -> Select:
+    """
+    Build an OHLC aggregation over price_data
+
+    Timestamps are integer epoch seconds, so buckets are computed with
+    integer arithmetic; together with window functions for open/close this
+    runs unchanged on PostgreSQL and SQLite. The range is half-open:
+    [start_timestamp, end_timestamp).
+    """
+    bucket = (PriceData.timestamp - PriceData.timestamp % interval).label("bucket")
+    samples = select(
+        bucket,
+        PriceData.price,
+        PriceData.timestamp,
+        func.first_value(PriceData.price).over(
+            partition_by=bucket, order_by=PriceData.timestamp.asc()
+        ).label("open"),
+        func.first_value(PriceData.price).over(
+            partition_by=bucket, order_by=PriceData.timestamp.desc()
+        ).label("close"),
+    ).where(PriceData.ticker == ticker)
+
+    if start_timestamp is not None:
+        samples = samples.where(PriceData.timestamp >= start_timestamp)
+
+    if end_timestamp is not None:
+        samples = samples.where(PriceData.timestamp < end_timestamp)
+
+    samples = samples.subquery()
+    return select(
+        samples.c.bucket,
+        func.max(samples.c.open).label("open"),
+        func.max(samples.c.price).label("high"),
+        func.min(samples.c.price).label("low"),
+        func.max(samples.c.close).label("close"),
+        func.count().label("count"),
+        func.min(samples.c.timestamp).label("open_timestamp"),
+        func.max(samples.c.timestamp).label("close_timestamp"),
+    ).group_by(samples.c.bucket).order_by(samples.c.bucket)
+
+
+def batch_range_query(
+        dialect_name: str,
+        tickers: List[str],
+        start_timestamp: Optional[int] = None,
+        end_timestamp: Optional[int] = None,
+        limit: Optional[int] = None,
+        ascending: bool = False
+) -> Select:
+    """
+    Price rows of several tickers in [start_timestamp, end_timestamp), at most `limit` per ticker
+
+    On PostgreSQL each ticker is resolved by its own LIMIT probe of
+    uq_ticker_timestamp through a LATERAL join over unnest(tickers); elsewhere
+    the per-ticker limit falls back to a row_number() window.
+
+    Returns:
+        Query yielding (id, ticker, price, timestamp) rows grouped by ticker
+    """
+    order = PriceData.timestamp.asc() if ascending else PriceData.timestamp.desc()
+
+    def in_range(query: Select) -> Select:
+        if start_timestamp is not None:
+            query = query.where(PriceData.timestamp >= start_timestamp)
+        if end_timestamp is not None:
+            query = query.where(PriceData.timestamp < end_timestamp)
+        return query
+
+    if limit is not None and dialect_name == "postgresql":
+        wanted = func.unnest(postgresql.array(tickers)).table_valued("ticker").render_derived(name="wanted")
+        per_ticker = in_range(
+            select(*PRICE_COLUMNS).where(PriceData.ticker == wanted.c.ticker)
+        ).order_by(order).limit(limit).lateral("per_ticker")
+        outer_order = per_ticker.c.timestamp.asc() if ascending else per_ticker.c.timestamp.desc()
+        return select(per_ticker).select_from(wanted).join(per_ticker, true()).order_by(
+            per_ticker.c.ticker, outer_order
+        )
+
+    query = in_range(select(*PRICE_COLUMNS).where(PriceData.ticker.in_(tickers)))
+    if limit is None:
+        return query.order_by(PriceData.ticker, order)
+
+    ranked = query.add_columns(
+        func.row_number().over(partition_by=PriceData.ticker, order_by=order).label("position")
+    ).subquery()
+    return select(
+        ranked.c.id, ranked.c.ticker, ranked.c.price, ranked.c.timestamp
+    ).where(ranked.c.position <= limit).order_by(ranked.c.ticker, ranked.c.position)
+
+
+def series_query(
+        ticker: str,
+        start_timestamp: Optional[int] = None,
+        end_timestamp: Optional[int] = None
+) -> Select:
+    """(timestamp, price) of one ticker in [start_timestamp, end_timestamp), oldest first"""
+    query = select(PriceData.timestamp, PriceData.price).where(PriceData.ticker == ticker)
+    if start_timestamp is not None:
+        query = query.where(PriceData.timestamp >= start_timestamp)
+    if end_timestamp is not None:
+        query = query.where(PriceData.timestamp < end_timestamp)
+    return query.order_by(PriceData.timestamp.asc())
+
+
+def series_version_query(
+        ticker: str,
+        start_timestamp: Optional[int] = None,
+        end_timestamp: Optional[int] = None
+) -> Select:
+    """(newest timestamp, row count) of a series: changes whenever rows are added to it"""
+    query = series_query(ticker, start_timestamp, end_timestamp).order_by(None).subquery()
+    return select(func.max(query.c.timestamp), func.count())
+
+
+def group_by_ticker(rows: Iterable[Row]) -> Dict[str, List[Row]]:
+    """Group (id, ticker, price, timestamp) rows by ticker, keeping their order"""
+    grouped: Dict[str, List[Row]] = {}
+    for row in rows:
+        grouped.setdefault(row[1], []).append(row)
+    return grouped
+
+
+def insert_ignoring_duplicates(dialect_name: str):
+    """
+    INSERT into price_data that skips rows whose (ticker, timestamp) already exists
+
+    Retried ticks, overlapping runs and concurrent backfills all converge on a
+    single row per sample without taking locks up front.
+    """
+    if dialect_name == "postgresql":
+        stmt = postgresql.insert(PriceData)
+    elif dialect_name == "sqlite":
+        stmt = sqlite.insert(PriceData)
+    else:
+        raise NotImplementedError(f"Idempotent insert is not supported for {dialect_name}")
+    return stmt.on_conflict_do_nothing(index_elements=[PriceData.ticker, PriceData.timestamp])
+
+
+def duplicate_prices_delete():
+    """DELETE every price row but the first (lowest id) of each (ticker, timestamp)"""
+    ranked = select(
+        PriceData.id,
+        func.row_number().over(
+            partition_by=(PriceData.ticker, PriceData.timestamp), order_by=PriceData.id
+        ).label("position"),
+    ).subquery()
+    return delete(PriceData).where(PriceData.id.in_(select(ranked.c.id).where(ranked.c.position > 1)))
+
+
+def rollup_rows(values: Iterable[dict]) -> List[dict]:
+    """Fold raw price rows into one partial rollup row per (ticker, interval, bucket)"""
+    merged: Dict[tuple, dict] = {}
+    for name in ROLLUP_INTERVALS:
+        interval = OHLC_INTERVALS[name]
+        for row in values:
+            ticker, price, timestamp = row["ticker"], row["price"], row["timestamp"]
+            key = (ticker, interval, timestamp - timestamp % interval)
+            current = merged.get(key)
+            if current is None:
+                merged[key] = {
+                    "ticker": ticker, "interval": interval, "bucket": key[2],
+                    "open": price, "high": price, "low": price, "close": price, "count": 1,
+                    "open_timestamp": timestamp, "close_timestamp": timestamp,
+                }
+                continue
+            current["high"] = max(current["high"], price)
+            current["low"] = min(current["low"], price)
+            current["count"] += 1
+            if timestamp < current["open_timestamp"]:
+                current["open"], current["open_timestamp"] = price, timestamp
+            if timestamp >= current["close_timestamp"]:
+                current["close"], current["close_timestamp"] = price, timestamp
+    return list(merged.values())
+
+
+def rollup_upsert(dialect_name: str, rows: List[dict]):
+    """
+    Build an upsert merging partial rollup rows into the current buckets
+
+    Only the touched buckets are updated; nothing is recomputed from raw data.
+    """
+    if dialect_name == "postgresql":
+        stmt = postgresql.insert(PriceRollup).values(rows)
+    elif dialect_name == "sqlite":
+        stmt = sqlite.insert(PriceRollup).values(rows)
+    else:
+        raise NotImplementedError(f"Rollup upsert is not supported for {dialect_name}")
+
+    new, old = stmt.excluded, PriceRollup.__table__.c
+    return stmt.on_conflict_do_update(
+        index_elements=[old.ticker, old.interval, old.bucket],
+        set_={
+            "high": case((new.high > old.high, new.high), else_=old.high),
+            "low": case((new.low < old.low, new.low), else_=old.low),
+            "count": old.count + new.count,
+            "open": case((new.open_timestamp < old.open_timestamp, new.open), else_=old.open),
+            "open_timestamp": case(
+                (new.open_timestamp < old.open_timestamp, new.open_timestamp), else_=old.open_timestamp
+            ),
+            "close": case((new.close_timestamp >= old.close_timestamp, new.close), else_=old.close),
+            "close_timestamp": case(
+                (new.close_timestamp >= old.close_timestamp, new.close_timestamp), else_=old.close_timestamp
+            ),
+        }
+    )
 
 
 class PriceRepository:
@@ -9,9 +233,10 @@ class PriceRepository:
     def __init__(self, session: Session):
         self.session = session
 
+    @instrumented
     def save_price(self, ticker: str, price: float, timestamp: int) -> PriceData:
         """
-        Save a new price record to database
+        Save a price record, keeping the existing one if (ticker, timestamp) is already stored
 
         Args:
             ticker: Currency ticker symbol
@@ -19,14 +244,215 @@ class PriceRepository:
             timestamp: Unix timestamp
 
         Returns:
-            Created PriceData object
+            Created (or previously stored) PriceData object
         """
-        price_data = PriceData(ticker=ticker, price=price, timestamp=timestamp)
-        self.session.add(price_data)
-        self.session.commit()
-        self.session.refresh(price_data)
-        return price_data
+        created = self.save_prices_bulk([(ticker, price, timestamp)], refresh=True)
+        if created:
+            return created[0]
+        return self.session.scalar(
+            select(PriceData).where(PriceData.ticker == ticker, PriceData.timestamp == timestamp)
+        )
+
+    @instrumented
+    def save_prices_bulk(
+            self,
+            rows: Iterable[PriceRow],
+            refresh: bool = False,
+            use_copy: bool = False,
+            rollups: bool = False
+    ) -> Union[int, List[PriceData]]:
+        """
+        Save a batch of price records in a single transaction
+
+        Rows whose (ticker, timestamp) is already stored, in the table or
+        earlier in the batch, are skipped, so retries and overlapping
+        backfills are safe to repeat.
 
+        Args:
+            rows: Iterable of (ticker, price, timestamp[, exchange_timestamp]) tuples
+            refresh: Return the created PriceData objects
+            use_copy: Stage rows with COPY before the insert (PostgreSQL only)
+            rollups: Also merge the inserted rows into price_rollup in the same transaction
+
+        Returns:
+            Number of inserted rows, or list of created PriceData objects when refresh is set
+        """
+        values = [
+            {"ticker": row[0], "price": row[1], "timestamp": row[2],
+             "exchange_timestamp": row[3] if len(row) > 3 else None}
+            for row in rows
+        ]
+        if not values:
+            return [] if refresh else 0
+
+        dialect_name = self.session.get_bind().dialect.name
+        stmt = insert_ignoring_duplicates(dialect_name)
+        try:
+            if refresh:
+                created = list(self.session.scalars(stmt.returning(PriceData), values))
+                inserted = [
+                    {"ticker": row.ticker, "price": row.price, "timestamp": row.timestamp} for row in created
+                ]
+            elif use_copy and dialect_name == "postgresql":
+                inserted = [row._asdict() for row in self._copy_rows(values)]
+            else:
+                inserted = [
+                    row._asdict() for row in self.session.execute(
+                        stmt.returning(PriceData.ticker, PriceData.price, PriceData.timestamp), values
+                    )
+                ]
+            # Only rows that were actually written may count towards the rollups
+            if rollups and inserted:
+                self.session.execute(rollup_upsert(dialect_name, rollup_rows(inserted)))
+            self.session.commit()
+        except Exception:
+            self.session.rollback()
+            raise
+
+        return created if refresh else len(inserted)
+
+    def _copy_rows(self, values: List[dict]) -> List[Row]:
+        """
+        COPY rows into a temporary staging table, then move them into price_data
+
+        COPY itself has no ON CONFLICT clause; the INSERT ... SELECT from the
+        stage skips existing (ticker, timestamp) pairs.
+
+        Returns:
+            (ticker, price, timestamp) of the rows that were inserted
+        """
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in values:
+            # An empty unquoted field is NULL in CSV COPY
+            exchange_timestamp = row["exchange_timestamp"]
+            writer.writerow((
+                row["ticker"], repr(row["price"]), row["timestamp"],
+                "" if exchange_timestamp is None else exchange_timestamp
+            ))
+        buffer.seek(0)
+
+        table = PriceData.__tablename__
+        self.session.execute(text(
+            f"CREATE TEMPORARY TABLE IF NOT EXISTS {table}_stage "
+            "(ticker VARCHAR(20), price DOUBLE PRECISION, timestamp BIGINT, exchange_timestamp BIGINT) "
+            "ON COMMIT DELETE ROWS"
+        ))
+        cursor = self.session.connection().connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {table}_stage (ticker, price, timestamp, exchange_timestamp) FROM STDIN WITH (FORMAT csv)",
+                buffer
+            )
+        finally:
+            cursor.close()
+        return self.session.execute(text(
+            f"INSERT INTO {table} (ticker, price, timestamp, exchange_timestamp) "
+            f"SELECT ticker, price, timestamp, exchange_timestamp FROM {table}_stage "
+            "ON CONFLICT (ticker, timestamp) DO NOTHING "
+            "RETURNING ticker, price, timestamp"
+        )).all()
+
+    @instrumented
+    def rebuild_rollups(self, ticker: Optional[str] = None) -> int:
+        """
+        Recompute price_rollup from raw price data
+
+        Args:
+            ticker: Rebuild only this ticker (all tickers by default)
+
+        Returns:
+            Number of rollup rows written
+        """
+        tickers = [ticker] if ticker else self.session.scalars(select(PriceData.ticker).distinct()).all()
+        written = 0
+
+        for name in ROLLUP_INTERVALS:
+            interval = OHLC_INTERVALS[name]
+            for current in tickers:
+                buckets = ohlc_query(current, interval).subquery()
+                self.session.execute(delete(PriceRollup).where(
+                    PriceRollup.ticker == current, PriceRollup.interval == interval
+                ))
+                result = self.session.execute(insert(PriceRollup).from_select(
+                    ["ticker", "interval", "bucket", "open", "high", "low", "close", "count",
+                     "open_timestamp", "close_timestamp"],
+                    select(
+                        literal(current), literal(interval), buckets.c.bucket,
+                        buckets.c.open, buckets.c.high, buckets.c.low, buckets.c.close,
+                        buckets.c.count, buckets.c.open_timestamp, buckets.c.close_timestamp
+                    )
+                ))
+                written += result.rowcount
+                self.session.commit()
+
+        return written
+
+    @instrumented
+    def tickers_missing_rollups(self) -> List[str]:
+        """
+        Find tickers with raw prices that their rollups do not count
+
+        Rollups are maintained from the moment the collector started writing
+        them; history saved before that is only covered after a rebuild.
+        Daily rollups are compared since they have the fewest rows, and only
+        a shortfall counts: retention may drop raw partitions while their
+        rollups are kept.
+
+        Returns:
+            Tickers whose rollups need a rebuild
+        """
+        daily = OHLC_INTERVALS[ROLLUP_INTERVALS[-1]]
+        rolled = dict(self.session.execute(
+            select(PriceRollup.ticker, func.sum(PriceRollup.count))
+            .where(PriceRollup.interval == daily)
+            .group_by(PriceRollup.ticker)
+        ).all())
+        raw = self.session.execute(
+            select(PriceData.ticker, func.count()).group_by(PriceData.ticker)
+        ).all()
+        return [ticker for ticker, count in raw if (rolled.get(ticker) or 0) < count]
+
+    @instrumented
+    def find_gaps(
+            self,
+            ticker: str,
+            cadence: int,
+            start_timestamp: Optional[int] = None,
+            tolerance: float = 1.5
+    ) -> List[Tuple[int, int]]:
+        """
+        Find holes in a ticker's series against the expected cadence
+
+        Compares each sample with its predecessor via LAG() over
+        uq_ticker_timestamp, so only (ticker, timestamp) index entries are read.
+
+        Args:
+            ticker: Currency ticker symbol
+            cadence: Expected seconds between samples
+            start_timestamp: Only look at samples from this point on
+            tolerance: A step longer than cadence * tolerance counts as a gap
+
+        Returns:
+            List of (last timestamp before the gap, first timestamp after it)
+        """
+        previous = func.lag(PriceData.timestamp).over(order_by=PriceData.timestamp)
+        steps = select(
+            PriceData.timestamp.label("timestamp"), previous.label("previous")
+        ).where(PriceData.ticker == ticker)
+
+        if start_timestamp is not None:
+            steps = steps.where(PriceData.timestamp >= start_timestamp)
+
+        steps = steps.subquery()
+        result = self.session.execute(
+            select(steps.c.previous, steps.c.timestamp)
+            .where(steps.c.timestamp - steps.c.previous > cadence * tolerance)
+            .order_by(steps.c.previous)
+        )
+        return [(row.previous, row.timestamp) for row in result]
+
+    @instrumented
     def get_all_by_ticker(self, ticker: str) -> List[PriceData]:
         """
         Get all price records for a specific ticker
@@ -41,6 +467,7 @@ class PriceRepository:
             PriceData.ticker == ticker
         ).order_by(PriceData.timestamp.desc()).all()
 
+    @instrumented
     def get_latest_by_ticker(self, ticker: str) -> Optional[PriceData]:
         """
         Get the most recent price for a specific ticker
@@ -55,6 +482,7 @@ class PriceRepository:
             PriceData.ticker == ticker
         ).order_by(PriceData.timestamp.desc()).first()
 
+    @instrumented
     def get_by_date_range(
             self,
             ticker: str,
@@ -66,8 +494,8 @@ class PriceRepository:
 
         Args:
             ticker: Currency ticker symbol
-            start_timestamp: Start of date range (Unix timestamp)
-            end_timestamp: End of date range (Unix timestamp)
+            start_timestamp: Start of date range, inclusive (Unix timestamp)
+            end_timestamp: End of date range, exclusive (Unix timestamp)
 
         Returns:
             List of PriceData objects within date range
@@ -78,6 +506,406 @@ class PriceRepository:
             query = query.filter(PriceData.timestamp >= start_timestamp)
 
         if end_timestamp is not None:
-            query = query.filter(PriceData.timestamp <= end_timestamp)
+            query = query.filter(PriceData.timestamp < end_timestamp)
+
+        return query.order_by(PriceData.timestamp.desc()).all()
+
+    @instrumented
+    def get_latest_by_tickers(self, tickers: List[str]) -> Dict[str, Row]:
+        """
+        Get the most recent price of several tickers in one query
+
+        Args:
+            tickers: Currency ticker symbols
+
+        Returns:
+            Ticker -> (id, ticker, price, timestamp) row; tickers without data are omitted
+        """
+        if not tickers:
+            return {}
+        query = batch_range_query(self.session.get_bind().dialect.name, tickers, limit=1)
+        return {row[1]: row for row in self.session.execute(query)}
+
+    @instrumented
+    def get_by_tickers_range(
+            self,
+            tickers: List[str],
+            start_timestamp: Optional[int] = None,
+            end_timestamp: Optional[int] = None,
+            limit: Optional[int] = None,
+            ascending: bool = False
+    ) -> Dict[str, List[Row]]:
+        """
+        Get price rows of several tickers in one query
+
+        Args:
+            tickers: Currency ticker symbols
+            start_timestamp: Start of date range, inclusive (Unix timestamp)
+            end_timestamp: End of date range, exclusive (Unix timestamp)
+            limit: Maximum number of rows per ticker
+            ascending: Oldest first instead of newest first
+
+        Returns:
+            Ticker -> (id, ticker, price, timestamp) rows; tickers without data are omitted
+        """
+        if not tickers:
+            return {}
+        query = batch_range_query(
+            self.session.get_bind().dialect.name, tickers, start_timestamp, end_timestamp, limit, ascending
+        )
+        return group_by_ticker(self.session.execute(query))
+
+    @instrumented
+    def get_series(
+            self,
+            ticker: str,
+            start_timestamp: Optional[int] = None,
+            end_timestamp: Optional[int] = None
+    ) -> List[Row]:
+        """
+        Get a ticker's prices as a compact series for columnar analysis
+
+        Args:
+            ticker: Currency ticker symbol
+            start_timestamp: Start of date range, inclusive (Unix timestamp)
+            end_timestamp: End of date range, exclusive (Unix timestamp)
+
+        Returns:
+            (timestamp, price) rows, oldest first
+        """
+        return self.session.execute(series_query(ticker, start_timestamp, end_timestamp)).all()
+
+
+class AsyncPriceRepository:
+    """Async counterpart of PriceRepository for use in the API event loop"""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    @staticmethod
+    def _range_query(
+            ticker: str,
+            start_timestamp: Optional[int] = None,
+            end_timestamp: Optional[int] = None,
+            after: Optional[int] = None,
+            limit: Optional[int] = None,
+            ascending: bool = False
+    ) -> Select:
+        """
+        Keyset query over uq_ticker_timestamp for [start_timestamp, end_timestamp)
+
+        Newest first unless ascending is set; `after` continues past the
+        last timestamp of the previous page in the same direction.
+        """
+        query = select(PriceData).where(PriceData.ticker == ticker)
+
+        if start_timestamp is not None:
+            query = query.where(PriceData.timestamp >= start_timestamp)
+
+        if end_timestamp is not None:
+            query = query.where(PriceData.timestamp < end_timestamp)
+
+        if after is not None:
+            query = query.where(PriceData.timestamp > after if ascending else PriceData.timestamp < after)
 
-        return query.order_by(PriceData.timestamp.desc()).all()
\ No newline at end of file
+        query = query.order_by(PriceData.timestamp.asc() if ascending else PriceData.timestamp.desc())
+        if limit is not None:
+            query = query.limit(limit)
+        return query
+
+    @instrumented
+    async def get_all_by_ticker(
+            self,
+            ticker: str,
+            limit: Optional[int] = None,
+            after: Optional[int] = None
+    ) -> List[PriceData]:
+        """
+        Get all price records for a specific ticker
+
+        Args:
+            ticker: Currency ticker symbol
+            limit: Maximum number of records (page size)
+            after: Keyset cursor, only records older than this timestamp are returned
+
+        Returns:
+            List of PriceData objects
+        """
+        return await self.get_by_date_range(ticker, limit=limit, after=after)
+
+    @instrumented
+    async def get_latest_by_ticker(self, ticker: str) -> Optional[PriceData]:
+        """
+        Get the most recent price for a specific ticker
+
+        Args:
+            ticker: Currency ticker symbol
+
+        Returns:
+            Latest PriceData object or None
+        """
+        return await self.session.scalar(self._range_query(ticker, limit=1))
+
+    @instrumented
+    async def get_by_date_range(
+            self,
+            ticker: str,
+            start_timestamp: Optional[int] = None,
+            end_timestamp: Optional[int] = None,
+            limit: Optional[int] = None,
+            after: Optional[int] = None,
+            ascending: bool = False
+    ) -> List[PriceData]:
+        """
+        Get price records filtered by date range
+
+        Args:
+            ticker: Currency ticker symbol
+            start_timestamp: Start of date range, inclusive (Unix timestamp)
+            end_timestamp: End of date range, exclusive (Unix timestamp)
+            limit: Maximum number of records (page size)
+            after: Keyset cursor, only records past this timestamp (in sort order) are returned
+            ascending: Oldest first instead of newest first
+
+        Returns:
+            List of PriceData objects within date range
+        """
+        result = await self.session.scalars(
+            self._range_query(ticker, start_timestamp, end_timestamp, after, limit, ascending)
+        )
+        return list(result)
+
+    @instrumented
+    async def get_rows_by_date_range(
+            self,
+            ticker: str,
+            start_timestamp: Optional[int] = None,
+            end_timestamp: Optional[int] = None,
+            limit: Optional[int] = None,
+            after: Optional[int] = None,
+            ascending: bool = False
+    ) -> List[Row]:
+        """
+        Same as get_by_date_range, but returns plain column tuples instead of ORM objects
+
+        Returns:
+            (id, ticker, price, timestamp) rows within date range
+        """
+        result = await self.session.execute(
+            self._range_query(
+                ticker, start_timestamp, end_timestamp, after, limit, ascending
+            ).with_only_columns(*PRICE_COLUMNS)
+        )
+        return result.all()
+
+    @instrumented
+    async def get_latest_by_tickers(self, tickers: List[str]) -> Dict[str, Row]:
+        """
+        Get the most recent price of several tickers in one query
+
+        Args:
+            tickers: Currency ticker symbols
+
+        Returns:
+            Ticker -> (id, ticker, price, timestamp) row; tickers without data are omitted
+        """
+        if not tickers:
+            return {}
+        query = batch_range_query(self.session.get_bind().dialect.name, tickers, limit=1)
+        return {row[1]: row for row in await self.session.execute(query)}
+
+    @instrumented
+    async def get_by_tickers_range(
+            self,
+            tickers: List[str],
+            start_timestamp: Optional[int] = None,
+            end_timestamp: Optional[int] = None,
+            limit: Optional[int] = None,
+            ascending: bool = False
+    ) -> Dict[str, List[Row]]:
+        """
+        Get price rows of several tickers in one query
+
+        Args:
+            tickers: Currency ticker symbols
+            start_timestamp: Start of date range, inclusive (Unix timestamp)
+            end_timestamp: End of date range, exclusive (Unix timestamp)
+            limit: Maximum number of rows per ticker
+            ascending: Oldest first instead of newest first
+
+        Returns:
+            Ticker -> (id, ticker, price, timestamp) rows; tickers without data are omitted
+        """
+        if not tickers:
+            return {}
+        query = batch_range_query(
+            self.session.get_bind().dialect.name, tickers, start_timestamp, end_timestamp, limit, ascending
+        )
+        return group_by_ticker(await self.session.execute(query))
+
+    @instrumented
+    async def get_series(
+            self,
+            ticker: str,
+            start_timestamp: Optional[int] = None,
+            end_timestamp: Optional[int] = None
+    ) -> List[Row]:
+        """
+        Get a ticker's prices as a compact series for columnar analysis
+
+        Args:
+            ticker: Currency ticker symbol
+            start_timestamp: Start of date range, inclusive (Unix timestamp)
+            end_timestamp: End of date range, exclusive (Unix timestamp)
+
+        Returns:
+            (timestamp, price) rows, oldest first
+        """
+        result = await self.session.execute(series_query(ticker, start_timestamp, end_timestamp))
+        return result.all()
+
+    @instrumented
+    async def get_series_version(
+            self,
+            ticker: str,
+            start_timestamp: Optional[int] = None,
+            end_timestamp: Optional[int] = None
+    ) -> Tuple[Optional[int], int]:
+        """
+        Get the newest timestamp and row count of a series without loading it
+
+        Args:
+            ticker: Currency ticker symbol
+            start_timestamp: Start of date range, inclusive (Unix timestamp)
+            end_timestamp: End of date range, exclusive (Unix timestamp)
+
+        Returns:
+            (newest timestamp or None when empty, number of rows)
+        """
+        result = await self.session.execute(series_version_query(ticker, start_timestamp, end_timestamp))
+        newest, count = result.one()
+        return newest, count
+
+    @instrumented
+    async def get_ohlc(
+            self,
+            ticker: str,
+            interval: int,
+            start_timestamp: Optional[int] = None,
+            end_timestamp: Optional[int] = None
+    ) -> List[Row]:
+        """
+        Aggregate prices into OHLC buckets in the database
+
+        Args:
+            ticker: Currency ticker symbol
+            interval: Bucket size in seconds
+            start_timestamp: Start of date range, inclusive (Unix timestamp)
+            end_timestamp: End of date range, exclusive (Unix timestamp)
+
+        Returns:
+            (bucket, open, high, low, close, count) rows, oldest bucket first
+        """
+        result = await self.session.execute(
+            ohlc_query(ticker, interval, start_timestamp, end_timestamp)
+        )
+        return list(result)
+
+    @instrumented
+    async def get_rollups(
+            self,
+            ticker: str,
+            interval: int,
+            start_timestamp: Optional[int] = None,
+            end_timestamp: Optional[int] = None
+    ) -> List[PriceRollup]:
+        """
+        Get precomputed OHLC buckets lying entirely inside a date range
+
+        Args:
+            ticker: Currency ticker symbol
+            interval: Bucket size in seconds (must be one of ROLLUP_INTERVALS)
+            start_timestamp: Start of date range, inclusive (Unix timestamp)
+            end_timestamp: End of date range, exclusive (Unix timestamp)
+
+        Returns:
+            List of PriceRollup objects, oldest bucket first
+        """
+        query = select(PriceRollup).where(
+            PriceRollup.ticker == ticker, PriceRollup.interval == interval
+        )
+
+        if start_timestamp is not None:
+            query = query.where(PriceRollup.bucket >= start_timestamp)
+
+        if end_timestamp is not None:
+            query = query.where(PriceRollup.bucket <= end_timestamp - interval)
+
+        result = await self.session.scalars(query.order_by(PriceRollup.bucket))
+        return list(result)
+
+    async def get_ohlc_buckets(
+            self,
+            ticker: str,
+            interval: int,
+            start_timestamp: Optional[int] = None,
+            end_timestamp: Optional[int] = None
+    ) -> List[Union[Row, PriceRollup]]:
+        """
+        OHLC buckets from rollups, with partial edge buckets aggregated from raw data
+
+        A bound that cuts through a bucket only covers part of it, so that
+        bucket is aggregated from raw prices within [start_timestamp,
+        end_timestamp), exactly as get_ohlc does; whole buckets come from
+        the rollups.
+
+        Args:
+            ticker: Currency ticker symbol
+            interval: Bucket size in seconds (must be one of ROLLUP_INTERVALS)
+            start_timestamp: Start of date range, inclusive (Unix timestamp)
+            end_timestamp: End of date range, exclusive (Unix timestamp)
+
+        Returns:
+            Raw OHLC rows and PriceRollup objects, oldest bucket first
+        """
+        whole_start = None if start_timestamp is None else -(-start_timestamp // interval) * interval
+        whole_end = None if end_timestamp is None else end_timestamp // interval * interval
+        if whole_start is not None and whole_end is not None and whole_start >= whole_end:
+            return await self.get_ohlc(ticker, interval, start_timestamp, end_timestamp)
+
+        head = []
+        if start_timestamp is not None and whole_start != start_timestamp:
+            head = await self.get_ohlc(ticker, interval, start_timestamp, whole_start)
+        tail = []
+        if end_timestamp is not None and whole_end != end_timestamp:
+            tail = await self.get_ohlc(ticker, interval, whole_end, end_timestamp)
+        return head + await self.get_rollups(ticker, interval, whole_start, whole_end) + tail
+
+    @instrumented
+    async def stream_by_date_range(
+            self,
+            ticker: str,
+            start_timestamp: Optional[int] = None,
+            end_timestamp: Optional[int] = None,
+            chunk_size: int = 1000,
+            ascending: bool = False
+    ) -> AsyncIterator[Row]:
+        """
+        Stream price rows without materializing the full result
+
+        Args:
+            ticker: Currency ticker symbol
+            start_timestamp: Start of date range, inclusive (Unix timestamp)
+            end_timestamp: End of date range, exclusive (Unix timestamp)
+            chunk_size: Rows fetched from the server-side cursor per round-trip
+            ascending: Oldest first instead of newest first
+
+        Yields:
+            (id, ticker, price, timestamp) rows
+        """
+        query = self._range_query(
+            ticker, start_timestamp, end_timestamp, ascending=ascending
+        ).with_only_columns(*PRICE_COLUMNS)
+        result = await self.session.stream(query.execution_options(yield_per=chunk_size))
+        async for row in result:
+            yield row
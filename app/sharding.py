@@ -0,0 +1,50 @@
+"""
+Consistent-hash partitioning of tickers into collector shards
+
+Each shard owns many points on a hash ring, so adding or removing a shard
+only moves the tickers adjacent to its points instead of reshuffling all
+of them.
+"""
+import bisect
+import hashlib
+from typing import Dict, List
+
+
+def _hash(key: str) -> int:
+    # Stable across processes, unlike the salted built-in hash()
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    """Consistent-hash ring over numbered shards"""
+
+    def __init__(self, shards: int, replicas: int = 100):
+        if shards < 1:
+            raise ValueError("At least one shard is required")
+        self.shards = shards
+        points = sorted(
+            (_hash(f"shard-{shard}:{replica}"), shard)
+            for shard in range(shards)
+            for replica in range(replicas)
+        )
+        self._keys = [key for key, _ in points]
+        self._owners = [shard for _, shard in points]
+
+    def shard_for(self, ticker: str) -> int:
+        index = bisect.bisect(self._keys, _hash(ticker)) % len(self._keys)
+        return self._owners[index]
+
+    def partition(self, tickers: List[str]) -> Dict[int, List[str]]:
+        """
+        Group tickers by owning shard
+
+        Args:
+            tickers: Tickers to distribute
+
+        Returns:
+            Shard number -> its tickers in input order (shards without tickers are omitted)
+        """
+        shards: Dict[int, List[str]] = {}
+        for ticker in tickers:
+            shards.setdefault(self.shard_for(ticker), []).append(ticker)
+        return shards
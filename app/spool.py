@@ -0,0 +1,328 @@
+"""
+Local write-ahead spool between the collector and the database
+
+Collector ticks append their rows to an SQLite file in WAL mode and return;
+a flusher drains the file into the database in bulk. A slow or unavailable
+database therefore neither stretches ticks nor loses samples: rows stay
+spooled until a flush commits them. Rows are removed only after that
+commit, and inserts skip existing (ticker, timestamp) pairs, so replaying a
+batch after a crash is harmless.
+
+Rows are validated on append, so malformed ones are refused before they
+are queued. A batch the database still rejects because of its data (a
+constraint or a value it cannot store) is retried row by row, and the rows that fail on their own
+are moved to the spool_dead table, so a single bad row cannot hold back
+everything queued behind it. Any other failure, such as an unreachable
+database, leaves the batch queued for the next flush.
+
+Every operation opens its own short-lived connection, which keeps the spool
+safe to share between prefork worker processes.
+"""
+import logging
+import math
+import numbers
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from typing import Callable, Iterable, List, Optional, Tuple
+from sqlalchemy import exc
+from app import metrics
+from app.repository import PriceRow
+
+logger = logging.getLogger(__name__)
+
+
+def validate_row(row: PriceRow) -> Tuple[str, float, int, Optional[int]]:
+    """
+    Check a row before it is queued
+
+    Returns:
+        (ticker, price, timestamp, exchange_timestamp)
+
+    Raises:
+        ValueError: The row cannot be stored in price_data
+    """
+    if len(row) not in (3, 4):
+        raise ValueError(f"Expected (ticker, price, timestamp[, exchange_timestamp]), got {row!r}")
+    ticker, price, timestamp = row[:3]
+    exchange_timestamp = row[3] if len(row) > 3 else None
+    if not isinstance(ticker, str) or not ticker:
+        raise ValueError(f"Invalid ticker in {row!r}")
+    if isinstance(price, bool) or not isinstance(price, numbers.Real) or not math.isfinite(price) or price <= 0:
+        raise ValueError(f"Price must be a positive finite number in {row!r}")
+    if timestamp is None:
+        raise ValueError(f"Missing timestamp in {row!r}")
+    for value in (timestamp, exchange_timestamp):
+        if value is not None and (isinstance(value, bool) or not isinstance(value, numbers.Integral)):
+            raise ValueError(f"Timestamps must be integers in {row!r}")
+    return ticker, float(price), int(timestamp), None if exchange_timestamp is None else int(exchange_timestamp)
+
+
+class WriteSpool:
+    """Append-only queue of price rows in a local SQLite file"""
+
+    def __init__(self, path: str, busy_timeout: float = 5.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS spool ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, ticker TEXT NOT NULL, price REAL NOT NULL, "
+                "timestamp INTEGER NOT NULL, exchange_timestamp INTEGER)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS spool_dead ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, ticker TEXT NOT NULL, price REAL NOT NULL, "
+                "timestamp INTEGER NOT NULL, exchange_timestamp INTEGER, error TEXT NOT NULL, failed_at REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+        # Every append is fsynced: an acknowledged tick survives a crash or power loss
+        conn.execute("PRAGMA synchronous=FULL")
+        return conn
+
+    def append(self, rows: Iterable[PriceRow]) -> int:
+        """
+        Durably queue rows for the database
+
+        Args:
+            rows: (ticker, price, timestamp[, exchange_timestamp]) tuples
+
+        Returns:
+            Number of queued rows
+
+        Raises:
+            ValueError: A row is malformed; nothing is queued
+        """
+        values = [validate_row(row) for row in rows]
+        if not values:
+            return 0
+        with closing(self._connect()) as conn:
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.executemany(
+                    "INSERT INTO spool (ticker, price, timestamp, exchange_timestamp) VALUES (?, ?, ?, ?)", values
+                )
+        return len(values)
+
+    def peek(self, limit: int) -> Tuple[Optional[int], List[PriceRow]]:
+        """
+        Oldest queued rows, without removing them
+
+        Returns:
+            (id of the last returned row or None when empty, rows)
+        """
+        with closing(self._connect()) as conn:
+            records = conn.execute(
+                "SELECT id, ticker, price, timestamp, exchange_timestamp FROM spool ORDER BY id LIMIT ?", (limit,)
+            ).fetchall()
+        if not records:
+            return None, []
+        return records[-1][0], [tuple(record[1:]) for record in records]
+
+    def ack(self, last_id: int, rejected: Iterable[Tuple[PriceRow, str]] = ()):
+        """
+        Remove rows up to and including last_id once they are committed downstream
+
+        Appends are serialized by SQLite, so rows written meanwhile always get
+        higher ids and are kept.
+
+        Args:
+            last_id: Last handled spool row
+            rejected: (row, error) pairs the database refused, kept in spool_dead
+        """
+        dead = [(*row, error, time.time()) for row, error in rejected]
+        with closing(self._connect()) as conn:
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                if dead:
+                    conn.executemany(
+                        "INSERT INTO spool_dead (ticker, price, timestamp, exchange_timestamp, error, failed_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?)", dead
+                    )
+                conn.execute("DELETE FROM spool WHERE id <= ?", (last_id,))
+
+    def pending(self) -> int:
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT count(*) FROM spool").fetchone()[0]
+
+    def dead_count(self) -> int:
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT count(*) FROM spool_dead").fetchone()[0]
+
+    def dead_letters(
+            self,
+            ids: Optional[Iterable[int]] = None,
+            error: Optional[str] = None
+    ) -> List[Tuple[int, PriceRow, str]]:
+        """
+        Rows the database rejected, oldest first
+
+        Args:
+            ids: Only these spool_dead ids
+            error: Only rows whose error contains this text
+
+        Returns:
+            (id, row, error) triples
+        """
+        where, params = self._dead_filter(ids, error)
+        with closing(self._connect()) as conn:
+            records = conn.execute(
+                f"SELECT id, ticker, price, timestamp, exchange_timestamp, error FROM spool_dead{where} ORDER BY id",
+                params
+            ).fetchall()
+        return [(record[0], tuple(record[1:5]), record[5]) for record in records]
+
+    def requeue_dead(self, ids: Optional[Iterable[int]] = None, error: Optional[str] = None) -> int:
+        """
+        Move rejected rows back into the spool, e.g. once the database accepts them
+
+        Args:
+            ids: Only these spool_dead ids
+            error: Only rows whose error contains this text
+
+        Returns:
+            Number of requeued rows; they are flushed after everything already queued
+        """
+        where, params = self._dead_filter(ids, error)
+        with closing(self._connect()) as conn:
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                moved = conn.execute(
+                    "INSERT INTO spool (ticker, price, timestamp, exchange_timestamp) "
+                    f"SELECT ticker, price, timestamp, exchange_timestamp FROM spool_dead{where} ORDER BY id",
+                    params
+                ).rowcount
+                conn.execute(f"DELETE FROM spool_dead{where}", params)
+        return moved
+
+    @staticmethod
+    def _dead_filter(ids: Optional[Iterable[int]], error: Optional[str]) -> Tuple[str, list]:
+        clauses, params = [], []
+        if ids is not None:
+            ids = list(ids)
+            clauses.append(f"id IN ({', '.join('?' * len(ids))})" if ids else "0")
+            params.extend(ids)
+        if error is not None:
+            clauses.append("instr(error, ?) > 0")
+            params.append(error)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+
+def is_rejected_data(error: Exception) -> bool:
+    """Whether a write failed because of the rows themselves rather than the database being unavailable"""
+    if isinstance(error, exc.DBAPIError) and error.connection_invalidated:
+        return False
+    return isinstance(error, (exc.IntegrityError, exc.DataError))
+
+
+def write_one_by_one(
+        rows: List[PriceRow],
+        write: Callable[[List[PriceRow]], object]
+) -> Optional[List[Tuple[PriceRow, str]]]:
+    """
+    Retry a failed batch row by row to isolate the rows the database rejects
+
+    Returns:
+        (row, error) pairs of rejected rows, or None when a write failed for
+        another reason (rows written so far are replayed harmlessly)
+    """
+    rejected = []
+    for row in rows:
+        try:
+            write([row])
+        except Exception as e:
+            if not is_rejected_data(e):
+                return None
+            rejected.append((row, str(e)[:500]))
+    return rejected
+
+
+def drain(spool: WriteSpool, write: Callable[[List[PriceRow]], object], batch_size: int) -> int:
+    """
+    Move everything queued so far into the database, batch by batch
+
+    Args:
+        spool: Spool to drain
+        write: Persists one batch; raises when the database is unavailable
+        batch_size: Rows per write
+
+    Returns:
+        Number of rows taken off the spool, rejected ones included; stops
+        while the database is unavailable with the rest still queued
+    """
+    drained = 0
+    try:
+        while True:
+            last_id, rows = spool.peek(batch_size)
+            if last_id is None:
+                break
+            rejected = []
+            try:
+                write(rows)
+            except Exception as e:
+                if not is_rejected_data(e):
+                    logger.warning(f"Spool flush failed, rows stay queued: {e}")
+                    break
+                logger.error(f"Spool batch of {len(rows)} rows rejected, retrying row by row: {e}")
+                rejected = write_one_by_one(rows, write)
+                if rejected is None:
+                    logger.warning("Row-by-row retry interrupted, rows stay queued")
+                    break
+                for row, error in rejected:
+                    logger.error(f"Moved spooled price {row} to spool_dead: {error}")
+                metrics.SPOOL_REJECTED.inc(len(rejected))
+            spool.ack(last_id, rejected)
+            drained += len(rows)
+    finally:
+        metrics.SPOOL_PENDING.set(spool.pending())
+        metrics.SPOOL_DEAD.set(spool.dead_count())
+    return drained
+
+
+class SpoolFlusher(threading.Thread):
+    """Background thread draining a spool every `interval` seconds"""
+
+    def __init__(
+            self,
+            spool: WriteSpool,
+            write: Callable[[List[PriceRow]], object],
+            interval: float,
+            batch_size: int
+    ):
+        super().__init__(name="spool-flusher", daemon=True)
+        self.spool = spool
+        self.write = write
+        self.interval = interval
+        self.batch_size = batch_size
+        self._stopped = threading.Event()
+        self._wakeup = threading.Event()
+
+    def run(self):
+        while not self._stopped.is_set():
+            try:
+                drained = drain(self.spool, self.write, self.batch_size)
+                if drained:
+                    logger.info(f"Flushed {drained} spooled prices")
+            except Exception as e:
+                # The spool file itself failed (disk full, permissions): retry next round
+                logger.error(f"Spool flusher error: {e}")
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+
+    def wake(self):
+        """Flush now instead of at the next interval"""
+        self._wakeup.set()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stop after a final drain attempt"""
+        self._stopped.set()
+        self._wakeup.set()
+        self.join(timeout)
+        drain(self.spool, self.write, self.batch_size)
@@ -0,0 +1,189 @@
+"""
+Long-running ingestion of Deribit index prices over a WebSocket subscription
+
+Usage:
+    python -m app.stream_ingest
+"""
+import asyncio
+import json
+import logging
+import random
+import time
+from typing import Callable, List, Optional
+import aiohttp
+from app.config import settings
+from app.database import db_manager, init_db
+from app.repository import PriceRepository, PriceRow
+from app.tasks import save_tick
+
+logger = logging.getLogger(__name__)
+
+
+class DeribitStreamIngestor:
+    """
+    Holds one JSON-RPC WebSocket subscription to deribit_price_index.* for all
+    tickers and hands buffered updates to a sink in batches.
+
+    The buffer is flushed when it reaches flush_size or every flush_interval
+    seconds, whichever comes first. Connection failures are retried with
+    jittered exponential backoff; after a failed flush, further flushes back
+    off the same way so an unavailable sink does not stall the receive loop.
+    Malformed messages are logged and skipped.
+    """
+
+    def __init__(
+            self,
+            tickers: List[str],
+            sink: Callable[[List[PriceRow]], None],
+            ws_url: Optional[str] = None,
+            flush_size: Optional[int] = None,
+            flush_interval: Optional[float] = None,
+            max_buffer: Optional[int] = None,
+            initial_backoff: float = 0.5,
+            max_backoff: Optional[float] = None,
+            heartbeat_interval: int = 30
+    ):
+        self.tickers = tickers
+        self.sink = sink
+        self.ws_url = ws_url or settings.deribit_ws_url
+        self.flush_size = flush_size or settings.ingest_flush_size
+        self.flush_interval = flush_interval or settings.ingest_flush_interval
+        self.max_buffer = max_buffer or settings.ingest_max_buffer
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff or settings.ingest_max_backoff
+        self.heartbeat_interval = heartbeat_interval
+        self.connections = 0
+        self.malformed = 0
+        self._buffer: List[PriceRow] = []
+        self._flush_lock = asyncio.Lock()
+        self._stopping = asyncio.Event()
+        self._request_id = 0
+        self._flush_backoff = 0.0
+        self._flush_retry_at = 0.0
+
+    @property
+    def channels(self) -> List[str]:
+        return [f"deribit_price_index.{ticker}" for ticker in self.tickers]
+
+    def stop(self):
+        """Ask run() to finish after a final flush"""
+        self._stopping.set()
+
+    async def run(self):
+        """Consume the subscription until stop() is called, reconnecting on failure"""
+        backoff = self.initial_backoff
+        flusher = asyncio.create_task(self._flush_periodically())
+        try:
+            async with aiohttp.ClientSession() as session:
+                while not self._stopping.is_set():
+                    try:
+                        await self._consume(session)
+                        backoff = self.initial_backoff
+                    except (aiohttp.ClientError, asyncio.TimeoutError, ConnectionError) as e:
+                        logger.warning(f"Deribit stream error: {e}")
+
+                    if self._stopping.is_set():
+                        break
+                    delay = random.uniform(0, backoff)
+                    logger.info(f"Reconnecting to Deribit stream in {delay:.2f}s")
+                    try:
+                        await asyncio.wait_for(self._stopping.wait(), timeout=delay)
+                    except asyncio.TimeoutError:
+                        pass
+                    backoff = min(backoff * 2, self.max_backoff)
+        finally:
+            flusher.cancel()
+            await self.flush()
+
+    async def _send(self, ws: aiohttp.ClientWebSocketResponse, method: str, params: dict):
+        self._request_id += 1
+        await ws.send_json({"jsonrpc": "2.0", "id": self._request_id, "method": method, "params": params})
+
+    async def _consume(self, session: aiohttp.ClientSession):
+        async with session.ws_connect(self.ws_url) as ws:
+            self.connections += 1
+            await self._send(ws, "public/set_heartbeat", {"interval": self.heartbeat_interval})
+            await self._send(ws, "public/subscribe", {"channels": self.channels})
+            logger.info(f"Subscribed to {len(self.channels)} Deribit index channels")
+
+            stop_waiter = asyncio.create_task(self._stopping.wait())
+            try:
+                while True:
+                    receive = asyncio.create_task(ws.receive())
+                    done, _ = await asyncio.wait({receive, stop_waiter}, return_when=asyncio.FIRST_COMPLETED)
+                    if stop_waiter in done:
+                        receive.cancel()
+                        return
+                    message = receive.result()
+                    if message.type != aiohttp.WSMsgType.TEXT:
+                        raise ConnectionError(f"Stream closed ({message.type.name})")
+                    try:
+                        await self._handle(ws, json.loads(message.data))
+                    except (KeyError, TypeError, ValueError, AttributeError) as e:
+                        self.malformed += 1
+                        logger.warning(f"Skipping malformed Deribit stream message: {e!r}")
+            finally:
+                stop_waiter.cancel()
+
+    async def _handle(self, ws: aiohttp.ClientWebSocketResponse, message: dict):
+        method = message.get("method")
+        if method == "subscription":
+            data = message["params"]["data"]
+            self._buffer.append((data["index_name"], data["price"], data["timestamp"] // 1000, data["timestamp"]))
+            if len(self._buffer) > self.max_buffer:
+                del self._buffer[:len(self._buffer) - self.max_buffer]
+            if len(self._buffer) >= self.flush_size and self._flush_due():
+                await self.flush()
+        elif method == "heartbeat" and message["params"].get("type") == "test_request":
+            await self._send(ws, "public/test", {})
+        elif "error" in message:
+            logger.error(f"Deribit stream error response: {message['error']}")
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if self._flush_due():
+                await self.flush()
+
+    def _flush_due(self) -> bool:
+        return time.monotonic() >= self._flush_retry_at
+
+    async def flush(self):
+        """Hand buffered rows to the sink; on failure keep them (bounded) for the next attempt"""
+        async with self._flush_lock:
+            if not self._buffer:
+                return
+            rows, self._buffer = self._buffer, []
+            try:
+                await asyncio.to_thread(self.sink, rows)
+            except Exception as e:
+                self._flush_backoff = min(max(self._flush_backoff * 2, self.initial_backoff), self.max_backoff)
+                self._flush_retry_at = time.monotonic() + self._flush_backoff
+                logger.error(
+                    f"Failed to flush {len(rows)} streamed prices, retrying in {self._flush_backoff:.2f}s: {e}"
+                )
+                self._buffer = (rows + self._buffer)[-self.max_buffer:]
+            else:
+                self._flush_backoff = 0.0
+                self._flush_retry_at = 0.0
+
+
+def save_to_database(rows: List[PriceRow]):
+    """Default sink: persist a batch the same way the polling collector does"""
+    session = db_manager.get_session()
+    try:
+        save_tick(PriceRepository(session), rows)
+        logger.info(f"Saved {len(rows)} streamed prices")
+    finally:
+        session.close()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+    ingestor = DeribitStreamIngestor(settings.tickers, save_to_database)
+    asyncio.run(ingestor.run())
+
+
+if __name__ == "__main__":
+    main()
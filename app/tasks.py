@@ -1,11 +1,36 @@
-from celery import Celery
+from celery import Celery, chord
+from celery.exceptions import SoftTimeLimitExceeded
+from celery.schedules import crontab
+from celery.signals import (
+    before_task_publish,
+    task_postrun,
+    task_prerun,
+    worker_init,
+    worker_process_init,
+    worker_process_shutdown,
+    worker_ready,
+    worker_shutdown,
+)
 import asyncio
+import multiprocessing
+import os
 import time
 import logging
+import uuid
+from typing import Dict, List, Optional
+import redis
+from prometheus_client import start_http_server
+from app import metrics, partitioning
+from app.backfill import backfill_gaps
 from app.config import settings
 from app.deribit_client import DeribitClient
+from app.cache import latest_price_cache
 from app.database import db_manager
-from app.repository import PriceRepository
+from app.live import price_publisher
+from app.models import PriceData, PriceResponse
+from app.repository import PriceRepository, PriceRow
+from app.sharding import HashRing
+from app.spool import SpoolFlusher, WriteSpool, drain, validate_row
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -25,52 +50,368 @@ celery_app.conf.update(
     beat_schedule={
         'fetch-prices-every-minute': {
             'task': 'app.tasks.fetch_and_save_prices',
-            'schedule': 60.0,  # Запуск каждую минуту
+            'schedule': crontab(minute='*'),  # Запуск в начале каждой минуты
+            # Не копить опоздавшие тики в очереди
+            'options': {'expires': settings.collector_tick_ttl},
+        },
+        'backfill-gaps-hourly': {
+            'task': 'app.tasks.backfill_missing_prices',
+            'schedule': 60 * 60.0,
+        },
+        'maintain-partitions-daily': {
+            'task': 'app.tasks.maintain_partitions',
+            'schedule': 24 * 60 * 60.0,
         },
     },
 )
 
 
-async def fetch_price_for_ticker(ticker: str) -> tuple[str, float, int]:
+# Блокировка от наложения тиков: не даёт медленным запускам копиться
+tick_lock_redis = redis.Redis.from_url(settings.celery_broker_url, socket_timeout=settings.cache_redis_timeout)
+
+# Время старта выполняющихся задач (по task_id) для метрик длительности
+_task_started: Dict[str, float] = {}
+
+# Локальный спул тиков (открывается при первом обращении), процесс его сброса в БД
+# и событие остановки этого процесса
+_collector_spool: Optional[WriteSpool] = None
+_spool_flusher: Optional[multiprocessing.Process] = None
+_spool_flusher_stop = None
+
+
+@before_task_publish.connect
+def stamp_publish_time(headers=None, **kwargs):
     """
-    Получение цены для одного тикера
+    Метка времени публикации: по ней воркер считает отставание от расписания
     """
-    # Создаем объект клиента без использования 'async with'
-    client = DeribitClient()
-    # Вызываем метод напрямую
-    price = await client.get_index_price(ticker)
-    timestamp = int(time.time())
-    return ticker, price, timestamp
+    if headers is not None:
+        headers["published_at"] = time.time()
 
 
-@celery_app.task(name='app.tasks.fetch_and_save_prices')
-def fetch_and_save_prices():
+@task_prerun.connect
+def record_task_start(task_id=None, task=None, **kwargs):
+    _task_started[task_id] = time.perf_counter()
+    published_at = task.request.get("published_at")
+    if published_at is not None:
+        metrics.TASK_LAG.labels(task.name).observe(max(time.time() - published_at, 0.0))
+
+
+@task_postrun.connect
+def record_task_duration(task_id=None, task=None, state=None, **kwargs):
+    started = _task_started.pop(task_id, None)
+    if started is not None:
+        metrics.TASK_DURATION.labels(task.name, state or "UNKNOWN").observe(time.perf_counter() - started)
+
+
+@worker_init.connect
+def serve_worker_metrics(**kwargs):
     """
-    Задача Celery для сбора цен и сохранения в БД
+    Главный процесс воркера отдаёт метрики всех дочерних процессов
+    (нужен PROMETHEUS_MULTIPROC_DIR)
     """
-    logger.info("Starting price fetch task")
+    if settings.metrics_enabled and settings.metrics_port:
+        start_http_server(settings.metrics_port, registry=metrics.collect_registry())
+
+
+def run_spool_flusher(stopped):
+    """
+    Тело процесса сброса спула: свой пул соединений с БД,
+    сброс в фоновом потоке до сигнала остановки
+    """
+    db_manager.reset_after_fork()
+    flusher = SpoolFlusher(
+        get_collector_spool(), write_prices, settings.spool_flush_interval, settings.spool_batch_size
+    )
+    flusher.start()
+    stopped.wait()
+    flusher.stop(timeout=settings.spool_flush_interval * 2)
+    metrics.mark_process_dead(os.getpid())
+
+
+@worker_ready.connect
+def start_spool_flusher(**kwargs):
+    """
+    Сброс спула в БД идёт в отдельном процессе, отдельно от тиков: дочерние
+    процессы только дописывают строки в файл. Главный процесс воркера сам
+    в БД не ходит, поэтому процессы prefork, в том числе перезапущенные
+    позже, не наследуют ни потока сброса, ни его соединений
+    """
+    global _spool_flusher, _spool_flusher_stop
+    if get_collector_spool() is not None and _spool_flusher is None:
+        context = multiprocessing.get_context("fork")
+        _spool_flusher_stop = context.Event()
+        _spool_flusher = context.Process(
+            target=run_spool_flusher, args=(_spool_flusher_stop,), name="spool-flusher", daemon=True
+        )
+        _spool_flusher.start()
+
+
+@worker_shutdown.connect
+def stop_spool_flusher(**kwargs):
+    global _spool_flusher, _spool_flusher_stop
+    if _spool_flusher is not None:
+        _spool_flusher_stop.set()
+        _spool_flusher.join(timeout=settings.spool_flush_interval * 2 + settings.db_pool_timeout)
+        if _spool_flusher.is_alive():
+            logger.warning("Spool flusher did not stop in time, rows stay queued")
+            _spool_flusher.terminate()
+        _spool_flusher = None
+        _spool_flusher_stop = None
+
+
+@worker_process_init.connect
+def reset_db_pool(**kwargs):
+    """
+    Дочерний процесс prefork не должен работать через сокеты,
+    унаследованные от родителя: пул пересоздаётся после fork
+    """
+    db_manager.reset_after_fork()
 
-    session = db_manager.get_session()
-    repository = PriceRepository(session)
 
+@worker_process_shutdown.connect
+def release_worker_metrics(pid=None, **kwargs):
+    metrics.mark_process_dead(pid or os.getpid())
+
+
+def tick_timestamp(now: Optional[float] = None, cadence: Optional[int] = None) -> int:
+    """
+    Логическая метка тика: начало текущего интервала сбора,
+    общая для всех тикеров и не зависящая от задержек сети и очереди
+    """
+    cadence = cadence or settings.collector_cadence
+    now = time.time() if now is None else now
+    return int(now) // cadence * cadence
+
+
+def acquire_tick_lock(name: str) -> Optional[str]:
+    """
+    Неблокирующая блокировка в Redis: токен владельца или None, если предыдущий
+    запуск ещё идёт. Токен передаётся дальше, чтобы снять блокировку мог
+    другой процесс (финальная задача chord). При недоступном Redis сбор
+    не останавливается
+    """
+    token = uuid.uuid4().hex
+    lock = tick_lock_redis.lock(f"lock:{name}", timeout=settings.collector_tick_ttl)
     try:
-        for ticker in settings.tickers:
-            try:
-                # Запуск асинхронной функции в синхронном контексте
-                ticker_name, price, timestamp = asyncio.run(fetch_price_for_ticker(ticker))
+        return token if lock.acquire(blocking=False, token=token) else None
+    except redis.RedisError as e:
+        logger.warning(f"Tick lock unavailable, running without it: {e}")
+        return token
+
 
-                if price is not None:
-                    repository.save_price(ticker_name, price, timestamp)
-                    logger.info(f"Saved {ticker_name}: ${price} at timestamp {timestamp}")
-                else:
-                    logger.warning(f"Failed to fetch price for {ticker_name}")
+def release_tick_lock(name: str, token: str):
+    try:
+        tick_lock_redis.lock(f"lock:{name}", timeout=settings.collector_tick_ttl).do_release(token)
+    except redis.RedisError as e:
+        # Истёк по таймауту: тик шёл дольше collector_tick_ttl
+        logger.warning(f"Tick lock {name} expired before release: {e}")
 
-            except Exception as e:
-                logger.error(f"Error processing {ticker}: {str(e)}")
 
-        logger.info("Price fetch task completed successfully")
+async def fetch_price_for_ticker(
+        client: DeribitClient,
+        ticker: str,
+        deadline: Optional[float] = None,
+        timestamp: Optional[int] = None
+) -> PriceRow:
+    """
+    Получение цены для одного тикера: (ticker, price, метка тика, время биржи в мс)
+    """
+    quote = await client.get_index_quote(ticker, deadline)
+    price, exchange_timestamp = quote if quote is not None else (None, None)
+    return ticker, price, tick_timestamp() if timestamp is None else timestamp, exchange_timestamp
+
+
+async def fetch_prices(
+        tickers: List[str],
+        client: Optional[DeribitClient] = None,
+        timestamp: Optional[int] = None,
+        timeout: Optional[float] = None
+) -> List[PriceRow]:
+    """
+    Параллельное получение цен для всех тикеров через один пул соединений;
+    все строки тика получают одну метку времени
+    """
+    owns_client = client is None
+    client = client or DeribitClient()
+    timestamp = tick_timestamp() if timestamp is None else timestamp
+    semaphore = asyncio.Semaphore(settings.deribit_max_concurrency)
+    # Ретраи не должны выходить за пределы тика
+    deadline = asyncio.get_running_loop().time() + (timeout or settings.deribit_tick_deadline)
+
+    async def fetch(ticker: str):
+        async with semaphore:
+            return await fetch_price_for_ticker(client, ticker, deadline, timestamp)
+
+    try:
+        return await asyncio.gather(*(fetch(ticker) for ticker in tickers))
+    finally:
+        logger.info(f"Deribit client stats: {client.stats}")
+        if owns_client:
+            await client.close()
+
+
+def save_tick(repository: PriceRepository, rows: List[PriceRow]) -> List[PriceData]:
+    """
+    Сохранение пачки цен: сырые данные и роллапы одной транзакцией,
+    затем write-through в кэш последних цен и рассылка подписчикам.
+    Публикуются только цены новее закэшированных: старые строки из спула,
+    дописанные после сбоя БД, не затирают свежие
+    """
+    saved = repository.save_prices_bulk(rows, refresh=True, rollups=True)
+    metrics.TICK_ROWS_WRITTEN.observe(len(saved))
+    payloads = [PriceResponse.model_validate(row).model_dump() for row in saved]
+    price_publisher.publish(latest_price_cache.publish(payloads))
+    return saved
 
+
+def get_collector_spool() -> Optional[WriteSpool]:
+    """
+    Спул тиков этого хоста или None, если spool_path не задан
+    """
+    global _collector_spool
+    if _collector_spool is None and settings.spool_path:
+        _collector_spool = WriteSpool(settings.spool_path)
+    return _collector_spool
+
+
+def write_prices(rows: List[PriceRow]) -> List[PriceData]:
+    """
+    Запись пачки из спула; исключение (БД недоступна) оставляет её в спуле
+    """
+    session = db_manager.get_session()
+    try:
+        return save_tick(PriceRepository(session), rows)
+    finally:
+        session.close()
+
+
+def flush_spool() -> int:
+    """
+    Синхронный сброс всего накопленного в спуле (CLI, бенчмарки)
+    """
+    spool = get_collector_spool()
+    return drain(spool, write_prices, settings.spool_batch_size) if spool is not None else 0
+
+
+@celery_app.task(bind=True, name='app.tasks.fetch_and_save_prices')
+def fetch_and_save_prices(self):
+    """
+    Задача Celery, запускаемая beat: раздаёт тикеры по шардам (chord из
+    fetch_shard) и сохраняет объединённый результат одной записью
+    """
+    # Метка берётся от момента публикации beat, а не от старта воркера
+    timestamp = tick_timestamp(self.request.get("published_at"))
+
+    token = acquire_tick_lock("fetch_and_save_prices")
+    if token is None:
+        logger.warning(f"Previous price fetch still running, skipping tick {timestamp}")
+        return
+
+    try:
+        shards = HashRing(settings.collector_shards).partition(settings.tickers)
+        tick_deadline = time.time() + settings.deribit_tick_deadline
+        logger.info(f"Dispatching tick {timestamp} to {len(shards)} shards")
+        chord(
+            fetch_shard.s(tickers, timestamp, tick_deadline) for tickers in shards.values()
+        )(save_shards.s(timestamp, token))
     except Exception as e:
         logger.error(f"Error in fetch_and_save_prices task: {str(e)}")
+        release_tick_lock("fetch_and_save_prices", token)
+
+
+@celery_app.task(
+    bind=True,
+    name='app.tasks.fetch_shard',
+    # Потерянный воркером шард возвращается в очередь и достаётся другому
+    acks_late=True,
+    reject_on_worker_lost=True,
+    soft_time_limit=settings.collector_shard_deadline,
+)
+def fetch_shard(self, tickers: List[str], timestamp: int, tick_deadline: float) -> List[PriceRow]:
+    """
+    Сбор цен одного шарда. Если шард не уложился в свой дедлайн, он
+    переназначается (повторно ставится в очередь любому свободному воркеру),
+    пока не истёк дедлайн всего тика; иначе возвращается пустой результат,
+    чтобы остальные шарды всё равно были сохранены
+    """
+    remaining = tick_deadline - time.time()
+    try:
+        return asyncio.run(fetch_prices(
+            tickers, timestamp=timestamp, timeout=min(remaining, settings.collector_shard_deadline)
+        ))
+    except SoftTimeLimitExceeded:
+        if self.request.retries < settings.collector_shard_retries and tick_deadline - time.time() > 1:
+            logger.warning(f"Shard {tickers[:3]}... missed its deadline, reassigning")
+            raise self.retry(countdown=0)
+        logger.error(f"Shard {tickers[:3]}... missed its deadline, giving up for tick {timestamp}")
+    except Exception as e:
+        logger.error(f"Error in fetch_shard task: {str(e)}")
+    return [(ticker, None, timestamp, None) for ticker in tickers]
+
+
+@celery_app.task(name='app.tasks.save_shards')
+def save_shards(shard_results: List[List[PriceRow]], timestamp: int, lock_token: Optional[str] = None):
+    """
+    Финальная задача chord: объединение шардов и одна пакетная запись.
+    При включённом спуле строки только дописываются в локальный файл,
+    а в БД их переносит SpoolFlusher: медленная или недоступная БД
+    не растягивает тик и не теряет цены
+    """
+    try:
+        rows = []
+        for row in (row for shard in shard_results for row in shard):
+            # JSON превращает кортежи в списки
+            if row[1] is None:
+                logger.warning(f"Failed to fetch price for {row[0]}")
+                continue
+            try:
+                rows.append(validate_row(tuple(row)))
+            except ValueError as e:
+                logger.error(f"Dropped invalid price: {e}")
+
+        spool = get_collector_spool()
+        if spool is not None:
+            spooled = spool.append(rows)
+            logger.info(f"Spooled {spooled} prices for tick {timestamp}")
+        else:
+            saved = write_prices(rows)
+            logger.info(f"Saved {len(saved)} prices for tick {timestamp}")
+    except Exception as e:
+        logger.error(f"Error in save_shards task: {str(e)}")
     finally:
-        session.close()
\ No newline at end of file
+        if lock_token is not None:
+            release_tick_lock("fetch_and_save_prices", lock_token)
+
+
+@celery_app.task(name='app.tasks.backfill_missing_prices')
+def backfill_missing_prices():
+    """
+    Поиск пропусков в минутном ряду и дозагрузка из истории Deribit
+    """
+    session = db_manager.get_session()
+    try:
+        written = backfill_gaps(session, settings.tickers)
+        logger.info(f"Backfill completed: {written}")
+    except Exception as e:
+        logger.error(f"Error in backfill_missing_prices task: {str(e)}")
+    finally:
+        session.close()
+
+
+@celery_app.task(name='app.tasks.maintain_partitions')
+def maintain_partitions():
+    """
+    Создание будущих партиций price_data и применение политики хранения
+    """
+    if not settings.partitioning_enabled or db_manager.engine.dialect.name != "postgresql":
+        return
+
+    with db_manager.engine.begin() as conn:
+        created = partitioning.ensure_partitions(conn, settings.partition_months_ahead)
+        logger.info(f"Partitions ensured: {', '.join(created)}")
+
+        if settings.retention_months is not None:
+            removed = partitioning.apply_retention(
+                conn, settings.retention_months, archive=settings.retention_archive
+            )
+            logger.info(f"Retention removed {len(removed)} partitions")
@@ -0,0 +1,135 @@
+"""
+Microbenchmark: NumPy analytics vs pure-Python loops
+
+Times rolling mean, EWMA, realized volatility and max drawdown over a
+synthetic minute series, vectorized and as straightforward Python loops,
+and optionally the columnar load of the same series from SQLite through
+PriceRepository.get_series.
+
+Usage:
+    python -m benchmarks.bench_analytics --points 1000000 --window 60
+"""
+import argparse
+import math
+import os
+import time
+from typing import Callable, List
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app import analytics
+from app.models import Base
+from app.repository import PriceRepository
+
+BENCH_DB = "./bench_analytics.db"
+TICKER = "btc_usd"
+
+
+def python_rolling_mean(prices: List[float], window: int) -> List[float]:
+    result, total = [], 0.0
+    for i, price in enumerate(prices):
+        total += price
+        if i >= window:
+            total -= prices[i - window]
+        if i >= window - 1:
+            result.append(total / window)
+    return result
+
+
+def python_ewma(prices: List[float], span: int) -> List[float]:
+    alpha = 2 / (span + 1)
+    result, value = [], prices[0]
+    for price in prices:
+        value = (1 - alpha) * value + alpha * price
+        result.append(value)
+    return result
+
+
+def python_volatility(timestamps: List[int], prices: List[float], window: int) -> List[float]:
+    squared = [math.log(prices[i + 1] / prices[i]) ** 2 for i in range(len(prices) - 1)]
+    result, total = [], 0.0
+    for i, value in enumerate(squared):
+        total += value
+        if i >= window:
+            total -= squared[i - window]
+        if i >= window - 1:
+            elapsed = timestamps[i + 1] - timestamps[i + 1 - window]
+            result.append(math.sqrt(max(total, 0.0) * analytics.SECONDS_PER_YEAR / elapsed))
+    return result
+
+
+def python_drawdown(prices: List[float]) -> float:
+    peak, worst = prices[0], 0.0
+    for price in prices:
+        peak = max(peak, price)
+        worst = min(worst, price / peak - 1)
+    return worst
+
+
+def best_of(fn: Callable, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def bench_load(timestamps: np.ndarray, prices: np.ndarray, repeat: int):
+    if os.path.exists(BENCH_DB):
+        os.remove(BENCH_DB)
+    engine = create_engine(f"sqlite:///{BENCH_DB}")
+    Base.metadata.create_all(bind=engine)
+    repository = PriceRepository(sessionmaker(bind=engine)())
+    repository.save_prices_bulk(zip([TICKER] * len(prices), prices.tolist(), timestamps.tolist()))
+
+    def load():
+        return analytics.to_arrays(repository.get_series(TICKER))
+
+    assert len(load()[0]) == len(prices)
+    print(f"{'columnar load (SQLite)':24} {best_of(load, repeat) * 1000:10.1f} ms")
+    repository.session.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--points", type=int, default=1_000_000)
+    parser.add_argument("--window", type=int, default=60)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--skip-load", action="store_true", help="Skip the SQLite load benchmark")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    timestamps = 1_700_000_000 + np.arange(args.points, dtype=np.int64) * 60
+    prices = 40_000 * np.exp(np.cumsum(rng.normal(0, 0.0005, args.points)))
+    ts_list, price_list = timestamps.tolist(), prices.tolist()
+    window = args.window
+
+    cases = [
+        ("rolling mean",
+         lambda: analytics.rolling_mean(prices, window),
+         lambda: python_rolling_mean(price_list, window)),
+        ("ewma",
+         lambda: analytics.ewma(prices, window),
+         lambda: python_ewma(price_list, window)),
+        ("realized volatility",
+         lambda: analytics.realized_volatility(timestamps, prices, window),
+         lambda: python_volatility(ts_list, price_list, window)),
+        ("max drawdown",
+         lambda: analytics.max_drawdown(timestamps, prices)["max_drawdown"],
+         lambda: python_drawdown(price_list)),
+    ]
+
+    print(f"{args.points:,} points, window {window}")
+    print(f"{'metric':24} {'numpy':>10} {'python':>10} {'speedup':>8}")
+    for name, vectorized, loop in cases:
+        np.testing.assert_allclose(vectorized(), loop(), rtol=1e-7)
+        fast, slow = best_of(vectorized, args.repeat), best_of(loop, args.repeat)
+        print(f"{name:24} {fast * 1000:8.1f}ms {slow * 1000:8.1f}ms {slow / fast:7.1f}x")
+
+    if not args.skip_load:
+        bench_load(timestamps, prices, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Load test: latency percentiles of /prices/latest under concurrent traffic
+
+Runs in-process against a seeded SQLite database by default, or against a
+running server when --base-url is given.
+
+Usage:
+    python -m benchmarks.bench_api_latency --requests 2000 --concurrency 50
+    python -m benchmarks.bench_api_latency --base-url http://localhost:8000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import httpx
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from app.database import get_async_db
+from app.main import app
+from app.models import Base
+from app.repository import PriceRepository
+
+BENCH_DB = "./bench_api.db"
+
+
+def seed(rows: int, tickers: int):
+    engine = create_engine(f"sqlite:///{BENCH_DB}")
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    base = int(time.time()) - rows
+    PriceRepository(session).save_prices_bulk(
+        (f"t{i % tickers}_usd", 100.0 + i, base + i) for i in range(rows)
+    )
+    session.close()
+
+
+def in_process_client() -> httpx.AsyncClient:
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{BENCH_DB}")
+    SessionLocal = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+
+    async def override_get_async_db():
+        async with SessionLocal() as db:
+            yield db
+
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+
+
+def percentile(samples, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def run(client: httpx.AsyncClient, path: str, tickers: int, total: int, concurrency: int):
+    latencies = []
+    queue = iter(range(total))
+
+    async def worker():
+        for i in queue:
+            started = time.perf_counter()
+            response = await client.get(path, params={"ticker": f"t{i % tickers}_usd"})
+            latencies.append(time.perf_counter() - started)
+            response.raise_for_status()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    print(f"{path}: {total} requests, concurrency {concurrency}")
+    print(f"  req/s {total / elapsed:10.1f}")
+    for pct in (50, 95, 99):
+        print(f"  p{pct:<3}  {percentile(latencies, pct) * 1000:10.2f} ms")
+    print(f"  mean  {statistics.mean(latencies) * 1000:10.2f} ms")
+
+
+async def main_async(args):
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url)
+    else:
+        seed(args.rows, args.tickers)
+        client = in_process_client()
+    async with client:
+        await run(client, args.path, args.tickers, args.requests, args.concurrency)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--base-url", default=None)
+    parser.add_argument("--path", default="/prices/latest")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--tickers", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Benchmark: wall time of one collector tick against a local Deribit stub
+
+Usage:
+    python -m benchmarks.bench_collector --tickers 10 50 200 --latency 0.05
+"""
+import argparse
+import asyncio
+import time
+from app.deribit_client import DeribitClient
+from app.tasks import fetch_price_for_ticker, fetch_prices
+from tests.deribit_stub import DeribitStub
+
+
+async def sequential_tick(stub: DeribitStub, tickers):
+    """Old behaviour: a fresh client (and session) per ticker, one at a time"""
+    for ticker in tickers:
+        client = DeribitClient(base_url=stub.api_url)
+        await fetch_price_for_ticker(client, ticker)
+        await client.close()
+
+
+async def concurrent_tick(stub: DeribitStub, tickers):
+    client = DeribitClient(base_url=stub.api_url)
+    try:
+        await fetch_prices(tickers, client=client)
+    finally:
+        await client.close()
+
+
+async def run(ticker_counts, latency: float):
+    async with DeribitStub(latency=latency) as stub:
+        print(f"{'tickers':>8} {'sequential, s':>14} {'concurrent, s':>14}")
+        for count in ticker_counts:
+            tickers = [f"t{i}_usd" for i in range(count)]
+
+            started = time.perf_counter()
+            await sequential_tick(stub, tickers)
+            sequential = time.perf_counter() - started
+
+            started = time.perf_counter()
+            await concurrent_tick(stub, tickers)
+            concurrent = time.perf_counter() - started
+
+            print(f"{count:>8} {sequential:>14.3f} {concurrent:>14.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tickers", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--latency", type=float, default=0.05, help="Stub response latency, seconds")
+    args = parser.parse_args()
+    asyncio.run(run(args.tickers, args.latency))
+
+
+if __name__ == "__main__":
+    main()
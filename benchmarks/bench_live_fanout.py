@@ -0,0 +1,46 @@
+"""
+Benchmark: memory per idle subscriber and fan-out cost of PriceHub
+
+Usage:
+    python -m benchmarks.bench_live_fanout --subscribers 1000 5000 20000
+"""
+import argparse
+import asyncio
+import time
+import tracemalloc
+from app.live import PriceHub
+
+TICKERS = [f"t{i}_usd" for i in range(50)]
+
+
+async def run(count: int, updates: int):
+    hub = PriceHub(queue_size=100)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    subscribers = [hub.subscribe([TICKERS[i % len(TICKERS)]]) for i in range(count)]
+    per_subscriber = (tracemalloc.get_traced_memory()[0] - before) / count
+
+    started = time.perf_counter()
+    for i in range(updates):
+        hub.dispatch({"id": i, "ticker": TICKERS[i % len(TICKERS)], "price": 1.0, "timestamp": i})
+    dispatch_us = (time.perf_counter() - started) / updates * 1e6
+
+    # Nobody drains: queues must stay capped at queue_size
+    peak = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    queued = sum(s.queue.qsize() for s in subscribers)
+    print(f"{count:>8} subscribers | {per_subscriber:8.0f} B/idle subscriber | "
+          f"{dispatch_us:8.1f} us/update | {queued:>9} queued | {peak / 2**20:7.1f} MiB after {updates} updates")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--subscribers", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--updates", type=int, default=10000)
+    args = parser.parse_args()
+    for count in args.subscribers:
+        asyncio.run(run(count, args.updates))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Microbenchmark: overhead of the Prometheus instrumentation on hot paths
+
+Compares a bare ASGI app with the same app behind MetricsMiddleware, and a
+SQLite statement with and without the engine hooks, and reports the raw
+cost of one histogram observation.
+
+Usage:
+    python -m benchmarks.bench_metrics --iterations 20000
+"""
+import argparse
+import asyncio
+import time
+from sqlalchemy import create_engine, text
+from app.metrics import DERIBIT_REQUEST_DURATION, MetricsMiddleware, instrument_engine
+
+
+async def bare_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+class _Router:
+    routes = []
+
+
+class _App:
+    router = _Router()
+
+
+async def asgi_us(app, iterations: int) -> float:
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        scope = {"type": "http", "method": "GET", "path": "/", "app": _App()}
+        await app(scope, receive, send)
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def statement_us(instrumented: bool, iterations: int) -> float:
+    engine = create_engine("sqlite://")
+    if instrumented:
+        instrument_engine(engine)
+    with engine.connect() as conn:
+        statement = text("SELECT 1")
+        started = time.perf_counter()
+        for _ in range(iterations):
+            conn.execute(statement).scalar()
+        return (time.perf_counter() - started) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    bare = asyncio.run(asgi_us(bare_app, args.iterations))
+    wrapped = asyncio.run(asgi_us(MetricsMiddleware(bare_app), args.iterations))
+    print(f"ASGI request   bare {bare:7.2f} us | instrumented {wrapped:7.2f} us | overhead {wrapped - bare:6.2f} us")
+
+    plain = statement_us(False, args.iterations)
+    timed = statement_us(True, args.iterations)
+    print(f"SQL statement  bare {plain:7.2f} us | instrumented {timed:7.2f} us | overhead {timed - plain:6.2f} us")
+
+    child = DERIBIT_REQUEST_DURATION.labels("bench", "bench")
+    started = time.perf_counter()
+    for _ in range(args.iterations):
+        child.observe(0.01)
+    print(f"Histogram.observe {(time.perf_counter() - started) / args.iterations * 1e6:7.2f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Microbenchmark: ORM -> PriceResponse -> jsonable_encoder -> json vs column rows -> orjson
+
+Reports CPU time per 10k rows for the serialization step alone and req/s
+for /prices/all end to end (in-process, seeded SQLite).
+
+Usage:
+    python -m benchmarks.bench_serialization --rows 10000
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import List
+import httpx
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from app.database import get_async_db
+from app.main import app, price_dict
+from app.models import Base, PriceResponse
+from app.repository import AsyncPriceRepository, PriceRepository
+import orjson
+
+BENCH_DB = "./bench_serialization.db"
+TICKER = "btc_usd"
+
+
+def seed(rows: int):
+    engine = create_engine(f"sqlite:///{BENCH_DB}")
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    repository = PriceRepository(sessionmaker(bind=engine)())
+    repository.save_prices_bulk((TICKER, 100.0 + i, 1_700_000_000 + i * 60) for i in range(rows))
+    repository.session.close()
+
+
+def cpu_per_10k(fn, rows: int, repeat: int) -> float:
+    started = time.process_time()
+    for _ in range(repeat):
+        fn()
+    return (time.process_time() - started) / repeat * 10_000 / rows * 1000
+
+
+async def main_async(args):
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{BENCH_DB}")
+    SessionLocal = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+
+    async with SessionLocal() as session:
+        repository = AsyncPriceRepository(session)
+        orm_rows = await repository.get_all_by_ticker(TICKER)
+        column_rows = await repository.get_rows_by_date_range(TICKER)
+
+    adapter = TypeAdapter(List[PriceResponse])
+
+    def old_path():
+        validated = adapter.validate_python(orm_rows, from_attributes=True)
+        return json.dumps(jsonable_encoder(validated)).encode()
+
+    def new_path():
+        return orjson.dumps([price_dict(row) for row in column_rows])
+
+    assert json.loads(old_path()) == json.loads(new_path())
+    print(f"serialization, CPU ms per 10k rows: "
+          f"old {cpu_per_10k(old_path, len(orm_rows), args.repeat):8.2f} | "
+          f"new {cpu_per_10k(new_path, len(column_rows), args.repeat):8.2f}")
+
+    async def override_get_async_db():
+        async with SessionLocal() as db:
+            yield db
+
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        started, cpu_started = time.perf_counter(), time.process_time()
+        for _ in range(args.repeat):
+            (await client.get("/prices/all", params={"ticker": TICKER})).raise_for_status()
+        elapsed, cpu = time.perf_counter() - started, time.process_time() - cpu_started
+    print(f"/prices/all end to end: {args.repeat / elapsed:8.2f} req/s, "
+          f"{cpu / args.repeat * 10_000 / len(column_rows) * 1000:8.2f} CPU ms per 10k rows")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    seed(args.rows)
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark: wall time of one sharded collector tick vs number of Celery workers
+
+Uses Celery's in-memory broker and result backend with a thread-pool worker
+and a local Deribit stub, so no Redis or database is needed. Each shard
+fetches with limited concurrency, so more workers should mean shorter ticks.
+
+Usage:
+    python -m benchmarks.bench_sharded_collector --tickers 64 --workers 1 2 4 8 --latency 0.05
+"""
+import argparse
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+from celery.contrib.testing.worker import start_worker
+from app import tasks
+from tests.deribit_stub import DeribitStub
+
+
+class StubServer:
+    """DeribitStub running on its own event loop thread"""
+
+    def __init__(self, latency: float):
+        self.loop = asyncio.new_event_loop()
+        self.stub = DeribitStub(latency=latency)
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+        asyncio.run_coroutine_threadsafe(self.stub.__aenter__(), self.loop).result()
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self.stub.__aexit__(None, None, None), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+def run_tick(workers: int) -> float:
+    done = threading.Event()
+    tasks.save_tick = lambda repository, rows: done.set() or rows
+
+    with start_worker(tasks.celery_app, pool="threads", concurrency=workers, perform_ping_check=False):
+        started = time.perf_counter()
+        tasks.fetch_and_save_prices.delay()
+        if not done.wait(120):
+            raise RuntimeError("Tick did not complete")
+        return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tickers", type=int, default=64)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--per-shard-concurrency", type=int, default=2)
+    args = parser.parse_args()
+
+    server = StubServer(args.latency)
+    tasks.celery_app.conf.update(
+        broker_url="memory://", result_backend="cache+memory://", task_always_eager=False,
+        # The memory transport and the cache backend's chord join both poll;
+        # keep polling from dominating the tick
+        broker_transport_options={"polling_interval": 0.01},
+        result_chord_retry_interval=0.02,
+    )
+    tasks.settings.deribit_api_url = server.stub.api_url
+    tasks.settings.deribit_max_concurrency = args.per_shard_concurrency
+    tasks.settings.tickers = [f"t{i}_usd" for i in range(args.tickers)]
+    tasks.db_manager.get_session = lambda: SimpleNamespace(close=lambda: None)
+    tasks.settings.metrics_port = 0
+    tasks.acquire_tick_lock = lambda name: "bench"
+    tasks.release_tick_lock = lambda name, token: None
+
+    try:
+        for workers in args.workers:
+            tasks.settings.collector_shards = workers
+            elapsed = run_tick(workers)
+            print(f"{workers:>3} workers / shards | {args.tickers} tickers | tick {elapsed * 1000:8.1f} ms")
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Benchmark: peak RSS and time-to-first-byte of /prices/all, list vs NDJSON stream
+
+Each mode runs in its own subprocess so that peak RSS is not shared.
+
+Usage:
+    python -m benchmarks.bench_streaming --rows 1000000
+"""
+import argparse
+import asyncio
+import json
+import resource
+import subprocess
+import sys
+import time
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from app.database import get_async_db, get_async_session_factory
+from app.main import app
+from app.models import Base
+from app.repository import PriceRepository
+
+BENCH_DB = "./bench_stream.db"
+TICKER = "btc_usd"
+
+
+def seed(rows: int):
+    engine = create_engine(f"sqlite:///{BENCH_DB}")
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    repository = PriceRepository(sessionmaker(bind=engine)())
+    base = int(time.time()) - rows * 60
+    for offset in range(0, rows, 50_000):
+        repository.save_prices_bulk(
+            (TICKER, 100.0 + i, base + i * 60) for i in range(offset, min(rows, offset + 50_000))
+        )
+    repository.session.close()
+
+
+async def measure(path: str) -> dict:
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{BENCH_DB}")
+    SessionLocal = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+
+    async def override_get_async_db():
+        async with SessionLocal() as db:
+            yield db
+
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    app.dependency_overrides[get_async_session_factory] = lambda: SessionLocal
+
+    # Drive the ASGI app directly: httpx's ASGITransport buffers the whole body
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "",
+        "query_string": query.encode(), "headers": [], "server": ("bench", 80), "client": ("bench", 1),
+    }
+    requested = False
+    ttfb = None
+    size = 0
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.Event().wait()
+
+    async def send(message):
+        nonlocal ttfb, size
+        if message["type"] == "http.response.body" and message.get("body"):
+            if ttfb is None:
+                ttfb = time.perf_counter() - started
+            size += len(message["body"])
+
+    started = time.perf_counter()
+    await app(scope, receive, send)
+    total = time.perf_counter() - started
+
+    return {
+        "ttfb_s": round(ttfb, 3),
+        "total_s": round(total, 3),
+        "bytes": size,
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--measure", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(asyncio.run(measure(args.measure))))
+        return
+
+    seed(args.rows)
+    for label, path in (("list", f"/prices/all?ticker={TICKER}"),
+                        ("stream", f"/prices/all?ticker={TICKER}&stream=true")):
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_streaming", "--measure", path],
+            check=True, capture_output=True, text=True
+        ).stdout.strip().splitlines()[-1]
+        print(f"{label:<7} {output}")
+
+
+if __name__ == "__main__":
+    main()
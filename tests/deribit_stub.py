@@ -0,0 +1,132 @@
+import asyncio
+import time
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+
+class DeribitStub:
+    """Local stand-in for the Deribit public API
+
+    `faults` is consumed one entry per request: "error" (HTTP 500),
+    "rate_limit" (HTTP 429 with Deribit's too_many_requests error),
+    "bad_request" (HTTP 400 JSON-RPC error), "malformed" (HTTP 200 with a
+    JSON body that is not a JSON-RPC envelope), "slow" (sleeps `slow_delay`)
+    or None for a normal answer.
+    """
+
+    def __init__(self, latency: float = 0.0, faults=None, slow_delay: float = 1.0, history=None):
+        self.latency = latency
+        self.history = list(history or [])
+        self.history_requests = []
+        self.faults = list(faults or [])
+        self.slow_delay = slow_delay
+        self.requests = 0
+        self.app = web.Application()
+        self.app.router.add_get("/api/v2/public/get_index_price", self.get_index_price)
+        self.app.router.add_get("/api/v2/public/get_index_chart_data", self.get_index_chart_data)
+        self.server = TestServer(self.app)
+
+    @property
+    def api_url(self) -> str:
+        return str(self.server.make_url("/api/v2"))
+
+    @property
+    def index_price_url(self) -> str:
+        return f"{self.api_url}/public/get_index_price"
+
+    async def get_index_price(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        fault = self.faults.pop(0) if self.faults else None
+        if fault == "error":
+            return web.Response(status=500, text="Internal Server Error")
+        if fault == "rate_limit":
+            return web.json_response(
+                {"jsonrpc": "2.0", "error": {"code": 10028, "message": "too_many_requests"}}, status=429
+            )
+        if fault == "bad_request":
+            return web.json_response(
+                {"jsonrpc": "2.0", "error": {"code": 10001, "message": "error"}}, status=400
+            )
+        if fault == "malformed":
+            return web.json_response(["unexpected"])
+        if fault == "slow":
+            await asyncio.sleep(self.slow_delay)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        now_us = time.time_ns() // 1000
+        return web.json_response({
+            "jsonrpc": "2.0",
+            "result": {"index_price": 100.0 + self.requests, "estimated_delivery_price": 100.0},
+            "usIn": now_us,
+            "usOut": now_us,
+            "usDiff": 0,
+        })
+
+    async def get_index_chart_data(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        self.history_requests.append((request.query["index_name"], request.query["range"]))
+        return web.json_response({"jsonrpc": "2.0", "result": self.history})
+
+    async def __aenter__(self):
+        await self.server.start_server()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.server.close()
+
+
+class DeribitWebSocketStub:
+    """Local stand-in for the Deribit JSON-RPC WebSocket API
+
+    Each connection replies to public/subscribe, pushes `updates_per_connection`
+    index updates per subscribed channel and then drops the connection.
+    With `malformed` it first sends a non-JSON frame and an update without data.
+    """
+
+    def __init__(self, updates_per_connection: int = 3, malformed: bool = False):
+        self.updates_per_connection = updates_per_connection
+        self.malformed = malformed
+        self.subscriptions = []
+        self.app = web.Application()
+        self.app.router.add_get("/ws/api/v2", self.handle)
+        self.server = TestServer(self.app)
+
+    @property
+    def ws_url(self) -> str:
+        return str(self.server.make_url("/ws/api/v2"))
+
+    async def handle(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        async for message in ws:
+            payload = message.json()
+            await ws.send_json({"jsonrpc": "2.0", "id": payload["id"], "result": []})
+            if payload["method"] != "public/subscribe":
+                continue
+            channels = payload["params"]["channels"]
+            self.subscriptions.append(channels)
+            await ws.send_json({"jsonrpc": "2.0", "method": "heartbeat", "params": {"type": "test_request"}})
+            if self.malformed:
+                await ws.send_str("not json")
+                await ws.send_json({"jsonrpc": "2.0", "method": "subscription", "params": {"channel": channels[0]}})
+            for i in range(self.updates_per_connection):
+                for channel in channels:
+                    index_name = channel.split(".", 1)[1]
+                    await ws.send_json({
+                        "jsonrpc": "2.0",
+                        "method": "subscription",
+                        "params": {
+                            "channel": channel,
+                            "data": {"index_name": index_name, "price": 100.0 + i, "timestamp": 1700000000000 + i * 1000},
+                        },
+                    })
+            break
+        await ws.close()
+        return ws
+
+    async def __aenter__(self):
+        await self.server.start_server()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.server.close()
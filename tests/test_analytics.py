@@ -0,0 +1,93 @@
+import math
+import numpy as np
+import pytest
+from app import analytics
+from app.analytics import AnalyticsCache
+
+
+@pytest.fixture
+def series():
+    rng = np.random.default_rng(7)
+    timestamps = 1_700_000_000 + np.arange(500, dtype=np.int64) * 60
+    timestamps[300:] += 600  # a gap of ten missed ticks
+    prices = 40_000 * np.exp(np.cumsum(rng.normal(0, 0.001, 500)))
+    return timestamps, prices
+
+
+def test_to_arrays():
+    timestamps, prices = analytics.to_arrays([(1_700_000_000, 1.5), (1_700_000_060, 2.5)])
+    assert timestamps.dtype == np.int64 and timestamps.tolist() == [1_700_000_000, 1_700_000_060]
+    assert prices.tolist() == [1.5, 2.5]
+    assert analytics.to_arrays([])[0].shape == (0,)
+
+
+def test_rolling_mean_matches_loop(series):
+    _, prices = series
+    expected = [sum(prices[i:i + 20]) / 20 for i in range(len(prices) - 19)]
+    np.testing.assert_allclose(analytics.rolling_mean(prices, 20), expected, rtol=1e-12)
+    assert analytics.rolling_mean(prices[:5], 20).shape == (0,)
+
+
+def test_ewma_matches_recursion(series):
+    _, prices = series
+    for span in (1, 5, 2000):
+        alpha = 2 / (span + 1)
+        expected, value = [], prices[0]
+        for price in prices:
+            value = (1 - alpha) * value + alpha * price
+            expected.append(value)
+        np.testing.assert_allclose(analytics.ewma(prices, span), expected, rtol=1e-10)
+
+
+def test_ewma_long_series_stays_finite():
+    values = np.full(200_000, 100.0)
+    np.testing.assert_allclose(analytics.ewma(values, 3), values)
+
+
+def test_ewma_large_values_stay_finite():
+    values = np.full(100_000, 1e9)
+    np.testing.assert_allclose(analytics.ewma(values, 20), values)
+    values[::2] = 2e9
+    result = analytics.ewma(values, 20)
+    assert np.isfinite(result).all()
+    assert 1e9 <= result.min() and result.max() <= 2e9
+
+
+def test_realized_volatility_uses_elapsed_time(series):
+    timestamps, prices = series
+    window = 30
+    result = analytics.realized_volatility(timestamps, prices, window)
+    assert len(result) == len(prices) - window
+
+    returns = [math.log(prices[i + 1] / prices[i]) for i in range(len(prices) - 1)]
+    for i in (0, 280, len(result) - 1):
+        elapsed = timestamps[i + window] - timestamps[i]
+        expected = math.sqrt(sum(r * r for r in returns[i:i + window]) * analytics.SECONDS_PER_YEAR / elapsed)
+        assert result[i] == pytest.approx(expected, rel=1e-9)
+
+
+def test_max_drawdown():
+    timestamps = np.arange(6, dtype=np.int64)
+    prices = np.array([100.0, 120.0, 90.0, 110.0, 60.0, 130.0])
+    assert analytics.max_drawdown(timestamps, prices) == {
+        "max_drawdown": pytest.approx(-0.5), "peak_timestamp": 1, "trough_timestamp": 4
+    }
+
+
+def test_cache_evicts_least_recently_used():
+    cache = AnalyticsCache(maxsize=2)
+    cache.put("a", b"1")
+    cache.put("b", b"2")
+    assert cache.get("a") == b"1"
+    cache.put("c", b"3")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1" and cache.get("c") == b"3"
+    assert cache.stats == {"hits": 3, "misses": 1}
+
+
+def test_cache_key_ignores_window_for_unwindowed_metrics():
+    version = (1_700_000_000, 10)
+    assert analytics.cache_key("btc_usd", None, None, "drawdown", 5, version) == \
+        analytics.cache_key("btc_usd", None, None, "drawdown", 50, version)
+    assert analytics.cache_key("btc_usd", None, None, "ewma", 5, version) != \
+        analytics.cache_key("btc_usd", None, None, "ewma", 5, (1_700_000_060, 11))
@@ -1,9 +1,13 @@
+import asyncio
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from app.analytics import analytics_cache
+from app.cache import LatestPriceCache, get_latest_price_cache
 from app.main import app
-from app.database import get_db
+from app.database import get_async_db, get_async_session_factory, get_db
 from app.models import Base, PriceData
 import time
 
@@ -11,6 +15,8 @@ import time
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
 engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+async_engine = create_async_engine("sqlite+aiosqlite:///./test.db")
+TestingAsyncSessionLocal = async_sessionmaker(bind=async_engine, expire_on_commit=False)
 
 
 def override_get_db():
@@ -21,7 +27,15 @@ def override_get_db():
         db.close()
 
 
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_async_db] = override_get_async_db
+app.dependency_overrides[get_async_session_factory] = lambda: TestingAsyncSessionLocal
+app.dependency_overrides[get_latest_price_cache] = lambda: LatestPriceCache(local_ttl=0)
 
 
 @pytest.fixture(scope="function")
@@ -112,6 +126,164 @@ def test_get_prices_by_date_success(client, sample_data):
     assert len(data) >= 1
 
 
+@pytest.fixture(scope="function")
+def minute_data(test_db):
+    """Prices every minute from 2024-01-01T23:58:00Z to 2024-01-02T00:02:00Z"""
+    db = TestingSessionLocal()
+    start = 1704153480  # 2024-01-01T23:58:00Z
+    db.add_all(PriceData(ticker="btc_usd", price=float(i), timestamp=start + i * 60) for i in range(5))
+    db.commit()
+    db.close()
+    return start
+
+
+def filter_timestamps(client, **params):
+    response = client.get("/prices/filter", params={"ticker": "btc_usd", **params})
+    assert response.status_code == 200, response.text
+    return [row["timestamp"] for row in response.json()]
+
+
+def test_filter_date_end_includes_whole_day(client, minute_data):
+    """Test that a bare end date covers that whole UTC day and excludes the next"""
+    assert filter_timestamps(client, start_date="2024-01-01", end_date="2024-01-01") == [
+        minute_data + 60, minute_data
+    ]
+
+
+def test_filter_is_half_open(client, minute_data):
+    """Test [start, end) semantics across ISO datetimes, offsets and epoch values"""
+    expected = [minute_data + 60, minute_data]
+    assert filter_timestamps(client, start_date="2024-01-01T23:58:00Z", end_date="2024-01-02T00:00:00Z") == expected
+    assert filter_timestamps(
+        client, start_date="2024-01-02T00:58:00+01:00", end_date="2024-01-02T01:00:00+01:00"
+    ) == expected
+    assert filter_timestamps(client, start_date=str(minute_data), end_date=str(minute_data + 120)) == expected
+    assert filter_timestamps(
+        client, start_date=str(minute_data * 1000), end_date=str((minute_data + 120) * 1000)
+    ) == expected
+
+
+def test_filter_last_n_before(client, minute_data):
+    """Test "last N points before T" and ascending order with a cursor"""
+    assert filter_timestamps(client, end_date=str(minute_data + 180), limit=2) == [minute_data + 120, minute_data + 60]
+
+    response = client.get("/prices/filter", params={"ticker": "btc_usd", "order": "asc", "limit": 2})
+    assert [row["timestamp"] for row in response.json()] == [minute_data, minute_data + 60]
+    next_page = filter_timestamps(client, order="asc", limit=2, after=response.headers["X-Next-Cursor"])
+    assert next_page == [minute_data + 120, minute_data + 180]
+
+
+def test_get_latest_prices_batch(client, sample_data):
+    """Test resolving several latest prices in one request"""
+    response = client.get("/prices/latest?tickers=eth_usd,BTC_USD,doge_usd,btc_usd")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert list(data) == ["eth_usd", "btc_usd"]
+    assert data["btc_usd"]["price"] == 45200.25
+    assert data["eth_usd"]["price"] == 2500.30
+
+
+def test_get_latest_prices_batch_errors(client, sample_data):
+    """Test batch validation and the all-missing case"""
+    assert client.get("/prices/latest").status_code == 422
+    assert client.get("/prices/latest?tickers=,").status_code == 400
+    assert client.get("/prices/latest?tickers=doge_usd").status_code == 404
+
+
+def test_get_prices_batch(client, sample_data):
+    """Test per-ticker limits in the batch range endpoint"""
+    response = client.get("/prices/batch", params={"tickers": "btc_usd,eth_usd", "limit": 2, "order": "asc"})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert [row["price"] for row in data["btc_usd"]] == [45000.50, 45100.75]
+    assert [row["price"] for row in data["eth_usd"]] == [2500.30]
+
+
+def test_filter_conditional_request(client, minute_data):
+    """Test ETag/Last-Modified revalidation and immutable caching of settled ranges"""
+    params = {"ticker": "btc_usd", "end_date": str(minute_data + 180)}
+    response = client.get("/prices/filter", params=params)
+
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"].endswith("immutable")
+    assert response.headers["Last-Modified"] == "Tue, 02 Jan 2024 00:00:00 GMT"
+    etag = response.headers["ETag"]
+
+    cached = client.get("/prices/filter", params=params, headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["ETag"] == etag
+
+    since = client.get("/prices/filter", params=params, headers={"If-Modified-Since": response.headers["Last-Modified"]})
+    assert since.status_code == 304
+
+    db = TestingSessionLocal()
+    db.add(PriceData(ticker="btc_usd", price=0.5, timestamp=minute_data - 60))
+    db.commit()
+    db.close()
+    # A backfilled row older than the newest one still changes the ETag
+    assert client.get("/prices/filter", params=params, headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_recent_range_is_not_immutable():
+    """Test that a range the backfill can still reach is only cached until the next tick"""
+    from app.config import settings
+    from app.http_cache import cache_control, settle_seconds
+
+    now = 1_700_000_000
+    assert settle_seconds() > settings.backfill_lookback
+    assert cache_control(now - 3600, now=now) == "public, max-age=40"
+    assert cache_control(now - settle_seconds() - 1, now=now).endswith("immutable")
+
+
+def test_latest_price_cache_headers(client, sample_data):
+    """Test that latest prices revalidate and expire by the next tick"""
+    response = client.get("/prices/latest?ticker=btc_usd")
+    max_age = int(response.headers["Cache-Control"].rsplit("=", 1)[1])
+    assert 1 <= max_age <= 60
+
+    cached = client.get("/prices/latest?ticker=btc_usd", headers={"If-None-Match": response.headers["ETag"]})
+    assert cached.status_code == 304
+
+    batch = client.get("/prices/latest?tickers=btc_usd,eth_usd")
+    assert client.get(
+        "/prices/latest?tickers=btc_usd,eth_usd", headers={"If-None-Match": batch.headers["ETag"]}
+    ).status_code == 304
+    assert client.get(
+        "/prices/latest?tickers=btc_usd", headers={"If-None-Match": batch.headers["ETag"]}
+    ).status_code == 200
+
+
+def test_get_analytics(client, minute_data):
+    """Test analytics series, drawdown and memoization across a new tick"""
+    analytics_cache.clear()
+    response = client.get("/prices/analytics/rolling_mean", params={"ticker": "btc_usd", "window": 2})
+    assert response.status_code == 200
+    assert response.json() == {
+        "timestamp": [minute_data + 60 * i for i in range(1, 5)], "value": [0.5, 1.5, 2.5, 3.5]
+    }
+
+    drawdown = client.get("/prices/analytics/drawdown", params={"ticker": "btc_usd", "start_date": str(minute_data + 60)})
+    assert drawdown.json() == {
+        "max_drawdown": 0.0, "peak_timestamp": minute_data + 60, "trough_timestamp": minute_data + 60
+    }
+
+    client.get("/prices/analytics/rolling_mean", params={"ticker": "btc_usd", "window": 2})
+    assert analytics_cache.stats["hits"] == 1
+
+    db = TestingSessionLocal()
+    db.add(PriceData(ticker="btc_usd", price=5.0, timestamp=minute_data + 300))
+    db.commit()
+    db.close()
+    refreshed = client.get("/prices/analytics/rolling_mean", params={"ticker": "btc_usd", "window": 2})
+    assert refreshed.json()["value"][-1] == 4.5
+
+    assert client.get("/prices/analytics/ewma", params={"ticker": "doge_usd"}).status_code == 404
+    assert client.get("/prices/analytics/median", params={"ticker": "btc_usd"}).status_code == 422
+
+
 def test_get_prices_invalid_date_format(client, sample_data):
     """Test invalid date format"""
     response = client.get("/prices/filter?ticker=btc_usd&start_date=invalid-date")
@@ -125,4 +297,197 @@ def test_case_insensitive_ticker(client, sample_data):
 
     assert response1.status_code == 200
     assert response2.status_code == 200
-    assert response1.json()["price"] == response2.json()["price"]
\ No newline at end of file
+    assert response1.json()["price"] == response2.json()["price"]
+
+
+def test_get_latest_price_served_from_cache(client, test_db):
+    """Test that a cached latest price is returned without touching the database"""
+    cache = LatestPriceCache(local_ttl=60)
+    cache._set_local("btc_usd", {"id": 7, "ticker": "btc_usd", "price": 1.5, "timestamp": 1})
+    app.dependency_overrides[get_latest_price_cache] = lambda: cache
+    try:
+        response = client.get("/prices/latest?ticker=btc_usd")
+    finally:
+        app.dependency_overrides[get_latest_price_cache] = lambda: LatestPriceCache(local_ttl=0)
+
+    assert response.status_code == 200
+    assert response.json()["price"] == 1.5
+    assert cache.stats["local_hits"] == 1
+
+
+def test_get_all_prices_keyset_pagination(client, sample_data):
+    """Test paging through prices with limit and the X-Next-Cursor header"""
+    first = client.get("/prices/all?ticker=btc_usd&limit=2")
+    assert first.status_code == 200
+    assert len(first.json()) == 2
+    cursor = first.headers["X-Next-Cursor"]
+
+    second = client.get(f"/prices/all?ticker=btc_usd&limit=2&after={cursor}")
+    assert second.status_code == 200
+    assert len(second.json()) == 1
+    assert "X-Next-Cursor" not in second.headers
+
+    timestamps = [p["timestamp"] for p in first.json() + second.json()]
+    assert timestamps == sorted(timestamps, reverse=True)
+
+    # An exactly full last page has no cursor pointing at an empty page
+    whole = client.get("/prices/all?ticker=btc_usd&limit=3")
+    assert len(whole.json()) == 3
+    assert "X-Next-Cursor" not in whole.headers
+
+
+def test_get_all_prices_stream(client, sample_data):
+    """Test streaming all prices as NDJSON"""
+    import json
+
+    response = client.get("/prices/all?ticker=btc_usd&stream=true")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert len(rows) == 3
+    assert set(rows[0]) == {"id", "ticker", "price", "timestamp"}
+
+
+def test_ndjson_lines_batches_rows():
+    """Test that NDJSON output is chunked by chunk_size rows"""
+    from app.main import ndjson_lines
+
+    async def rows():
+        for i in range(3):
+            yield i, "btc_usd", 1.0, 60 * i
+
+    async def collect():
+        return [chunk async for chunk in ndjson_lines(rows(), 2)]
+
+    chunks = asyncio.run(collect())
+    assert [chunk.count(b"\n") for chunk in chunks] == [2, 1]
+
+
+def test_stream_prices_closes_session_on_error():
+    """Test that a failing first fetch still releases the streaming session"""
+    from sqlalchemy import exc
+    from app.main import stream_prices
+
+    class FailingSession:
+        closed = False
+
+        async def stream(self, query):
+            raise exc.OperationalError("SELECT", {}, TimeoutError("statement timeout"))
+
+        async def close(self):
+            self.closed = True
+
+    session = FailingSession()
+    with pytest.raises(exc.OperationalError):
+        asyncio.run(stream_prices(lambda: session, "btc_usd", None, None, "missing"))
+    assert session.closed
+
+
+def test_get_all_prices_stream_not_found(client, sample_data):
+    """Test that streaming an unknown ticker still returns 404"""
+    response = client.get("/prices/all?ticker=doge_usd&stream=true")
+    assert response.status_code == 404
+
+
+def test_get_ohlc(client, sample_data):
+    """Test OHLC endpoint returns aggregated buckets"""
+    response = client.get("/prices/ohlc?ticker=btc_usd&interval=1d")
+    assert response.status_code == 200
+    data = response.json()
+    assert sum(bucket["count"] for bucket in data) == 3
+    assert all(b["low"] <= b["open"] <= b["high"] and b["low"] <= b["close"] <= b["high"] for b in data)
+
+
+def test_get_ohlc_invalid_interval(client, sample_data):
+    """Test unsupported OHLC interval"""
+    response = client.get("/prices/ohlc?ticker=btc_usd&interval=7m")
+    assert response.status_code == 422
+
+
+def test_get_ohlc_from_rollups(client, test_db):
+    """Test that OHLC is served from rollups when they exist"""
+    from app.repository import PriceRepository
+
+    db = TestingSessionLocal()
+    PriceRepository(db).save_prices_bulk(
+        [("btc_usd", 10.0, 3600), ("btc_usd", 12.0, 3700)], rollups=True
+    )
+    db.close()
+
+    response = client.get("/prices/ohlc?ticker=btc_usd&interval=1h")
+    assert response.status_code == 200
+    assert response.json() == [
+        {"bucket": 3600, "open": 10.0, "high": 12.0, "low": 10.0, "close": 12.0, "count": 2}
+    ]
+
+
+def test_get_ohlc_rollups_match_raw_buckets(client, test_db):
+    """Test that bounds cutting through a bucket give the same buckets from rollups as from raw data"""
+    from app.repository import PriceRepository, ohlc_query
+
+    db = TestingSessionLocal()
+    PriceRepository(db).save_prices_bulk(
+        [("btc_usd", float(i % 7), 3600 + i * 600) for i in range(18)], rollups=True
+    )
+    raw = [dict(row._mapping) for row in db.execute(ohlc_query("btc_usd", 3600, 4500, 12900))]
+    db.close()
+
+    response = client.get("/prices/ohlc?ticker=btc_usd&interval=1h&start_date=4500&end_date=12900")
+    assert response.status_code == 200
+    assert response.json() == [
+        {key: bucket[key] for key in ("bucket", "open", "high", "low", "close", "count")} for bucket in raw
+    ]
+    # The partial first bucket only counts prices from 4500 on
+    assert response.json()[0]["count"] == 4
+
+
+def test_list_endpoints_keep_openapi_schema(client):
+    """Test that fast-path list endpoints still document List[PriceResponse]"""
+    schema = client.get("/openapi.json").json()
+    for path in ("/prices/all", "/prices/filter"):
+        body = schema["paths"][path]["get"]["responses"]["200"]["content"]["application/json"]["schema"]
+        assert body["type"] == "array"
+        assert body["items"]["$ref"].endswith("/PriceResponse")
+
+
+def test_export_arrow(client, sample_data):
+    """Test Arrow IPC export is readable and oldest-first"""
+    import pyarrow as pa
+
+    response = client.get("/prices/export?ticker=btc_usd&format=arrow")
+    assert response.status_code == 200
+
+    table = pa.ipc.open_stream(response.content).read_all()
+    assert table.column_names == ["timestamp", "price"]
+    assert table.num_rows == 3
+    assert table["timestamp"].to_pylist() == sorted(table["timestamp"].to_pylist())
+
+
+def test_export_parquet(client, sample_data):
+    """Test Parquet export"""
+    import io
+    import pyarrow.parquet as pq
+
+    response = client.get("/prices/export?ticker=btc_usd&format=parquet")
+    assert response.status_code == 200
+    assert pq.read_table(io.BytesIO(response.content)).num_rows == 3
+
+
+def test_export_binary_loads_zero_copy(client, sample_data):
+    """Test packed binary export maps directly onto a NumPy structured array"""
+    import numpy as np
+    from app.export import BINARY_DTYPE
+
+    response = client.get("/prices/export?ticker=btc_usd&format=binary")
+    assert response.status_code == 200
+
+    records = np.frombuffer(response.content, dtype=BINARY_DTYPE)
+    assert len(records) == 3
+    assert records["price"][-1] == 45200.25
+
+
+def test_export_not_found(client, sample_data):
+    """Test export for a ticker without data"""
+    response = client.get("/prices/export?ticker=doge_usd&format=binary")
+    assert response.status_code == 404
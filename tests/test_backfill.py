@@ -0,0 +1,81 @@
+import asyncio
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.backfill import backfill_gaps, fill_points, history_range
+from app.deribit_client import DeribitClient
+from app.models import Base
+from app.repository import PriceRepository
+from tests.deribit_stub import DeribitStub
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_backfill.db"
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+NOW = 1_700_000_000 - 1_700_000_000 % 60
+
+
+@pytest.fixture(scope="function")
+def db_session():
+    """Create a test database session"""
+    Base.metadata.create_all(bind=engine)
+    session = TestingSessionLocal()
+    yield session
+    session.close()
+    Base.metadata.drop_all(bind=engine)
+
+
+def test_find_gaps(db_session):
+    """Test gap detection against a one-minute cadence"""
+    repository = PriceRepository(db_session)
+    minutes = [0, 1, 2, 6, 7, 10]
+    repository.save_prices_bulk([("btc_usd", 1.0, NOW + m * 60) for m in minutes])
+    repository.save_prices_bulk([("eth_usd", 1.0, NOW + m * 60) for m in (0, 5)])
+
+    assert repository.find_gaps("btc_usd", 60) == [(NOW + 120, NOW + 360), (NOW + 420, NOW + 600)]
+    assert repository.find_gaps("btc_usd", 60, start_timestamp=NOW + 360) == [(NOW + 420, NOW + 600)]
+
+
+def test_history_range_picks_smallest_cover():
+    """Test choice of Deribit history range"""
+    assert history_range(NOW - 600, NOW) == "1h"
+    assert history_range(NOW - 7200, NOW) == "1d"
+    assert history_range(NOW - 40 * 86400, NOW) == "1y"
+
+
+def test_fill_points_only_inside_gaps():
+    """Test that history points are only used for missing slots"""
+    gaps = [(NOW, NOW + 240)]
+    points = [((NOW + s) * 1000, float(s)) for s in (0, 25, 60, 65, 120, 180, 240, 300)]
+
+    assert fill_points(gaps, points, 60) == [(NOW + 60, 60.0), (NOW + 120, 120.0), (NOW + 180, 180.0)]
+
+
+def test_fill_points_snaps_to_tick_grid():
+    """Test that off-grid history points are stamped with the slot they fill"""
+    gaps = [(NOW, NOW + 240)]
+    points = [((NOW + s) * 1000 + 250, float(s)) for s in (58, 125, 181)]
+
+    assert fill_points(gaps, points, 60) == [(NOW + 60, 58.0), (NOW + 120, 125.0), (NOW + 180, 181.0)]
+
+
+def test_backfill_gaps_fills_holes_from_history(db_session):
+    """Test end-to-end backfill against a local history stub"""
+    repository = PriceRepository(db_session)
+    repository.save_prices_bulk([("btc_usd", 1.0, NOW + m * 60) for m in (0, 1, 5)])
+    history = [((NOW + m * 60) * 1000, 100.0 + m) for m in range(6)]
+
+    async def runner():
+        async with DeribitStub(history=history) as stub:
+            client = DeribitClient(base_url=stub.api_url, max_retries=0)
+            written = await asyncio.to_thread(
+                backfill_gaps, db_session, ["btc_usd", "eth_usd"],
+                cadence=60, lookback=3600, client=client, now=NOW + 360
+            )
+            return written, stub.history_requests
+
+    written, requests = asyncio.run(runner())
+
+    assert written == {"btc_usd": 3}
+    assert requests == [("btc_usd", "1h")]
+    assert repository.find_gaps("btc_usd", 60) == []
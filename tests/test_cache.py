@@ -0,0 +1,97 @@
+import asyncio
+import fakeredis
+import pytest
+import redis.asyncio as aioredis
+from app.cache import LatestPriceCache
+
+PAYLOAD = {"id": 1, "ticker": "btc_usd", "price": 45000.5, "timestamp": 1700000000}
+
+
+@pytest.fixture(scope="function")
+def cache():
+    """Create a cache backed by an in-memory Redis"""
+    server = fakeredis.FakeServer()
+    return LatestPriceCache(
+        redis_client=fakeredis.FakeRedis(server=server),
+        async_redis_client=fakeredis.FakeAsyncRedis(server=server),
+        local_ttl=60,
+    )
+
+
+def test_miss_on_empty_cache(cache):
+    """Test that an empty cache reports a miss"""
+    assert asyncio.run(cache.get("btc_usd")) is None
+    assert cache.stats["misses"] == 1
+
+
+def test_publish_then_get_hits_redis_then_local(cache):
+    """Test write-through from the collector and promotion into the local tier"""
+    cache.publish([PAYLOAD])
+
+    async def scenario():
+        return await cache.get("btc_usd"), await cache.get("btc_usd")
+
+    assert asyncio.run(scenario()) == (PAYLOAD, PAYLOAD)
+    assert cache.stats["redis_hits"] == 1
+    assert cache.stats["local_hits"] == 1
+
+
+def test_fill_does_not_overwrite_newer_value(cache):
+    """Test that a database fill never clobbers a value published by the collector"""
+    newer = dict(PAYLOAD, price=46000.0, timestamp=PAYLOAD["timestamp"] + 60)
+    cache.publish([newer])
+
+    async def scenario():
+        await cache.fill(PAYLOAD)
+        cache._local.clear()
+        return await cache.get("btc_usd")
+
+    assert asyncio.run(scenario()) == newer
+
+
+def test_get_many_and_fill_many(cache):
+    """Test batch lookups across both tiers and batch fills"""
+    eth = {"id": 2, "ticker": "eth_usd", "price": 2500.0, "timestamp": 1700000000}
+    cache.publish([PAYLOAD])
+
+    async def scenario():
+        first = await cache.get_many(["btc_usd", "eth_usd"])
+        await cache.fill_many([eth])
+        cache._local.clear()
+        return first, await cache.get_many(["btc_usd", "eth_usd"])
+
+    first, second = asyncio.run(scenario())
+    assert first == {"btc_usd": PAYLOAD}
+    assert second == {"btc_usd": PAYLOAD, "eth_usd": eth}
+    assert cache.stats["misses"] == 1
+
+
+def test_local_tier_is_bounded():
+    """Test that the in-process tier evicts least recently used tickers"""
+    cache = LatestPriceCache(local_ttl=60, local_maxsize=2)
+    for i in range(3):
+        asyncio.run(cache.fill(dict(PAYLOAD, ticker=f"t{i}")))
+
+    assert list(cache._local) == ["t1", "t2"]
+
+
+def test_redis_outage_falls_back_to_miss():
+    """Test that Redis errors are counted and treated as misses"""
+    unreachable = aioredis.Redis(host="127.0.0.1", port=1, socket_timeout=0.2)
+    cache = LatestPriceCache(async_redis_client=unreachable)
+
+    assert asyncio.run(cache.get("btc_usd")) is None
+    assert cache.stats["errors"] == 1
+
+
+def test_publish_keeps_newer_cached_price(cache):
+    """Test that a drained backlog never overwrites a newer published price"""
+    newer = dict(PAYLOAD, id=3, price=46000.0, timestamp=PAYLOAD["timestamp"] + 120)
+    assert cache.publish([newer]) == [newer]
+
+    older = dict(PAYLOAD, id=2, timestamp=PAYLOAD["timestamp"] + 60)
+    assert cache.publish([older, PAYLOAD]) == []
+    eth = {"id": 4, "ticker": "eth_usd", "price": 2500.0, "timestamp": 1700000000}
+    assert cache.publish([PAYLOAD, eth]) == [eth]
+
+    assert asyncio.run(cache.get("btc_usd")) == newer
@@ -0,0 +1,151 @@
+import asyncio
+import time
+from types import SimpleNamespace
+import fakeredis
+import pytest
+from celery.exceptions import SoftTimeLimitExceeded
+from app import tasks
+from app.deribit_client import DeribitClient
+from app.tasks import acquire_tick_lock, fetch_prices, tick_timestamp
+from tests.deribit_stub import DeribitStub
+
+
+def run_with_stub(coro_factory, latency: float = 0.0):
+    async def runner():
+        async with DeribitStub(latency=latency) as stub:
+            client = DeribitClient(base_url=stub.api_url, max_retries=0)
+            try:
+                return stub, await coro_factory(client)
+            finally:
+                await client.close()
+
+    return asyncio.run(runner())
+
+
+def test_client_reuses_pooled_session():
+    """Test that consecutive calls share one ClientSession"""
+    async def scenario(client):
+        await client.get_index_price("btc_usd")
+        first = client._session
+        await client.get_index_price("eth_usd")
+        return first is client._session
+
+    stub, same_session = run_with_stub(scenario)
+    assert same_session
+    assert stub.requests == 2
+
+
+def test_fetch_prices_runs_concurrently():
+    """Test that tickers are fetched concurrently rather than one by one"""
+    tickers = [f"t{i}_usd" for i in range(10)]
+
+    async def scenario(client):
+        started = time.perf_counter()
+        results = await fetch_prices(tickers, client=client)
+        return results, time.perf_counter() - started
+
+    stub, (results, elapsed) = run_with_stub(scenario, latency=0.2)
+
+    assert [r[0] for r in results] == tickers
+    assert all(r[1] is not None for r in results)
+    assert elapsed < 1.0
+
+
+def test_fetch_prices_handles_unreachable_api():
+    """Test that an unreachable API yields None prices instead of raising"""
+    async def scenario(client):
+        client.base_url = "http://127.0.0.1:1/api/v2"
+        return await fetch_prices(["btc_usd"], client=client)
+
+    _, results = run_with_stub(scenario)
+    assert results[0][0] == "btc_usd"
+    assert results[0][1] is None
+
+
+def test_tick_rows_share_aligned_timestamp():
+    """Test that a tick stamps every row with one aligned time plus the exchange time"""
+    tickers = ["btc_usd", "eth_usd", "sol_usd"]
+
+    async def scenario(client):
+        return await fetch_prices(tickers, client=client)
+
+    before_ms = int(time.time() * 1000)
+    _, results = run_with_stub(scenario, latency=0.05)
+    after_ms = int(time.time() * 1000)
+
+    assert len({r[2] for r in results}) == 1
+    assert results[0][2] % 60 == 0
+    assert all(before_ms <= r[3] <= after_ms for r in results)
+
+
+def test_tick_timestamp_alignment():
+    """Test minute-boundary alignment of tick timestamps"""
+    assert tick_timestamp(1_700_000_099.9, cadence=60) == 1_700_000_040
+    assert tick_timestamp(1_700_000_040.0, cadence=60) == 1_700_000_040
+    assert tick_timestamp(1_700_000_039.5, cadence=60) == 1_699_999_980
+
+
+def test_tick_lock_prevents_overlapping_runs(monkeypatch):
+    """Test that a second tick is skipped while the first still holds the lock"""
+    redis_client = fakeredis.FakeRedis()
+    monkeypatch.setattr(tasks, "tick_lock_redis", redis_client)
+
+    first = acquire_tick_lock("collector")
+    second = acquire_tick_lock("collector")
+
+    assert first is not None and second is None
+    assert redis_client.get("lock:collector").decode() == first
+    # A crashed tick must not block collection for longer than the tick TTL
+    assert 0 < redis_client.ttl("lock:collector") <= tasks.settings.collector_tick_ttl
+
+
+@pytest.fixture
+def eager_celery(monkeypatch):
+    """Run chords inline and capture the merged write instead of touching the database"""
+    monkeypatch.setattr(tasks.celery_app.conf, "task_always_eager", True)
+    monkeypatch.setattr(tasks, "tick_lock_redis", fakeredis.FakeRedis())
+    monkeypatch.setattr(tasks.settings, "tickers", [f"t{i}_usd" for i in range(20)])
+    monkeypatch.setattr(tasks.settings, "collector_shards", 4)
+    monkeypatch.setattr(tasks, "_collector_spool", None)
+    monkeypatch.setattr(tasks.settings, "spool_path", None)
+    monkeypatch.setattr(tasks.db_manager, "get_session", lambda: SimpleNamespace(close=lambda: None))
+    writes = []
+    monkeypatch.setattr(tasks, "save_tick", lambda repository, rows: writes.append(rows) or rows)
+    return writes
+
+
+def test_tick_fans_out_to_shards_and_writes_once(eager_celery, monkeypatch):
+    """Test that shards are fetched separately and merged into a single bulk write"""
+    shard_calls = []
+
+    async def fake_fetch_prices(tickers, client=None, timestamp=None, timeout=None):
+        shard_calls.append(list(tickers))
+        return [(ticker, 1.0, timestamp, None) for ticker in tickers]
+
+    monkeypatch.setattr(tasks, "fetch_prices", fake_fetch_prices)
+
+    tasks.fetch_and_save_prices.apply()
+
+    assert len(shard_calls) > 1
+    assert sorted(t for shard in shard_calls for t in shard) == sorted(tasks.settings.tickers)
+    assert len(eager_celery) == 1
+    assert sorted(row[0] for row in eager_celery[0]) == sorted(tasks.settings.tickers)
+    assert len({row[2] for row in eager_celery[0]}) == 1
+
+
+def test_shard_missing_deadline_is_reassigned(eager_celery, monkeypatch):
+    """Test that a shard hitting its soft time limit is requeued once"""
+    attempts = []
+
+    async def flaky_fetch_prices(tickers, client=None, timestamp=None, timeout=None):
+        attempts.append(list(tickers))
+        if len(attempts) == 1:
+            raise SoftTimeLimitExceeded()
+        return [(ticker, 1.0, timestamp, None) for ticker in tickers]
+
+    monkeypatch.setattr(tasks, "fetch_prices", flaky_fetch_prices)
+
+    result = tasks.fetch_shard.apply(args=(["btc_usd"], 1_700_000_040, time.time() + 30)).get()
+
+    assert len(attempts) == 2
+    assert [tuple(row) for row in result] == [("btc_usd", 1.0, 1_700_000_040, None)]
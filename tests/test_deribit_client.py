@@ -0,0 +1,127 @@
+import asyncio
+import pytest
+from app.deribit_client import CircuitBreaker, DeribitClient, reset_breakers
+from tests.deribit_stub import DeribitStub
+
+
+@pytest.fixture(autouse=True)
+def fresh_breakers():
+    """Breakers are process-wide; keep them from leaking between tests"""
+    reset_breakers()
+    yield
+    reset_breakers()
+
+
+def call_stub(faults, deadline_in=None, **client_kwargs):
+    async def scenario():
+        async with DeribitStub(faults=faults, slow_delay=0.5) as stub:
+            client = DeribitClient(base_url=stub.api_url, backoff_base=0.01, backoff_max=0.02, **client_kwargs)
+            deadline = None if deadline_in is None else asyncio.get_running_loop().time() + deadline_in
+            try:
+                price = await client.get_index_price("btc_usd", deadline)
+            finally:
+                await client.close()
+            return price, client, stub
+
+    return asyncio.run(scenario())
+
+
+def test_retries_transient_errors():
+    """Test that 5xx errors are retried until a price is returned"""
+    price, client, stub = call_stub(["error", "error"], max_retries=3)
+
+    assert price is not None
+    assert stub.requests == 3
+    assert client.stats["retries"] == 2
+    assert client.stats["errors"] == 2
+
+
+def test_gives_up_after_max_retries():
+    """Test that retries are bounded"""
+    price, client, stub = call_stub(["error"] * 5, max_retries=2)
+
+    assert price is None
+    assert stub.requests == 3
+
+
+def test_rate_limit_is_retried_without_tripping_breaker():
+    """Test handling of Deribit's too_many_requests error"""
+    price, client, stub = call_stub(["rate_limit"] * 3, max_retries=3)
+
+    assert price is not None
+    assert client.stats["rate_limited"] == 3
+    assert client.breaker("public/get_index_price").state == CircuitBreaker.CLOSED
+
+
+def test_client_errors_are_not_retried():
+    """Test that a rejected request is not retried"""
+    price, client, stub = call_stub(["bad_request"], max_retries=3)
+
+    assert price is None
+    assert stub.requests == 1
+
+
+def test_retries_stop_at_deadline():
+    """Test that a slow endpoint cannot push retries past the tick deadline"""
+    price, client, stub = call_stub(["slow"] * 5, deadline_in=0.2, max_retries=5)
+
+    assert price is None
+    assert stub.requests == 1
+
+
+def test_circuit_breaker_opens_and_recovers(monkeypatch):
+    """Test the closed -> open -> half-open -> closed cycle"""
+    now = [1000.0]
+    monkeypatch.setattr("app.deribit_client.time.monotonic", lambda: now[0])
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10)
+
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+    now[0] += 10
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+
+def test_open_circuit_short_circuits_calls():
+    """Test that an open circuit rejects calls without hitting the API"""
+    price, client, stub = call_stub(["error"] * 10, max_retries=9)
+
+    assert price is None
+    assert stub.requests == 5
+    assert client.stats["circuit_rejected"] == 1
+
+
+def test_malformed_body_is_retried():
+    """Test that a 200 answer without a JSON-RPC envelope counts as a failed attempt"""
+    price, client, stub = call_stub(["malformed", "malformed"], max_retries=3)
+
+    assert price is not None
+    assert stub.requests == 3
+    assert client.stats["errors"] == 2
+
+
+def test_open_circuit_outlives_client():
+    """Test that a circuit opened by one client keeps rejecting calls of the next one"""
+    async def scenario():
+        async with DeribitStub(faults=["error"] * 10) as stub:
+            for _ in range(2):
+                client = DeribitClient(base_url=stub.api_url, max_retries=9, backoff_base=0.01, backoff_max=0.02)
+                try:
+                    await client.get_index_price("btc_usd")
+                finally:
+                    await client.close()
+            return client, stub
+
+    client, stub = asyncio.run(scenario())
+    assert stub.requests == 5
+    assert client.stats["requests"] == 0
+    assert client.stats["circuit_rejected"] == 1
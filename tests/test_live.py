@@ -0,0 +1,154 @@
+import asyncio
+import time
+import fakeredis
+import pytest
+from fastapi.testclient import TestClient
+from app.live import PriceHub, PricePublisher, get_price_hub
+from app.main import app, stream_live_prices
+
+BTC = {"id": 1, "ticker": "btc_usd", "price": 45000.5, "timestamp": 1700000000}
+ETH = {"id": 2, "ticker": "eth_usd", "price": 2500.0, "timestamp": 1700000000}
+
+
+def test_dispatch_respects_ticker_filter():
+    """Test that subscribers only receive their tickers"""
+    async def scenario():
+        hub = PriceHub()
+        btc_only = hub.subscribe(["BTC_USD"])
+        everything = hub.subscribe()
+        hub.dispatch(BTC)
+        hub.dispatch(ETH)
+        return btc_only.queue.qsize(), everything.queue.qsize()
+
+    assert asyncio.run(scenario()) == (1, 2)
+
+
+def test_slow_subscriber_is_bounded():
+    """Test that a slow consumer keeps only the newest updates"""
+    async def scenario():
+        hub = PriceHub(queue_size=2)
+        subscriber = hub.subscribe()
+        for i in range(5):
+            hub.dispatch(dict(BTC, price=float(i)))
+        return subscriber.dropped, [(await subscriber.get())["price"] for _ in range(2)]
+
+    assert asyncio.run(scenario()) == (3, [3.0, 4.0])
+
+
+def test_unsubscribe_releases_subscriber():
+    """Test that disconnected clients are removed from the hub"""
+    async def scenario():
+        hub = PriceHub()
+        subscriber = hub.subscribe(["btc_usd", "eth_usd"])
+        hub.unsubscribe(subscriber)
+        return hub.subscriber_count
+
+    assert asyncio.run(scenario()) == 0
+
+
+def test_publisher_fans_out_through_redis():
+    """Test the collector -> Redis pub/sub -> hub path"""
+    server = fakeredis.FakeServer()
+    publisher = PricePublisher(fakeredis.FakeRedis(server=server))
+
+    async def scenario():
+        hub = PriceHub(fakeredis.FakeAsyncRedis(server=server))
+        subscriber = hub.subscribe(["btc_usd"])
+        await asyncio.sleep(0.05)
+        publisher.publish([ETH, BTC])
+        try:
+            return await asyncio.wait_for(subscriber.get(), timeout=2)
+        finally:
+            await hub.stop()
+
+    assert asyncio.run(scenario()) == BTC
+
+
+def test_hub_skips_malformed_messages():
+    """Test that garbage on the channel is logged and later prices still arrive"""
+    server = fakeredis.FakeServer()
+    publisher = PricePublisher(fakeredis.FakeRedis(server=server))
+
+    async def scenario():
+        hub = PriceHub(fakeredis.FakeAsyncRedis(server=server))
+        subscriber = hub.subscribe()
+        await asyncio.sleep(0.05)
+        publisher.redis.publish(publisher.channel, "not json")
+        publisher.redis.publish(publisher.channel, "[1, 2]")
+        publisher.redis.publish(publisher.channel, '{"price": 1.0}')
+        publisher.publish([BTC])
+        try:
+            return await asyncio.wait_for(subscriber.get(), timeout=2)
+        finally:
+            await hub.stop()
+
+    assert asyncio.run(scenario()) == BTC
+
+
+def test_sse_subscribes_only_while_streaming():
+    """Test that /prices/stream registers its subscriber when the body starts and drops it when it ends"""
+    async def scenario():
+        hub = PriceHub()
+        response = await stream_live_prices(tickers="btc_usd", hub=hub)
+        before = hub.subscriber_count
+        first = asyncio.ensure_future(response.body_iterator.__anext__())
+        await asyncio.sleep(0)
+        during = hub.subscriber_count
+        hub.dispatch(BTC)
+        chunk = await first
+        await response.body_iterator.aclose()
+        return before, during, chunk, hub.subscriber_count
+
+    before, during, chunk, after = asyncio.run(scenario())
+    assert (before, during, after) == (0, 1, 0)
+    assert chunk.startswith(b"data: ") and b"btc_usd" in chunk
+
+
+def wait_for(condition, timeout: float = 2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+@pytest.fixture(scope="function")
+def hub_client(monkeypatch):
+    """Test client with an isolated hub that has no Redis behind it"""
+    monkeypatch.setattr("app.main.init_db", lambda: None)
+    hub = PriceHub()
+    app.dependency_overrides[get_price_hub] = lambda: hub
+    with TestClient(app) as client:
+        yield client, hub
+    del app.dependency_overrides[get_price_hub]
+
+
+def test_websocket_receives_filtered_prices(hub_client):
+    """Test live prices pushed over /ws/prices"""
+    client, hub = hub_client
+    with client.websocket_connect("/ws/prices?tickers=btc_usd") as websocket:
+        wait_for(lambda: hub.subscriber_count == 1)
+        client.portal.call(hub.dispatch, ETH)
+        client.portal.call(hub.dispatch, BTC)
+        assert websocket.receive_json() == BTC
+
+        websocket.send_json({"tickers": ["eth_usd"]})
+        wait_for(lambda: "eth_usd" in hub._by_ticker)
+        client.portal.call(hub.dispatch, ETH)
+        assert websocket.receive_json() == ETH
+    wait_for(lambda: hub.subscriber_count == 0)
+
+
+def test_websocket_rejects_malformed_filter(hub_client):
+    """Test that an invalid filter message gets an error frame and keeps the connection"""
+    client, hub = hub_client
+    with client.websocket_connect("/ws/prices?tickers=btc_usd") as websocket:
+        wait_for(lambda: hub.subscriber_count == 1)
+        for message in ({"tickers": "eth_usd"}, {"tickers": [1, 2]}, {"filter": []}):
+            websocket.send_json(message)
+            assert "error" in websocket.receive_json()
+        websocket.send_text("not json")
+        assert "error" in websocket.receive_json()
+
+        assert set(hub._by_ticker) == {"btc_usd"}
+        client.portal.call(hub.dispatch, BTC)
+        assert websocket.receive_json() == BTC
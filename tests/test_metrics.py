@@ -0,0 +1,89 @@
+import asyncio
+from types import SimpleNamespace
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app import metrics, tasks
+from app.deribit_client import DeribitClient
+from app.main import app
+from app.models import Base
+from app.repository import PriceRepository
+from tests.deribit_stub import DeribitStub
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_metrics_endpoint_and_route_labels(monkeypatch):
+    """Test that requests are recorded per route template and exposed"""
+    monkeypatch.setattr("app.main.init_db", lambda: None)
+    labels = {"method": "GET", "route": "/", "status": "200"}
+    before = sample("http_request_duration_seconds_count", **labels)
+    unmatched_before = sample("http_request_duration_seconds_count", method="GET", route="unmatched", status="404")
+
+    with TestClient(app) as client:
+        client.get("/")
+        client.get("/no/such/path/123")
+        response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert b"http_request_duration_seconds_bucket" in response.content
+    assert sample("http_request_duration_seconds_count", **labels) == before + 1
+    assert sample(
+        "http_request_duration_seconds_count", method="GET", route="unmatched", status="404"
+    ) == unmatched_before + 1
+
+
+def test_repository_queries_are_labelled(tmp_path):
+    """Test per-query timing through the engine hooks"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'metrics.db'}")
+    metrics.instrument_engine(engine)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    before = sample("db_query_duration_seconds_count", query="get_latest_by_ticker", operation="SELECT")
+
+    repository = PriceRepository(session)
+    repository.save_prices_bulk([("btc_usd", 1.0, 1_700_000_000)])
+    repository.get_latest_by_ticker("btc_usd")
+    session.close()
+
+    assert sample("db_query_duration_seconds_count", query="get_latest_by_ticker", operation="SELECT") == before + 1
+    assert sample("db_query_duration_seconds_count", query="save_prices_bulk", operation="INSERT") >= 1
+
+
+def test_deribit_outcomes_per_ticker():
+    """Test Deribit latency and outcome counters"""
+    ok_before = sample("deribit_requests_total", method="public/get_index_price", ticker="btc_usd", outcome="ok")
+    error_before = sample("deribit_requests_total", method="public/get_index_price", ticker="btc_usd", outcome="error")
+
+    async def scenario():
+        async with DeribitStub(faults=["error"]) as stub:
+            client = DeribitClient(base_url=stub.api_url, max_retries=1, backoff_base=0.01, backoff_max=0.01)
+            try:
+                await client.get_index_price("btc_usd")
+            finally:
+                await client.close()
+
+    asyncio.run(scenario())
+
+    assert sample("deribit_requests_total", method="public/get_index_price", ticker="btc_usd", outcome="ok") == ok_before + 1
+    assert sample(
+        "deribit_requests_total", method="public/get_index_price", ticker="btc_usd", outcome="error"
+    ) == error_before + 1
+    assert sample("deribit_request_duration_seconds_count", method="public/get_index_price", ticker="btc_usd") >= 2
+
+
+def test_task_signals_record_lag_and_duration():
+    """Test Celery signal handlers used for task metrics"""
+    headers = {}
+    tasks.stamp_publish_time(headers=headers)
+    task = SimpleNamespace(name="app.tasks.example", request=SimpleNamespace(get=headers.get))
+
+    tasks.record_task_start(task_id="t-1", task=task)
+    tasks.record_task_duration(task_id="t-1", task=task, state="SUCCESS")
+
+    assert sample("celery_task_lag_seconds_count", task="app.tasks.example") == 1
+    assert sample("celery_task_duration_seconds_count", task="app.tasks.example", state="SUCCESS") == 1
@@ -0,0 +1,34 @@
+from datetime import datetime, timezone
+from app.partitioning import (
+    add_months,
+    month_start,
+    months_between,
+    parse_partition_name,
+    partition_name,
+)
+
+
+def test_month_start_is_utc():
+    """Test that partition bounds are computed in UTC"""
+    assert month_start(2024, 3) == int(datetime(2024, 3, 1, tzinfo=timezone.utc).timestamp())
+
+
+def test_add_months_wraps_years():
+    """Test month arithmetic across year boundaries"""
+    assert add_months(2024, 11, 3) == (2025, 2)
+    assert add_months(2024, 1, -1) == (2023, 12)
+
+
+def test_partition_name_round_trip():
+    """Test that partition names can be parsed back into (year, month)"""
+    assert partition_name(2024, 3) == "price_data_y2024m03"
+    assert parse_partition_name("price_data_y2024m03") == (2024, 3)
+    assert parse_partition_name("price_data_default") is None
+
+
+def test_months_between_covers_both_ends():
+    """Test that every month touched by a range gets a partition"""
+    start = month_start(2024, 11) + 5
+    end = month_start(2025, 2) + 5
+
+    assert list(months_between(start, end)) == [(2024, 11), (2024, 12), (2025, 1), (2025, 2)]
@@ -0,0 +1,83 @@
+import pytest
+from sqlalchemy import exc, text
+from app.config import settings
+from app.database import DatabaseManager
+from app.pooling import engine_options
+
+
+@pytest.fixture
+def manager(tmp_path):
+    return DatabaseManager(f"sqlite:///{tmp_path / 'pool.db'}")
+
+
+def test_engine_options(monkeypatch):
+    """Test pool sizing, pre-ping and statement timeout options per driver"""
+    monkeypatch.setattr(settings, "db_statement_timeout", 2.5)
+    monkeypatch.setattr(settings, "db_pre_ping", "always")
+
+    psycopg = engine_options("postgresql://u:p@db/prices")
+    assert psycopg["pool_pre_ping"] is True
+    assert psycopg["pool_size"] == settings.db_pool_size
+    assert psycopg["connect_args"] == {"options": "-c statement_timeout=2500"}
+
+    asyncpg = engine_options("postgresql+asyncpg://u:p@db/prices", is_async=True)
+    assert asyncpg["connect_args"] == {"server_settings": {"statement_timeout": "2500"}}
+
+    assert engine_options("sqlite://") == {"pool_pre_ping": True}
+
+
+def test_pool_stats_track_checkouts(manager):
+    """Test that pool stats report connections in use, idle connections and checkouts"""
+    with manager.engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        busy = manager.pool_stats()["sync"]
+        assert busy["checked_out"] == 1
+        assert busy["saturation"] == pytest.approx(1 / (settings.db_pool_size + settings.db_max_overflow), abs=1e-3)
+
+    stats = manager.pool_stats()["sync"]
+    assert stats["checked_out"] == 0 and stats["idle"] == 1
+    assert stats["checkouts"] == 1
+
+
+def test_pool_timeout_counted(tmp_path, monkeypatch):
+    """Test that a checkout giving up after pool_timeout is counted"""
+    monkeypatch.setattr(settings, "db_pool_size", 1)
+    monkeypatch.setattr(settings, "db_max_overflow", 0)
+    monkeypatch.setattr(settings, "db_pool_timeout", 0.01)
+    manager = DatabaseManager(f"sqlite:///{tmp_path / 'pool.db'}")
+
+    with manager.engine.connect():
+        with pytest.raises(exc.TimeoutError):
+            manager.engine.connect()
+    stats = manager.pool_stats()["sync"]
+    assert stats["timeouts"] == 1 and stats["saturation"] == 0.0
+
+
+def test_idle_connection_pinged_and_replaced(manager, monkeypatch):
+    """Test that an idle connection failing its pre-ping is replaced"""
+    monkeypatch.setattr(settings, "db_pre_ping_idle", 0.0)
+    with manager.engine.connect():
+        pass
+
+    def failed_ping(dbapi_connection):
+        raise RuntimeError("server closed the connection")
+
+    monkeypatch.setattr(manager.engine.dialect, "do_ping", failed_ping, raising=False)
+    first = manager.engine.pool._pool.queue[0].dbapi_connection
+    with manager.engine.connect() as conn:
+        monkeypatch.undo()
+        assert conn.connection.dbapi_connection is not first
+
+
+def test_reset_after_fork_keeps_stats(manager):
+    """Test that a pool recreated after fork keeps reporting into the same stats"""
+    with manager.engine.connect():
+        pass
+    old_pool = manager.engine.pool
+
+    manager.reset_after_fork()
+
+    assert manager.engine.pool is not old_pool
+    with manager.engine.connect():
+        pass
+    assert manager.pool_stats()["sync"]["checkouts"] == 2
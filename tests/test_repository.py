@@ -91,14 +91,14 @@ def test_get_by_date_range(repository):
     repository.save_price(ticker, 46000.0, base_time - 1800)  # 30 min ago
     repository.save_price(ticker, 46500.0, base_time)  # now
 
-    # Query for prices from 1.5 hours ago to 30 min ago
+    # Query for prices from 1.5 hours ago up to, but excluding, 30 min ago
     results = repository.get_by_date_range(
         ticker,
         start_timestamp=base_time - 5400,
         end_timestamp=base_time - 1800
     )
 
-    assert len(results) == 2
+    assert len(results) == 1
     assert all(r.ticker == ticker for r in results)
 
 
@@ -117,7 +117,7 @@ def test_get_by_date_range_start_only(repository):
 
 
 def test_get_by_date_range_end_only(repository):
-    """Test filtering with only end date"""
+    """Test filtering with only end date, which is exclusive"""
     ticker = "btc_usd"
     base_time = int(time.time())
 
@@ -125,6 +125,211 @@ def test_get_by_date_range_end_only(repository):
     repository.save_price(ticker, 45500.0, base_time - 3600)
     repository.save_price(ticker, 46000.0, base_time)
 
-    results = repository.get_by_date_range(ticker, end_timestamp=base_time - 4000)
+    results = repository.get_by_date_range(ticker, end_timestamp=base_time - 3600)
+
+    assert [r.timestamp for r in results] == [base_time - 7200]
+
+
+def test_save_prices_bulk(repository):
+    """Test saving a whole tick in one call"""
+    timestamp = int(time.time())
+    rows = [("btc_usd", 45000.0, timestamp), ("eth_usd", 2500.0, timestamp)]
+
+    saved = repository.save_prices_bulk(rows)
+
+    assert saved == 2
+    assert repository.get_latest_by_ticker("btc_usd").price == 45000.0
+    assert repository.get_latest_by_ticker("eth_usd").price == 2500.0
+
+
+def test_save_prices_bulk_refresh(repository):
+    """Test that refresh returns the created records with ids"""
+    timestamp = int(time.time())
+
+    created = repository.save_prices_bulk([("btc_usd", 45000.0, timestamp)], refresh=True)
+
+    assert len(created) == 1
+    assert created[0].id is not None
+    assert created[0].timestamp == timestamp
+
+
+def test_save_prices_bulk_exchange_timestamp(repository):
+    """Test that the optional exchange timestamp is stored next to the tick timestamp"""
+    created = repository.save_prices_bulk(
+        [("btc_usd", 45000.0, 1_700_000_040, 1_700_000_041_234), ("eth_usd", 3000.0, 1_700_000_040)],
+        refresh=True
+    )
+
+    assert [row.exchange_timestamp for row in created] == [1_700_000_041_234, None]
+
+
+def test_save_prices_bulk_empty(repository):
+    """Test that an empty batch is a no-op"""
+    assert repository.save_prices_bulk([]) == 0
+
+
+def test_get_by_tickers_range(repository):
+    """Test batch queries keyed by ticker"""
+    repository.save_prices_bulk(
+        [("btc_usd", float(i), 1_700_000_000 + i * 60) for i in range(5)]
+        + [("eth_usd", 10.0 + i, 1_700_000_000 + i * 60) for i in range(3)]
+    )
+
+    latest = repository.get_latest_by_tickers(["btc_usd", "eth_usd", "doge_usd"])
+    ranges = repository.get_by_tickers_range(
+        ["btc_usd", "eth_usd"], start_timestamp=1_700_000_060, end_timestamp=1_700_000_240, limit=2
+    )
 
-    assert len(results) == 1
\ No newline at end of file
+    assert {ticker: row.price for ticker, row in latest.items()} == {"btc_usd": 4.0, "eth_usd": 12.0}
+    assert [row.price for row in ranges["btc_usd"]] == [3.0, 2.0]
+    assert [row.price for row in ranges["eth_usd"]] == [12.0, 11.0]
+
+
+def test_get_ohlc(db_session):
+    """Test OHLC aggregation into buckets"""
+    import asyncio
+    from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+    from app.repository import AsyncPriceRepository
+
+    repository = PriceRepository(db_session)
+    repository.save_prices_bulk([
+        ("btc_usd", 10.0, 3600),
+        ("btc_usd", 15.0, 3660),
+        ("btc_usd", 5.0, 3720),
+        ("btc_usd", 12.0, 3780),
+        ("btc_usd", 20.0, 7200),
+        ("eth_usd", 99.0, 3600),
+    ])
+
+    async def scenario():
+        async_engine = create_async_engine("sqlite+aiosqlite:///./test_repo.db")
+        async with AsyncSession(async_engine) as session:
+            return await AsyncPriceRepository(session).get_ohlc("btc_usd", 3600)
+
+    buckets = [tuple(row)[:6] for row in asyncio.run(scenario())]
+
+    assert buckets == [
+        (3600, 10.0, 15.0, 5.0, 12.0, 4),
+        (7200, 20.0, 20.0, 20.0, 20.0, 1),
+    ]
+
+
+def test_save_prices_bulk_updates_rollups(repository, db_session):
+    """Test that rollups are merged incrementally into the current bucket"""
+    from app.models import PriceRollup
+
+    repository.save_prices_bulk([("btc_usd", 10.0, 3600)], rollups=True)
+    repository.save_prices_bulk([("btc_usd", 15.0, 3660)], rollups=True)
+    repository.save_prices_bulk([("btc_usd", 5.0, 3720), ("eth_usd", 1.0, 3720)], rollups=True)
+
+    hourly = db_session.query(PriceRollup).filter_by(ticker="btc_usd", interval=3600).one()
+    assert (hourly.open, hourly.high, hourly.low, hourly.close, hourly.count) == (10.0, 15.0, 5.0, 5.0, 3)
+
+    minutes = db_session.query(PriceRollup).filter_by(ticker="btc_usd", interval=60).count()
+    assert minutes == 3
+
+
+def test_rebuild_rollups_matches_incremental(repository, db_session):
+    """Test that backfilling from raw data reproduces incremental rollups"""
+    from app.models import PriceRollup
+
+    rows = [("btc_usd", 10.0 + i % 7, 3600 + i * 60) for i in range(150)]
+    for row in rows:
+        repository.save_prices_bulk([row], rollups=True)
+
+    def snapshot():
+        return sorted(
+            (r.interval, r.bucket, r.open, r.high, r.low, r.close, r.count)
+            for r in db_session.query(PriceRollup).all()
+        )
+
+    incremental = snapshot()
+    db_session.query(PriceRollup).delete()
+    db_session.commit()
+
+    written = repository.rebuild_rollups()
+    db_session.expire_all()
+
+    assert written == len(incremental)
+    assert snapshot() == incremental
+
+
+def test_save_prices_bulk_skips_duplicates(repository, db_session):
+    """Test that repeated (ticker, timestamp) rows are written and rolled up once"""
+    from app.models import PriceData, PriceRollup
+
+    rows = [("btc_usd", 10.0, 3600), ("btc_usd", 11.0, 3660), ("btc_usd", 99.0, 3600)]
+    assert repository.save_prices_bulk(rows, rollups=True) == 2
+    # A retried tick writes nothing and leaves the rollups alone
+    assert repository.save_prices_bulk(rows, rollups=True) == 0
+    assert repository.save_prices_bulk(rows, refresh=True, rollups=True) == []
+    created = repository.save_prices_bulk([("btc_usd", 12.0, 3720), ("btc_usd", 50.0, 3660)], refresh=True)
+    assert [row.timestamp for row in created] == [3720]
+
+    assert db_session.query(PriceData).count() == 3
+    hourly = db_session.query(PriceRollup).filter_by(ticker="btc_usd", interval=3600).one()
+    assert (hourly.open, hourly.high, hourly.count) == (10.0, 11.0, 2)
+
+    existing = repository.save_price("btc_usd", 70.0, 3600)
+    assert existing.price == 10.0
+
+
+def test_ensure_unique_prices_migrates_duplicates(tmp_path):
+    """Test the one-off dedup migration of a table with the old non-unique index"""
+    from sqlalchemy import inspect, text
+    from app.database import DatabaseManager
+    from app.models import PriceRollup
+
+    url = f"sqlite:///{tmp_path / 'legacy.db'}"
+    manager = DatabaseManager(url)
+    with manager.engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE price_data (id INTEGER PRIMARY KEY, ticker VARCHAR(20) NOT NULL, "
+            "price FLOAT NOT NULL, timestamp BIGINT NOT NULL, exchange_timestamp BIGINT)"
+        ))
+        conn.execute(text("CREATE INDEX ix_ticker_timestamp ON price_data (ticker, timestamp)"))
+        conn.execute(text(
+            "INSERT INTO price_data (ticker, price, timestamp) VALUES "
+            "('btc_usd', 1.0, 60), ('btc_usd', 2.0, 60), ('btc_usd', 3.0, 120), ('eth_usd', 4.0, 60), "
+            "('btc_usd', 5.0, 60)"
+        ))
+    PriceRollup.__table__.create(manager.engine)
+
+    assert manager.ensure_unique_prices() == 2
+    assert manager.ensure_unique_prices() is None
+
+    indexes = {index["name"]: index["unique"] for index in inspect(manager.engine).get_indexes("price_data")}
+    assert indexes == {"uq_ticker_timestamp": True}
+    with manager.engine.connect() as conn:
+        assert conn.execute(text("SELECT id, price FROM price_data ORDER BY id")).all() == [
+            (1, 1.0), (3, 3.0), (4, 4.0)
+        ]
+        assert conn.execute(text(
+            "SELECT count FROM price_rollup WHERE ticker = 'btc_usd' AND interval = 3600"
+        )).scalar() == 2
+    manager.engine.dispose()
+
+
+def test_ensure_rollups_covers_history_written_before_rollups(tmp_path):
+    """Test that ensure_rollups rebuilds prices saved without rollups, and create_tables skips it by default"""
+    from app.database import DatabaseManager
+
+    manager = DatabaseManager(f"sqlite:///{tmp_path / 'history.db'}")
+    manager.create_tables()
+    session = manager.get_session()
+    repository = PriceRepository(session)
+    repository.save_prices_bulk([("btc_usd", 1.0, 60), ("btc_usd", 2.0, 120)])
+    repository.save_prices_bulk([("btc_usd", 3.0, 180), ("eth_usd", 1.0, 180)], rollups=True)
+    assert repository.tickers_missing_rollups() == ["btc_usd"]
+    session.close()
+
+    manager.create_tables()
+    session = manager.get_session()
+    assert PriceRepository(session).tickers_missing_rollups() == ["btc_usd"]
+    session.close()
+
+    assert manager.ensure_rollups() == ["btc_usd"]
+    session = manager.get_session()
+    assert PriceRepository(session).tickers_missing_rollups() == []
+    assert manager.ensure_rollups() == []
+    session.close()
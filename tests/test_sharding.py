@@ -0,0 +1,34 @@
+import pytest
+from app.sharding import HashRing
+
+TICKERS = [f"t{i}_usd" for i in range(1000)]
+
+
+def test_partition_covers_every_ticker_once():
+    """Test that each ticker lands in exactly one shard"""
+    shards = HashRing(4).partition(TICKERS)
+
+    assert sorted(t for tickers in shards.values() for t in tickers) == sorted(TICKERS)
+    assert set(shards) == {0, 1, 2, 3}
+
+
+def test_partition_is_reasonably_balanced():
+    """Test that virtual nodes spread tickers evenly"""
+    sizes = [len(tickers) for tickers in HashRing(4).partition(TICKERS).values()]
+
+    assert max(sizes) < 1.5 * len(TICKERS) / 4
+
+
+def test_adding_a_shard_moves_few_tickers():
+    """Test the consistent-hashing property when scaling out"""
+    before, after = HashRing(4), HashRing(5)
+    moved = sum(before.shard_for(t) != after.shard_for(t) for t in TICKERS)
+
+    # Ideal is 1/5 of the tickers; a modulo hash would move about 4/5
+    assert moved < 0.3 * len(TICKERS)
+
+
+def test_requires_a_shard():
+    """Test that a ring without shards is rejected"""
+    with pytest.raises(ValueError):
+        HashRing(0)
@@ -0,0 +1,222 @@
+import os
+import time
+import pytest
+from prometheus_client import REGISTRY
+from sqlalchemy import exc, func, select
+from app import cli, tasks
+from app.database import DatabaseManager
+from app.models import PriceData
+from app.repository import PriceRepository
+from app.spool import SpoolFlusher, WriteSpool, drain, is_rejected_data
+
+
+class FlakyDatabase:
+    """Local stand-in for Postgres that can be taken down and brought back"""
+
+    def __init__(self, url: str):
+        self.manager = DatabaseManager(url)
+        self.manager.create_tables()
+        self.down = False
+        self.batches = []
+
+    def write(self, rows):
+        if self.down:
+            raise exc.OperationalError("INSERT INTO price_data", {}, ConnectionRefusedError("connection refused"))
+        # Stands in for a row violating a constraint on the real table
+        if any(row[0] == "bad_usd" for row in rows):
+            raise exc.IntegrityError("INSERT INTO price_data", {}, ValueError("unknown ticker bad_usd"))
+        session = self.manager.get_session()
+        try:
+            self.batches.append(len(rows))
+            return PriceRepository(session).save_prices_bulk(rows, refresh=True, rollups=True)
+        finally:
+            session.close()
+
+    def count(self) -> int:
+        with self.manager.get_session() as session:
+            return session.scalar(select(func.count(PriceData.id)))
+
+
+@pytest.fixture
+def spool(tmp_path):
+    return WriteSpool(str(tmp_path / "spool" / "collector.db"))
+
+
+@pytest.fixture
+def database(tmp_path):
+    return FlakyDatabase(f"sqlite:///{tmp_path / 'prices.db'}")
+
+
+def tick(timestamp: int, tickers=("btc_usd", "eth_usd")):
+    return [(ticker, 100.0 + i, timestamp, timestamp * 1000) for i, ticker in enumerate(tickers)]
+
+
+def test_spool_survives_reopen_and_acks_in_order(spool):
+    """Test that queued rows persist across reopening and are acknowledged oldest first"""
+    spool.append(tick(60))
+    spool.append(tick(120))
+
+    reopened = WriteSpool(spool.path)
+    last_id, rows = reopened.peek(3)
+    assert rows[0] == ("btc_usd", 100.0, 60, 60000) and len(rows) == 3
+
+    reopened.ack(last_id)
+    assert reopened.pending() == 1
+    assert reopened.peek(10)[1] == [("eth_usd", 101.0, 120, 120000)]
+
+
+def test_outage_keeps_rows_until_database_recovers(spool, database):
+    """Test that rows spooled during an outage are written in bulk once the database is back"""
+    database.down = True
+    for timestamp in (60, 120, 180):
+        spool.append(tick(timestamp))
+        assert drain(spool, database.write, batch_size=4) == 0
+    assert spool.pending() == 6
+
+    database.down = False
+    assert drain(spool, database.write, batch_size=4) == 6
+
+    assert spool.pending() == 0
+    assert database.count() == 6
+    # Backlog accumulated during the outage is written in bulk batches
+    assert database.batches == [4, 2]
+
+
+def test_replayed_batch_is_not_duplicated(spool, database, monkeypatch):
+    """Test that a batch replayed after a crash before its ack is not written twice"""
+    spool.append(tick(60))
+
+    def crash(last_id, rejected=()):
+        raise OSError("killed before ack")
+
+    # The database commit succeeds but the process dies before removing the rows
+    monkeypatch.setattr(spool, "ack", crash)
+    with pytest.raises(OSError):
+        drain(spool, database.write, batch_size=10)
+    monkeypatch.undo()
+
+    assert drain(spool, database.write, batch_size=10) == 2
+    assert database.count() == 2
+
+
+def test_rejected_row_is_dead_lettered_without_blocking_the_spool(spool, database):
+    """Test that a row the database refuses moves to spool_dead while the rest of its batch is written"""
+    spool.append(tick(60) + [("bad_usd", 1.0, 120, None)] + tick(180))
+    database.down = True
+    assert drain(spool, database.write, batch_size=10) == 0
+    assert spool.dead_letters() == []
+
+    database.down = False
+    assert drain(spool, database.write, batch_size=10) == 5
+
+    assert spool.pending() == 0
+    assert database.count() == 4
+    [(_, row, error)] = spool.dead_letters()
+    assert row == ("bad_usd", 1.0, 120, None) and "unknown ticker bad_usd" in error
+
+
+def test_requeue_dead_letters_from_cli(spool, database, monkeypatch, caplog):
+    """Test that requeue-dead moves filtered spool_dead rows back and the gauge follows"""
+    monkeypatch.setattr(cli, "get_collector_spool", lambda: spool)
+    spool.append([("bad_usd", 1.0, 60, None), ("btc_usd", 2.0, 60, None), ("eth_usd", 3.0, 60, None)])
+    last_id, rows = spool.peek(10)
+    errors = ["unknown ticker bad_usd", "value out of range", "value out of range"]
+    spool.ack(last_id, list(zip(rows, errors)))
+    drain(spool, database.write, batch_size=10)
+    assert REGISTRY.get_sample_value("collector_spool_dead_rows") == 3
+
+    with caplog.at_level("INFO", logger="app.cli"):
+        cli.main(["requeue-dead", "--list", "--error", "out of range"])
+    assert "btc_usd" in caplog.text and "bad_usd" not in caplog.text
+    assert spool.dead_count() == 3
+
+    [btc_id, _] = [dead_id for dead_id, _, _ in spool.dead_letters(error="out of range")]
+    cli.main(["requeue-dead", "--error", "out of range", "--id", str(btc_id)])
+    assert [row[0] for _, row, _ in spool.dead_letters()] == ["bad_usd", "eth_usd"]
+    assert spool.peek(10)[1] == [("btc_usd", 2.0, 60, None)]
+
+    cli.main(["requeue-dead", "--error", "out of range"])
+    assert drain(spool, database.write, batch_size=10) == 2
+    assert database.count() == 2
+    assert spool.dead_count() == 1 and REGISTRY.get_sample_value("collector_spool_dead_rows") == 1
+
+
+def test_append_refuses_malformed_rows(spool):
+    """Test that invalid rows are refused at enqueue instead of reaching the database"""
+    for row in (
+            ("", 1.0, 60), ("btc_usd", -1.0, 60), ("btc_usd", float("nan"), 60), ("btc_usd", "1.0", 60),
+            ("btc_usd", 1.0, None), ("btc_usd", 1.0, 60.5), ("btc_usd", 1.0, 60, "later"), ("btc_usd", 1.0),
+    ):
+        with pytest.raises(ValueError):
+            spool.append(tick(60) + [row])
+    assert spool.pending() == 0
+
+    assert spool.append([("btc_usd", 1, 60)]) == 1
+    assert spool.peek(1)[1] == [("btc_usd", 1.0, 60, None)]
+
+
+def test_only_database_data_errors_are_rejections():
+    """Test that dead-lettering is limited to integrity and data errors"""
+    assert is_rejected_data(exc.IntegrityError("INSERT", {}, ValueError("duplicate")))
+    assert is_rejected_data(exc.DataError("INSERT", {}, ValueError("out of range")))
+    assert not is_rejected_data(exc.OperationalError("INSERT", {}, ConnectionRefusedError()))
+    assert not is_rejected_data(ValueError("bug in the writer"))
+    assert not is_rejected_data(TypeError("bug in the writer"))
+
+
+def test_save_shards_spools_without_touching_database(spool, database, monkeypatch):
+    """Test that a tick only appends to the spool and the flush writes it later"""
+    monkeypatch.setattr(tasks, "_collector_spool", spool)
+    monkeypatch.setattr(tasks, "write_prices", database.write)
+    database.down = True
+
+    tasks.save_shards([[("btc_usd", 1.0, 60, None)], [("eth_usd", None, 60, None), ("sol_usd", -1.0, 60, None)]], 60)
+
+    assert spool.pending() == 1 and database.batches == []
+    database.down = False
+    assert tasks.flush_spool() == 1
+    assert database.count() == 1
+
+
+def test_flusher_drains_in_background(spool, database):
+    """Test that the flusher thread retries until the database recovers"""
+    database.down = True
+    flusher = SpoolFlusher(spool, database.write, interval=0.01, batch_size=100)
+    flusher.start()
+    spool.append(tick(60))
+    time.sleep(0.05)
+    assert spool.pending() == 2
+
+    database.down = False
+    deadline = time.time() + 5
+    while spool.pending() and time.time() < deadline:
+        time.sleep(0.01)
+    flusher.stop(timeout=1)
+
+    assert not flusher.is_alive()
+    assert spool.pending() == 0 and database.count() == 2
+
+
+def test_worker_flusher_runs_in_its_own_process(spool, database, monkeypatch):
+    """Test that the prefork parent leaves flushing to a separate process and opens no connections itself"""
+    monkeypatch.setattr(tasks.settings, "spool_flush_interval", 0.01)
+    monkeypatch.setattr(tasks, "_collector_spool", spool)
+    monkeypatch.setattr(tasks, "db_manager", database.manager)
+    monkeypatch.setattr(tasks, "write_prices", database.write)
+    database.manager.engine.dispose()
+    spool.append(tick(60))
+
+    tasks.start_spool_flusher()
+    try:
+        assert tasks._spool_flusher.pid != os.getpid()
+        deadline = time.time() + 5
+        while spool.pending() and time.time() < deadline:
+            time.sleep(0.01)
+        # Children forked by the parent from now on inherit no flusher connections
+        assert database.manager.engine.pool.checkedin() == 0
+    finally:
+        flusher = tasks._spool_flusher
+        tasks.stop_spool_flusher()
+
+    assert not flusher.is_alive() and tasks._spool_flusher is None
+    assert spool.pending() == 0 and database.count() == 2
@@ -0,0 +1,109 @@
+import asyncio
+import time
+from app.stream_ingest import DeribitStreamIngestor
+from tests.deribit_stub import DeribitWebSocketStub
+
+
+def run_ingestor(stub_kwargs: dict, ingestor_kwargs: dict, until):
+    batches = []
+
+    async def scenario():
+        async with DeribitWebSocketStub(**stub_kwargs) as stub:
+            ingestor = DeribitStreamIngestor(
+                ["btc_usd", "eth_usd"], batches.append, ws_url=stub.ws_url,
+                initial_backoff=0.01, max_backoff=0.05, **ingestor_kwargs
+            )
+            task = asyncio.create_task(ingestor.run())
+            for _ in range(200):
+                if until(stub, ingestor, batches):
+                    break
+                await asyncio.sleep(0.01)
+            ingestor.stop()
+            await asyncio.wait_for(task, timeout=5)
+            return stub, ingestor
+
+    stub, ingestor = asyncio.run(scenario())
+    return stub, ingestor, batches
+
+
+def test_ingestor_batches_updates_by_size():
+    """Test that updates are flushed in batches of flush_size"""
+    stub, ingestor, batches = run_ingestor(
+        {"updates_per_connection": 3},
+        {"flush_size": 2, "flush_interval": 60},
+        lambda stub, ingestor, batches: sum(map(len, batches)) >= 6,
+    )
+
+    rows = [row for batch in batches for row in batch]
+    assert stub.subscriptions[0] == ["deribit_price_index.btc_usd", "deribit_price_index.eth_usd"]
+    assert rows[0] == ("btc_usd", 100.0, 1700000000, 1700000000000)
+    assert all(len(batch) <= 2 for batch in batches[:3])
+
+
+def test_ingestor_reconnects_and_resubscribes():
+    """Test that a dropped connection is re-established with a fresh subscription"""
+    stub, ingestor, batches = run_ingestor(
+        {"updates_per_connection": 1},
+        {"flush_size": 100, "flush_interval": 0.02},
+        lambda stub, ingestor, batches: len(stub.subscriptions) >= 3,
+    )
+
+    assert ingestor.connections >= 3
+    assert len(stub.subscriptions) >= 3
+
+
+def test_ingestor_keeps_rows_when_sink_fails():
+    """Test that rows survive a failing flush and are retried"""
+    calls = []
+
+    def flaky_sink(rows):
+        calls.append(list(rows))
+        if len(calls) == 1:
+            raise RuntimeError("database unavailable")
+
+    async def scenario():
+        ingestor = DeribitStreamIngestor(["btc_usd"], flaky_sink, ws_url="ws://unused")
+        ingestor._buffer = [("btc_usd", 1.0, 1)]
+        await ingestor.flush()
+        ingestor._buffer.append(("btc_usd", 2.0, 2))
+        await ingestor.flush()
+
+    asyncio.run(scenario())
+    assert calls[1] == [("btc_usd", 1.0, 1), ("btc_usd", 2.0, 2)]
+
+
+def test_ingestor_skips_malformed_messages():
+    """Test that a malformed message is skipped without killing the ingestor"""
+    stub, ingestor, batches = run_ingestor(
+        {"updates_per_connection": 1, "malformed": True},
+        {"flush_size": 2, "flush_interval": 60},
+        lambda stub, ingestor, batches: sum(map(len, batches)) >= 2,
+    )
+
+    assert ingestor.malformed >= 2
+    assert sorted(row[0] for row in batches[0]) == ["btc_usd", "eth_usd"]
+
+
+def test_ingestor_backs_off_after_failed_flush():
+    """Test that incoming messages do not retry a failing sink until the backoff expires"""
+    calls = []
+
+    def failing_sink(rows):
+        calls.append(list(rows))
+        raise RuntimeError("database unavailable")
+
+    async def scenario():
+        ingestor = DeribitStreamIngestor(
+            ["btc_usd"], failing_sink, ws_url="ws://unused", flush_size=1, initial_backoff=60
+        )
+        message = {"method": "subscription", "params": {"data": {
+            "index_name": "btc_usd", "price": 1.0, "timestamp": 1700000000000
+        }}}
+        for _ in range(5):
+            await ingestor._handle(None, message)
+        return ingestor
+
+    ingestor = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert len(ingestor._buffer) == 5
+    assert ingestor._flush_retry_at > time.monotonic()